@@ -0,0 +1,64 @@
+"""Memory use of requests and offers.
+
+Compares the slot-based flower market classes with objects that keep
+the same attributes in a per-instance dictionary, which is how all
+requests and offers were stored before. Run with
+
+    python benchmarks/memory.py [COUNT]
+"""
+
+import sys
+import tracemalloc
+
+from sofie_offer_marketplace_cli.flower_marshaller import (
+    FlowerOffer, FlowerRequest)
+
+
+class DictObject(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+AUTHOR = "0x" + "ab" * 20
+
+
+def make(request_class, offer_class, count):
+    requests = []
+    for i in range(count):
+        offers = [offer_class(offer_id=i * 2 + j, request_id=i,
+                              author=AUTHOR, price=j)
+                  for j in range(2)]
+        requests.append(request_class(
+            request_id=i, deadline=1600000000 + i, quantity=i % 100,
+            type=i % 4, is_decided=False, is_pending=False, is_open=True,
+            is_closed=False, offers=offers, decided_offers=offers[:1]))
+    return requests
+
+
+def measure(request_class, offer_class, count):
+    tracemalloc.start()
+    requests = make(request_class, offer_class, count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del requests
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    # includes the offer lists and integers, which are the same with
+    # both representations
+    before = measure(DictObject, DictObject, count)
+    after = measure(FlowerRequest, FlowerOffer, count)
+
+    print("{} requests with 2 offers each".format(count))
+    print("dict:  {:>10} bytes, {:>4.0f} bytes per object".format(
+        before, before / (3 * count)))
+    print("slots: {:>10} bytes, {:>4.0f} bytes per object".format(
+        after, after / (3 * count)))
+    print("ratio: {:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
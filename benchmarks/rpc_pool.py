@@ -0,0 +1,122 @@
+"""RPC calls per second with different HTTP connection pool sizes.
+
+Runs a local JSON-RPC server in another process, answering
+`eth_blockNumber` after a short delay (standing in for the node), and
+calls it from many threads through web3 with providers from
+`http_provider`. Also counts the connections the server had to
+accept. Run with
+
+    python benchmarks/rpc_pool.py [THREADS] [SECONDS]
+"""
+
+import json
+import logging
+import multiprocessing
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from web3 import Web3
+
+from sofie_offer_marketplace.providers import http_provider
+
+DELAY = 0.002
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        Handler.connections += 1
+
+    def do_GET(self):
+        # returns and resets the number of connections
+        body = str(Handler.connections).encode('utf-8')
+        Handler.connections = 0
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(
+            int(self.headers['Content-Length'])))
+        time.sleep(DELAY)
+        body = json.dumps({"jsonrpc": "2.0", "id": request['id'],
+                           "result": "0x10"}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(ports):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def connections(url):
+    # a new connection, which is not counted
+    import requests
+    return int(requests.get(url).text) - 1
+
+
+def measure(url, threads, seconds, **options):
+    w3 = Web3(http_provider(url, **options))
+    calls = [0] * threads
+    deadline = time.monotonic() + seconds
+
+    def run(i):
+        while time.monotonic() < deadline:
+            w3.eth.blockNumber
+            calls[i] += 1
+
+    connections(url)
+    workers = [threading.Thread(target=run, args=(i,))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return sum(calls) / seconds, connections(url)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    # "connection pool is full" is expected with the small pools
+    logging.getLogger('urllib3.connectionpool').setLevel(logging.ERROR)
+
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(ports,),
+                                     daemon=True)
+    server.start()
+    url = "http://127.0.0.1:{}".format(ports.get())
+
+    print("{} threads, {} s per run".format(threads, seconds))
+    print("{:<24}{:>12}{:>14}".format("", "calls/s", "connections"))
+
+    runs = [("no keep-alive", dict(keep_alive=False))]
+    runs += [("pool size {}".format(size), dict(pool_size=size))
+             for size in (1, 4, 10, threads)]
+
+    for name, options in runs:
+        rate, connections = measure(url, threads, seconds, **options)
+        print("{:<24}{:>12.0f}{:>14}".format(name, rate, connections))
+
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
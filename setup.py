@@ -46,6 +46,9 @@ setup(
     entry_points={
         'console_scripts': ['offer-marketplace-cli=sofie_offer_marketplace_cli:main']
     },
+    extras_require={
+        'async': ['aiohttp'],  # for AsyncWeb3Contract
+    },
     tests_require=['pytest', 'pytest-asyncio', 'pytest-mock'],
     setup_requires=['tox-setuptools'],
     zip_safe=False)
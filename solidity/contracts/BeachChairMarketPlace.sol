@@ -60,6 +60,18 @@ contract BeachChairMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestE
         return (Successful, offersExtra[offerIdentifier].quantity, offersExtra[offerIdentifier].totalPrice);
     }
 
+    function getRequestExtraArray(uint requestIdentifier) internal view returns (uint[] memory extra) {
+        extra = new uint[](2);
+        extra[0] = requestsExtra[requestIdentifier].quantity;
+        extra[1] = requestsExtra[requestIdentifier].date;
+    }
+
+    function getOfferExtraArray(uint offerIdentifier) internal view returns (uint[] memory extra) {
+        extra = new uint[](2);
+        extra[0] = offersExtra[offerIdentifier].quantity;
+        extra[1] = offersExtra[offerIdentifier].totalPrice;
+    }
+
     // By sending the identifier of a request, others can make offer to rent beach chairs. Each address can only
     // make one offer. After sending the first offer, every other offer sent from that address will be ignored.
     function submitOffer(uint requestID) public returns (uint8 status, uint offerID) {
@@ -89,6 +101,10 @@ contract BeachChairMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestE
     // By adding the proposed quantity, and the total price, others can complete and open their offer
     // (only the initial offer maker can access this function).
     function submitOfferArrayExtra(uint offerID, uint[] calldata extra) external payable returns (uint8 status, uint offID) {
+        return addOfferArrayExtra(offerID, extra);
+    }
+
+    function addOfferArrayExtra(uint offerID, uint[] memory extra) internal returns (uint8 status, uint offID) {
         Offer memory offer = offers[offerID];
 
         if(!offer.isDefined) {
@@ -135,6 +151,10 @@ contract BeachChairMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestE
     // By adding the quantity of the beach chairs needed, and the intended rental date,
     // owner and managers can complete a request (only owner or managers can access this function).
     function submitRequestArrayExtra(uint requestID, uint[] calldata extra) external returns (uint8 status, uint reqID) {
+        return addRequestArrayExtra(requestID, extra);
+    }
+
+    function addRequestArrayExtra(uint requestID, uint[] memory extra) internal returns (uint8 status, uint reqID) {
         if(!(msg.sender == owner() || isManager(msg.sender))) {
             emit FunctionStatus(AccessDenied);
             return (AccessDenied, 0);
@@ -157,6 +177,28 @@ contract BeachChairMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestE
         return finishSubmitRequestExtra(requestID);
     }
 
+    // Adds a new request together with its extra data in a single transaction. If the extra data cannot
+    // be added, the whole transaction is reverted (only owner or managers can access this function).
+    function submitRequestWithExtra(uint deadline, uint[] calldata extra) external returns (uint8 status, uint requestID) {
+        (status, requestID) = submitRequest(deadline);
+        if (status != Successful) {
+            return (status, 0);
+        }
+        (status, ) = addRequestArrayExtra(requestID, extra);
+        require(status == Successful);
+    }
+
+    // Makes a new offer together with its extra data in a single transaction. If the extra data cannot
+    // be added, the whole transaction is reverted.
+    function submitOfferWithExtra(uint requestID, uint[] calldata extra) external payable returns (uint8 status, uint offerID) {
+        (status, offerID) = submitOffer(requestID);
+        if (status != Successful) {
+            return (status, 0);
+        }
+        (status, ) = addOfferArrayExtra(offerID, extra);
+        require(status == Successful);
+    }
+
     // Manually close a request, so others won't be able to make offers for it or even see it in the list of requests.
     // In this implementation, this is completely apart from request's deadline. This can be modified based on the
     // specifications of the market we have (only owner or managers can access this function).
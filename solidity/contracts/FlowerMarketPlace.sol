@@ -68,6 +68,17 @@ contract FlowerMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestExtra
         return (Successful, offersExtra[offerIdentifier].price);
     }
 
+    function getRequestExtraArray(uint requestIdentifier) internal view returns (uint[] memory extra) {
+        extra = new uint[](2);
+        extra[0] = requestsExtra[requestIdentifier].quantity;
+        extra[1] = uint(requestsExtra[requestIdentifier].flowerType);
+    }
+
+    function getOfferExtraArray(uint offerIdentifier) internal view returns (uint[] memory extra) {
+        extra = new uint[](1);
+        extra[0] = offersExtra[offerIdentifier].price;
+    }
+
     // By sending the identifier of a request, others can make offer to buy flowers.
     function submitOffer(uint requestID) public returns (uint8 status, uint offerID) {
         if(!requests[requestID].isDefined) {
@@ -91,6 +102,10 @@ contract FlowerMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestExtra
     // By sending the proposed price, others can complete and open their offer to buy flowers.
     // (only the initial offer maker can access this function).
     function submitOfferArrayExtra(uint offerID, uint[] calldata extra) external payable returns (uint8 status, uint offID) {
+        return addOfferArrayExtra(offerID, extra);
+    }
+
+    function addOfferArrayExtra(uint offerID, uint[] memory extra) internal returns (uint8 status, uint offID) {
         require(
             extra.length >= minimumNumberOfOfferExtraElements && extra.length <= maximumNumberOfOfferExtraElements
         );
@@ -141,6 +156,10 @@ contract FlowerMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestExtra
     // By specifiying the type of the flowers, quantity of them, owner and managers
     // can complete a request (only owner or managers can access this function).
     function submitRequestArrayExtra(uint requestID, uint[] calldata extra) external returns (uint8 status, uint reqID) {
+        return addRequestArrayExtra(requestID, extra);
+    }
+
+    function addRequestArrayExtra(uint requestID, uint[] memory extra) internal returns (uint8 status, uint reqID) {
         if (extra.length < minimumNumberOfRequestExtraElements || extra.length > maximumNumberOfRequestExtraElements) {
             emit FunctionStatus(InvalidInput);
             return (InvalidInput, 0);
@@ -168,6 +187,28 @@ contract FlowerMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestExtra
         return finishSubmitRequestExtra(requestID);
     }
 
+    // Adds a new request together with its extra data in a single transaction. If the extra data cannot
+    // be added, the whole transaction is reverted (only owner or managers can access this function).
+    function submitRequestWithExtra(uint deadline, uint[] calldata extra) external returns (uint8 status, uint requestID) {
+        (status, requestID) = submitRequest(deadline);
+        if (status != Successful) {
+            return (status, 0);
+        }
+        (status, ) = addRequestArrayExtra(requestID, extra);
+        require(status == Successful);
+    }
+
+    // Makes a new offer together with its extra data in a single transaction. If the extra data cannot
+    // be added, the whole transaction is reverted.
+    function submitOfferWithExtra(uint requestID, uint[] calldata extra) external payable returns (uint8 status, uint offerID) {
+        (status, offerID) = submitOffer(requestID);
+        if (status != Successful) {
+            return (status, 0);
+        }
+        (status, ) = addOfferArrayExtra(offerID, extra);
+        require(status == Successful);
+    }
+
     // Manually close a request, so others won't be able to make offers for it or even see it in the list of requests.
     // In this implementation, this is completely apart from request's deadline. This can be modified based on the
     // specifications of the market we have (only owner or managers can access this function).
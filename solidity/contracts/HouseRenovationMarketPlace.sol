@@ -62,6 +62,20 @@ contract HouseDecorationMarketPlace is AbstractOwnerManagerMarketPlace, ArrayReq
         return (Successful, offerExtra.price);
     }
 
+    function getRequestExtraArray(uint requestIdentifier) internal view returns (uint[] memory extra) {
+        RequestExtra memory requestExtra = requestsExtra[requestIdentifier];
+        extra = new uint[](4);
+        extra[0] = requestExtra.quantity;
+        extra[1] = uint(requestExtra.roomType);
+        extra[2] = requestExtra.priceLimit;
+        extra[3] = requestExtra.priceTarget;
+    }
+
+    function getOfferExtraArray(uint offerIdentifier) internal view returns (uint[] memory extra) {
+        extra = new uint[](1);
+        extra[0] = offersExtra[offerIdentifier].price;
+    }
+
     // By sending the identifier of a request, agencies can make offer to compete for the house decoration contract.
     function submitOffer(uint requestID) public returns (uint8 status, uint offerID) {
         // request undefined
@@ -85,6 +99,10 @@ contract HouseDecorationMarketPlace is AbstractOwnerManagerMarketPlace, ArrayReq
     // By sending the proposed price, agencies can complete and open their offer to compete for the house decoration contract.
     // (only the initial offer maker can access this function).
     function submitOfferArrayExtra(uint offerID, uint[] calldata extra) external payable returns (uint8 status, uint offID) {
+        return addOfferArrayExtra(offerID, extra);
+    }
+
+    function addOfferArrayExtra(uint offerID, uint[] memory extra) internal returns (uint8 status, uint offID) {
         Offer memory offer = offers[offerID];
         // offer undefined
         if(!offer.isDefined) {
@@ -131,6 +149,10 @@ contract HouseDecorationMarketPlace is AbstractOwnerManagerMarketPlace, ArrayReq
     // By specifiying the type of the roms with quantity, owner and managers
     // can complete a request (only owner or managers can access this function).
     function submitRequestArrayExtra(uint requestID, uint[] calldata extra) external returns (uint8 status, uint reqID) {
+        return addRequestArrayExtra(requestID, extra);
+    }
+
+    function addRequestArrayExtra(uint requestID, uint[] memory extra) internal returns (uint8 status, uint reqID) {
         // not owner or managers
         if(!(msg.sender == owner() || isManager(msg.sender))) {
             emit FunctionStatus(AccessDenied);
@@ -157,6 +179,28 @@ contract HouseDecorationMarketPlace is AbstractOwnerManagerMarketPlace, ArrayReq
         return finishSubmitRequestExtra(requestID); // this opens the request and updates the requests
     }
 
+    // Adds a new request together with its extra data in a single transaction. If the extra data cannot
+    // be added, the whole transaction is reverted (only owner or managers can access this function).
+    function submitRequestWithExtra(uint deadline, uint[] calldata extra) external returns (uint8 status, uint requestID) {
+        (status, requestID) = submitRequest(deadline);
+        if (status != Successful) {
+            return (status, 0);
+        }
+        (status, ) = addRequestArrayExtra(requestID, extra);
+        require(status == Successful);
+    }
+
+    // Makes a new offer together with its extra data in a single transaction. If the extra data cannot
+    // be added, the whole transaction is reverted.
+    function submitOfferWithExtra(uint requestID, uint[] calldata extra) external payable returns (uint8 status, uint offerID) {
+        (status, offerID) = submitOffer(requestID);
+        if (status != Successful) {
+            return (status, 0);
+        }
+        (status, ) = addOfferArrayExtra(offerID, extra);
+        require(status == Successful);
+    }
+
     // Manually close a request, so others won't be able to make offers for it or even see it in the list of requests.
     // In this implementation, this is completely apart from request's deadline. This can be modified based on the
     // specifications of the market we have (only owner or managers can access this function).
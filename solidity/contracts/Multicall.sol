@@ -0,0 +1,50 @@
+// Licensed to the Apache Software Foundation (ASF) under one or more
+// contributor license agreements.  See the NOTICE file distributed
+// with this work for additional information regarding copyright
+// ownership.  The ASF licenses this file to you under the Apache
+// License, Version 2.0 (the "License"); you may not use this file
+// except in compliance with the License.  You may obtain a copy of the
+// License at
+//
+//  http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+// implied.  See the License for the specific language governing
+// permissions and limitations under the License.
+
+pragma solidity ^0.5.8;
+pragma experimental ABIEncoderV2;
+
+/// Aggregates multiple read-only calls into a single call. This allows
+/// reading the state of one or more contracts with one round-trip, and
+/// all of the results are guaranteed to come from the same block (the
+/// block number is returned along with the results).
+///
+/// A failing call does not revert the whole aggregation, instead its
+/// ``success`` flag is false and the return data contains the revert
+/// reason, if any.
+
+contract Multicall {
+
+    struct Call {
+        address target;
+        bytes callData;
+    }
+
+    function aggregate(Call[] memory calls) public view returns (uint blockNumber, bool[] memory success, bytes[] memory returnData) {
+        success = new bool[](calls.length);
+        returnData = new bytes[](calls.length);
+
+        for (uint i = 0; i < calls.length; i++) {
+            (success[i], returnData[i]) = calls[i].target.staticcall(calls[i].callData);
+        }
+
+        return (block.number, success, returnData);
+    }
+
+    function getBlockNumber() public view returns (uint blockNumber) {
+        return block.number;
+    }
+}
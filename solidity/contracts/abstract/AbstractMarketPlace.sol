@@ -77,6 +77,32 @@ contract AbstractMarketPlace is TradeResource, MarketPlace, ERC165, StatusCodes
         return (Successful, closedRequestIDs);
     }
 
+    // Returns at most `count` open request identifiers starting from the
+    // position `offset`, along with the total number of open requests.
+    // Unlike getOpenRequestIdentifiers, the cost of this does not grow
+    // with the number of requests.
+    function getOpenRequestIdentifiersRange(uint offset, uint count) external view returns (uint8 status, uint[] memory, uint total) {
+        return (Successful, identifiersRange(openRequestIDs, offset, count), openRequestIDs.length);
+    }
+
+    function getClosedRequestIdentifiersRange(uint offset, uint count) external view returns (uint8 status, uint[] memory, uint total) {
+        return (Successful, identifiersRange(closedRequestIDs, offset, count), closedRequestIDs.length);
+    }
+
+    function identifiersRange(uint[] storage identifiers, uint offset, uint count) internal view returns (uint[] memory range) {
+        if (offset >= identifiers.length) {
+            return new uint[](0);
+        }
+        if (count > identifiers.length - offset) {
+            count = identifiers.length - offset;
+        }
+
+        range = new uint[](count);
+        for (uint i = 0; i < count; i++) {
+            range[i] = identifiers[offset + i];
+        }
+    }
+
     function getRequest(uint requestIdentifier) external view returns (uint8 status, uint deadline, uint stage, address requestMaker) {
         if(!requests[requestIdentifier].isDefined) {
             return (UndefinedID, 0, 0, address(0));
@@ -179,6 +205,44 @@ contract AbstractMarketPlace is TradeResource, MarketPlace, ERC165, StatusCodes
         return (Successful, requests[requestIdentifier].acceptedOfferIDs);
     }
 
+    // Returns the common attributes of a request, its decision and its
+    // market-specific extra attributes with a single call. The extra
+    // attributes are in the same order as getRequestExtra returns them.
+    function getRequestFull(uint requestIdentifier) public view returns (uint8 status, uint deadline, uint stage, address requestMaker, bool isDecided, uint decisionTime, uint[] memory offerIDs, uint[] memory acceptedOfferIDs, uint[] memory extra) {
+        // the values are assigned one by one, returning them all in one
+        // tuple would make the stack too deep
+        if(!requests[requestIdentifier].isDefined) {
+            status = UndefinedID;
+        } else {
+            Request storage request = requests[requestIdentifier];
+            status = Successful;
+            deadline = request.deadline;
+            stage = uint(request.reqStage);
+            requestMaker = request.requestMaker;
+            isDecided = request.isDecided;
+            decisionTime = request.decisionTime;
+            offerIDs = request.offerIDs;
+            acceptedOfferIDs = request.acceptedOfferIDs;
+            extra = getRequestExtraArray(requestIdentifier);
+        }
+    }
+
+    // Returns the common attributes of an offer and its market-specific
+    // extra attributes with a single call.
+    function getOfferFull(uint offerIdentifier) public view returns (uint8 status, uint requestID, address offerMaker, uint stage, uint[] memory extra) {
+        if(!offers[offerIdentifier].isDefined) {
+            return (UndefinedID, 0, address(0), 0, new uint[](0));
+        }
+
+        return (Successful, offers[offerIdentifier].requestID, offers[offerIdentifier].offerMaker, uint(offers[offerIdentifier].offStage), getOfferExtraArray(offerIdentifier));
+    }
+
+    // Market-specific extra attributes of a defined request or offer as
+    // an array, used by getRequestFull and getOfferFull.
+    function getRequestExtraArray(uint requestIdentifier) internal view returns (uint[] memory extra);
+
+    function getOfferExtraArray(uint offerIdentifier) internal view returns (uint[] memory extra);
+
     function finishSubmitOfferExtra(uint offerID) internal returns (uint8 status, uint offID) {
         emit FunctionStatus(Successful);
         emit OfferExtraAdded(offerID);
@@ -41,6 +41,19 @@ contract DemoMarketPlace is AbstractOwnerManagerMarketPlace, ArrayRequestExtraDa
         return (Successful, offersExtra[offerIdentifier].price, offersExtra[offerIdentifier].minQuantity, offersExtra[offerIdentifier].maxQuantity);
     }
 
+    function getRequestExtraArray(uint requestIdentifier) internal view returns (uint[] memory extra) {
+        extra = new uint[](2);
+        extra[0] = requestsExtra[requestIdentifier].quantity;
+        extra[1] = requestsExtra[requestIdentifier].variety;
+    }
+
+    function getOfferExtraArray(uint offerIdentifier) internal view returns (uint[] memory extra) {
+        extra = new uint[](3);
+        extra[0] = offersExtra[offerIdentifier].price;
+        extra[1] = offersExtra[offerIdentifier].minQuantity;
+        extra[2] = offersExtra[offerIdentifier].maxQuantity;
+    }
+
     function submitOffer(uint requestID) public returns (uint8 status, uint offerID) {
         if(!requests[requestID].isDefined) {
             emit FunctionStatus(UndefinedID);
@@ -3,6 +3,7 @@ const ini = require("ini");
 
 const Migrations = artifacts.require("Migrations");
 const FlowerMarketPlace = artifacts.require("FlowerMarketPlace");
+const Multicall = artifacts.require("Multicall");
 
 module.exports = function(deployer, network, accounts) {
   deployer.then(async () => {
@@ -12,6 +13,9 @@ module.exports = function(deployer, network, accounts) {
     // deploy flowermarketplace
     const flowerMarketPlace = await deployer.deploy(FlowerMarketPlace);
 
+    // deploy the read aggregator used for bulk reads
+    const multicall = await deployer.deploy(Multicall);
+
     // update configuration file
     const config = ini.parse(fs.readFileSync('../local-config.cfg', 'utf-8'));
     const net_config = config["marketplace"];
@@ -19,6 +23,7 @@ module.exports = function(deployer, network, accounts) {
     // update network fields
     net_config.minter = accounts[0];
     net_config.contract = flowerMarketPlace.address;
+    net_config.aggregator = multicall.address;
 
     const iniText = ini.stringify(config);
     fs.writeFileSync('../local-config.cfg', iniText);
@@ -131,6 +131,13 @@ contract('FlowerMarketPlace', function (accounts) {
         assert.equal(statusClosedReqs1.toNumber(), 0, "status wasn't successful");
         assert.equal(closedReqs1[0].toNumber(), 2, "closedReqs[0] wasn't 2");
         assert.equal(closedReqs1[1].toNumber(), 3, "closedReqs[1] wasn't 3");
+        let {status: statusRange, '1': closedRange, total: closedTotal} = await market.getClosedRequestIdentifiersRange(1, 5);
+        assert.equal(statusRange.toNumber(), 0, "status wasn't successful");
+        assert.equal(closedTotal.toNumber(), 2, "there weren't 2 closed requests");
+        assert.equal(closedRange.length, 1, "range wasn't cut to the end of the list");
+        assert.equal(closedRange[0].toNumber(), 3, "closedRange[0] wasn't 3");
+        let {'1': openRange} = await market.getOpenRequestIdentifiersRange(5, 5);
+        assert.equal(openRange.length, 0, "range past the end wasn't empty");
         let tx = await market.deleteRequest(2);
         assert.equal(tx.logs[0].args.status.toNumber(), 0, "status wasn't successful");
         let {status: statusClosedReqs2, '1': closedReqs2} = await market.getClosedRequestIdentifiers();
@@ -254,4 +261,72 @@ contract('FlowerMarketPlace', function (accounts) {
         assert.equal(type, "eu.sofie-iot.offer-marketplace-demo.flower", "type of marketplace is not correct");
     });
 
+    it("testing full getters", async () => {
+        let market = await FlowerMarketPlace.new();
+        let tx1 = await market.submitRequest(2000000000);
+        let requestID = tx1.logs[1].args.requestID;
+        await market.submitRequestArrayExtra(requestID, [20, 3]);
+        let tx2 = await market.submitOffer(requestID, {from: accounts[4]});
+        let offerID = tx2.logs[1].args.offerID;
+        await market.submitOfferArrayExtra(offerID, [42], {from: accounts[4]});
+        await market.decideRequest(requestID, []);
+
+        let request = await market.getRequestFull(requestID);
+        assert.equal(request.status.toNumber(), 0, "status wasn't successful");
+        assert.equal(request.deadline.toNumber(), 2000000000, "deadline wasn't 2000000000");
+        assert.equal(request.stage.toNumber(), 2, "request wasn't closed");
+        assert.equal(request.requestMaker, accounts[0], "request maker wasn't accounts[0]");
+        assert.equal(request.isDecided, true, "request wasn't decided");
+        assert.ok(request.decisionTime.toNumber() > 0, "decision time wasn't set");
+        assert.equal(request.offerIDs.length, 1, "there wasn't exactly one offer");
+        assert.equal(request.offerIDs[0].toNumber(), offerID.toNumber(), "offer ID was wrong");
+        assert.equal(request.acceptedOfferIDs[0].toNumber(), offerID.toNumber(), "accepted offer ID was wrong");
+        assert.equal(request.extra[0].toNumber(), 20, "quantity wasn't 20");
+        assert.equal(request.extra[1].toNumber(), 3, "flowerType wasn't 3 (White)");
+
+        let offer = await market.getOfferFull(offerID);
+        assert.equal(offer.status.toNumber(), 0, "status wasn't successful");
+        assert.equal(offer.requestID.toNumber(), requestID.toNumber(), "request ID was wrong");
+        assert.equal(offer.offerMaker, accounts[4], "offer maker wasn't accounts[4]");
+        assert.equal(offer.stage.toNumber(), 1, "offer wasn't open");
+        assert.equal(offer.extra[0].toNumber(), 42, "price wasn't 42");
+
+        let {status: statusUndef} = await market.getRequestFull(999);
+        assert.equal(statusUndef.toNumber(), 2, "status wasn't UndefinedID");
+        let {status: statusUndefOffer} = await market.getOfferFull(999);
+        assert.equal(statusUndefOffer.toNumber(), 2, "status wasn't UndefinedID");
+    });
+
+    it("testing combined submissions", async () => {
+        let market = await FlowerMarketPlace.new();
+        let tx = await market.submitRequestWithExtra(2000000000, [20, 3]);
+        assert.equal(tx.logs[0].args.status.toNumber(), 0, "status wasn't successful");
+        let requestID = tx.logs[1].args.requestID;
+        assert.equal(tx.logs[3].event, "RequestExtraAdded", "extra wasn't added");
+        let {quantity, flowerType} = await market.getRequestExtra(requestID);
+        assert.equal(quantity.toNumber(), 20, "quantity wasn't 20");
+        assert.equal(flowerType.toNumber(), 3, "flowerType wasn't 3 (White)");
+        let {stage} = await market.getRequest(requestID);
+        assert.equal(stage.toNumber(), 1, "request wasn't open");
+
+        let tx1 = await market.submitOfferWithExtra(requestID, [42], {from: accounts[4]});
+        let offerID = tx1.logs[1].args.offerID;
+        assert.equal(tx1.logs[3].event, "OfferExtraAdded", "extra wasn't added");
+        let offer = await market.getOfferFull(offerID);
+        assert.equal(offer.offerMaker, accounts[4], "offer maker wasn't accounts[4]");
+        assert.equal(offer.stage.toNumber(), 1, "offer wasn't open");
+        assert.equal(offer.extra[0].toNumber(), 42, "price wasn't 42");
+
+        // invalid extra data reverts the whole submission
+        let {'1': openReqs} = await market.getOpenRequestIdentifiers();
+        try {
+            await market.submitRequestWithExtra(2000000000, [20]);
+            assert.fail("submission with invalid extra data didn't fail");
+        } catch (error) {
+            assert.ok(error.message.includes("revert"), "submission wasn't reverted");
+        }
+        let {'1': openReqs1} = await market.getOpenRequestIdentifiers();
+        assert.equal(openReqs1.length, openReqs.length, "a request was added");
+    });
+
 });
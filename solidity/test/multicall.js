@@ -0,0 +1,58 @@
+// jshint esversion: 8
+
+// Licensed to the Apache Software Foundation (ASF) under one or more
+// contributor license agreements.  See the NOTICE file distributed
+// with this work for additional information regarding copyright
+// ownership.  The ASF licenses this file to you under the Apache
+// License, Version 2.0 (the "License"); you may not use this file
+// except in compliance with the License.  You may obtain a copy of the
+// License at
+//
+//  http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+// implied.  See the License for the specific language governing
+// permissions and limitations under the License.
+var FlowerMarketPlace = artifacts.require("FlowerMarketPlace");
+var Multicall = artifacts.require("Multicall");
+
+contract('Multicall', function (accounts) {
+
+    it("aggregating marketplace reads", async () => {
+        let market = await FlowerMarketPlace.new();
+        let multicall = await Multicall.new();
+        let tx = await market.submitRequest(2000000000);
+        let requestID = tx.logs[1].args.requestID;
+        await market.submitRequestArrayExtra(requestID, [20, 3]);
+
+        let calls = [
+            [market.address, market.contract.methods.getRequest(requestID.toString()).encodeABI()],
+            [market.address, market.contract.methods.getRequestExtra(requestID.toString()).encodeABI()],
+            [market.address, market.contract.methods.getRequestOfferIDs(requestID.toString()).encodeABI()],
+            [market.address, market.contract.methods.getRequest(999).encodeABI()],
+        ];
+        let {blockNumber, success, returnData} = await multicall.aggregate(calls);
+        let currentBlock = await web3.eth.getBlockNumber();
+        assert.equal(blockNumber.toNumber(), currentBlock, "block number wasn't the current one");
+        assert.equal(success.length, 4, "there weren't 4 results");
+        assert.ok(success.every(s => s), "some call wasn't successful");
+
+        let request = web3.eth.abi.decodeParameters(['uint8', 'uint', 'uint', 'address'], returnData[0]);
+        assert.equal(request[0], 0, "status wasn't successful");
+        assert.equal(request[1], 2000000000, "deadline wasn't 2000000000");
+        assert.equal(request[2], 1, "request wasn't open");
+        assert.equal(request[3], accounts[0], "request maker wasn't accounts[0]");
+
+        let extra = web3.eth.abi.decodeParameters(['uint8', 'uint', 'uint8'], returnData[1]);
+        assert.equal(extra[1], 20, "quantity wasn't 20");
+        assert.equal(extra[2], 3, "flowerType wasn't 3 (White)");
+
+        let offerIDs = web3.eth.abi.decodeParameters(['uint8', 'uint[]'], returnData[2]);
+        assert.equal(offerIDs[1].length, 0, "there were offers");
+
+        let missing = web3.eth.abi.decodeParameters(['uint8', 'uint', 'uint', 'address'], returnData[3]);
+        assert.equal(missing[0], 2, "status wasn't UndefinedID");
+    });
+});
@@ -22,8 +22,11 @@ This is the top-level class, and exports the following classes from
 * :class:`sofie_offer_marketplace.core.Request`
 * :class:`sofie_offer_marketplace.core.Offer`
 * :class:`sofie_offer_marketplace.core.Contract`
+* :class:`sofie_offer_marketplace.core.AsyncMarketplace`
+* :class:`sofie_offer_marketplace.core.AsyncContract`
 
 
 """
 
 from .core import Marketplace, Request, Offer, Contract, default_known_types
+from .core import AsyncMarketplace, AsyncContract
@@ -0,0 +1,521 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Asynchronous Ethereum contract, see :class:`AsyncWeb3Contract`.
+This needs the `aiohttp` package.
+"""
+
+import asyncio
+import itertools
+import logging
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+from web3._utils.method_formatters import receipt_formatter
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+
+from .core import AsyncContract
+from .ethereum import CallCache, Web3Contract, decode_call_output
+
+aiohttp: Optional[ModuleType]
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRPC(object):
+    """Minimal asynchronous JSON-RPC client for the node at
+    `endpoint_uri`. The HTTP session is created on first use unless
+    `session` (an `aiohttp.ClientSession`) is given."""
+
+    def __init__(self, endpoint_uri: str, session=None,
+                 timeout: float = 10) -> None:
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for asynchronous RPC")
+
+        self.endpoint_uri = endpoint_uri
+        self.session = session
+        self.timeout = timeout
+        self.ids = itertools.count()
+
+    async def request(self, method: str, params: List[Any]) -> Any:
+        """Makes a single JSON-RPC request and returns its result"""
+        response = await self._post(self._payload(method, params))
+        return self._result(response)
+
+    async def batch(self, requests: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """Makes the given (method, params) requests as a single JSON-RPC
+        batch and returns their results in the same order. Nodes that
+        do not accept batches get the requests one by one, concurrently."""
+        payload = [self._payload(method, params)
+                   for method, params in requests]
+        response = await self._post(payload)
+
+        if not isinstance(response, list):
+            return list(await asyncio.gather(
+                *(self.request(method, params)
+                  for method, params in requests)))
+
+        responses = {item['id']: item for item in response}
+        return [self._result(responses[item['id']]) for item in payload]
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _payload(self, method: str, params: List[Any]) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "method": method, "params": params,
+                "id": next(self.ids)}
+
+    def _result(self, response: Dict[str, Any]) -> Any:
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['result']
+
+    async def _post(self, payload: Any) -> Any:
+        if self.session is None:
+            assert aiohttp is not None, "checked in __init__"
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+        async with self.session.post(self.endpoint_uri,
+                                     json=payload) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+
+class AsyncReceiptPoller(object):
+    """Asynchronous counterpart of :class:`ReceiptPoller`: waits for the
+    receipts of any number of transactions with a single task, which
+    checks the latest block number every `poll_interval` seconds and
+    fetches the receipts of all of the waited transactions with one
+    batch per new block."""
+
+    def __init__(self, rpc: AsyncRPC, poll_interval: float = 0.1) -> None:
+        self.rpc = rpc
+        self.poll_interval = poll_interval
+        # transaction hash -> [future, waiters, block number the
+        # receipt was last looked for at]
+        self.waiting: Dict[str, List[Any]] = {}
+        self.task: Optional[asyncio.Future] = None
+
+    async def wait(self, tx_hash: str, timeout: float = 120) -> AttributeDict:
+        """Waits for the receipt of the transaction `tx_hash` and returns
+        it. Raises `TimeExhausted` if it is not mined within `timeout`
+        seconds."""
+        entry = self.waiting.get(tx_hash)
+        if entry is None:
+            entry = self.waiting[tx_hash] = [
+                asyncio.get_event_loop().create_future(), 0, None]
+        entry[1] += 1
+
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._run())
+
+        try:
+            # the future is shared, only stop waiting for it
+            return await asyncio.wait_for(asyncio.shield(entry[0]), timeout)
+        except asyncio.TimeoutError:
+            raise TimeExhausted(
+                "Transaction {} is not in the chain after {} seconds"
+                .format(tx_hash, timeout))
+        finally:
+            entry[1] -= 1
+            if entry[1] <= 0 and self.waiting.get(tx_hash) is entry:
+                del self.waiting[tx_hash]
+
+    async def _run(self) -> None:
+        try:
+            while self.waiting:
+                try:
+                    await self._poll()
+                except Exception as e:
+                    # the node may be temporarily unavailable, try again
+                    logger.warning("Polling receipts failed: %s", e)
+
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self.task = None
+
+    async def _poll(self) -> None:
+        block_number = int(await self.rpc.request("eth_blockNumber", []), 16)
+
+        due = [tx_hash for tx_hash, entry in self.waiting.items()
+               if entry[2] != block_number]
+        if not due:
+            return
+
+        receipts = await self.rpc.batch(
+            [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in due])
+
+        for tx_hash, receipt in zip(due, receipts):
+            entry = self.waiting.get(tx_hash)
+            if entry is None:
+                continue
+
+            entry[2] = block_number
+            if receipt is not None:
+                del self.waiting[tx_hash]
+                if not entry[0].done():
+                    entry[0].set_result(
+                        AttributeDict.recursive(receipt_formatter(receipt)))
+
+
+class AsyncWeb3Contract(AsyncContract):
+    """Asynchronous implementation of the :class:`AsyncContract`
+    interface for Ethereum. It wraps a :class:`Web3Contract`, which is
+    used for encoding the calls and decoding their results, but talks
+    to the node over its own asynchronous HTTP connection (the node of
+    `contract` unless `endpoint_uri` is given).
+
+    Reads are sent the same way as with :class:`Web3Contract`, as
+    JSON-RPC batches or through the read aggregator. Transactions are
+    sent from the minter account of `contract` with
+    `eth_sendTransaction`, and their receipts are waited for at most
+    `timeout` seconds with an :class:`AsyncReceiptPoller` polling
+    every `poll_interval` seconds.
+    """
+
+    def __init__(self,
+                 contract: Web3Contract,
+                 endpoint_uri: str = None,
+                 session=None,
+                 poll_interval: float = 0.1,
+                 timeout: float = 120) -> None:
+        self.sync = contract
+        self.contract = contract.contract
+        self.minter = contract.minter
+        self.rpc = AsyncRPC(
+            endpoint_uri or contract.web3.provider.endpoint_uri, session)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.receipts = AsyncReceiptPoller(self.rpc, poll_interval)
+        self.last_block_number = None
+        self.last_gas_used = None
+
+    async def _block(self, consistent: bool = True) -> Any:
+        """Returns the block the reads are made in, see
+        :meth:`Web3Contract._block`"""
+        if self.sync.block_identifier is not None:
+            return self.sync.block_identifier
+
+        blocks = self.sync.blocks
+        if not consistent and not blocks.max_age:
+            return 'latest'
+        number = blocks.cached()
+        if number is None:
+            number = blocks.update(
+                int(await self.rpc.request("eth_blockNumber", []), 16))
+        return number
+
+    async def _call_many(self, calls: List[Any],
+                         block_identifier: Any = None) -> List[Any]:
+        """Executes the given contract function calls in the same block
+        (by default the one of :meth:`_block`) and returns their
+        results in the same order. The results are cached in the call
+        cache of the wrapped contract, see
+        :meth:`Web3Contract._call_many`."""
+        if block_identifier is None:
+            block_identifier = await self._block(len(calls) > 1)
+
+        cache = self.sync.cache
+        keys = [cache.key(block_identifier, call) for call in calls]
+        values = [cache.get(key) if key is not None else CallCache._missing
+                  for key in keys]
+        missing = [i for i, value in enumerate(values)
+                   if value is CallCache._missing]
+
+        for call, value in zip(calls, values):
+            if value is not CallCache._missing:
+                self.sync.instrumentation.cached(call.fn_name)
+
+        if missing:
+            loop = asyncio.get_event_loop()
+            start = loop.time()
+            fetched = await self._fetch_many([calls[i] for i in missing],
+                                             block_identifier)
+            self.sync._instrument_calls([calls[i] for i in missing],
+                                        [keys[i] for i in missing],
+                                        loop.time() - start)
+            for i, value in zip(missing, fetched):
+                values[i] = value
+                if keys[i] is not None:
+                    cache.put(keys[i], value)
+
+        return values
+
+    async def _fetch_many(self, calls: List[Any],
+                          block_identifier: Any) -> List[Any]:
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+
+        multicall = self.sync.multicall
+        if multicall is None:
+            size = self.sync.max_batch_size
+            chunks = [calls[i:i + size] for i in range(0, len(calls), size)]
+            results = await asyncio.gather(*(
+                self.rpc.batch([("eth_call", [self._tx(call),
+                                              block_identifier])
+                                for call in chunk])
+                for chunk in chunks))
+
+            return [decode_call_output(self.sync.web3, call,
+                                       bytes.fromhex(result[2:]))
+                    for call, result in zip(calls, itertools.chain(*results))]
+
+        # the first chunk pins the block of the rest, see Multicall
+        values: List[Any] = []
+        for i in range(0, len(calls), multicall.max_size):
+            chunk = calls[i:i + multicall.max_size]
+            aggregate = multicall.contract.functions.aggregate([
+                (call.address, call._encode_transaction_data())
+                for call in chunk])
+
+            result = await self.rpc.request(
+                "eth_call", [self._tx(aggregate), block_identifier])
+            block_number, success, return_data = decode_call_output(
+                self.sync.web3, aggregate, bytes.fromhex(result[2:]))
+            block_identifier = hex(block_number)
+
+            for call, ok, data in zip(chunk, success, return_data):
+                if not ok:
+                    raise ValueError(
+                        "aggregated call {} failed".format(call))
+                values.append(decode_call_output(self.sync.web3, call, data))
+
+        return values
+
+    async def _call(self, call) -> Any:
+        return (await self._call_many([call]))[0]
+
+    @staticmethod
+    def _tx(call) -> Dict[str, Any]:
+        return {"to": call.address, "data": call._encode_transaction_data()}
+
+    async def _gas(self, call) -> int:
+        """Returns the gas limit of `call`, using the gas estimator of the
+        wrapped contract"""
+        estimator = self.sync.gas
+        limit = estimator.lookup(call)
+        if limit is not None:
+            return limit
+
+        tx = dict(self._tx(call), **{"from": self.minter})
+        cache = False
+        try:
+            estimate = int(await self.rpc.request("eth_estimateGas", [tx]),
+                           16)
+            if estimator.cached(call):
+                result = await self.rpc.request("eth_call", [tx, "latest"])
+                cache = estimator.succeeded(call, decode_call_output(
+                    self.sync.web3, call, bytes.fromhex(result[2:])))
+        except Exception as e:
+            logger.warning("Estimating gas failed: %s", e)
+            estimate = None
+        return estimator.add(call, estimate, cache)
+
+    async def _transact(self, call) -> AttributeDict:
+        """Sends the contract function call `call` as a transaction and
+        waits for its receipt"""
+        instrumentation = self.sync.instrumentation
+        gas = await self._gas(call)
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        try:
+            tx_hash = await self.rpc.request("eth_sendTransaction", [
+                dict(self._tx(call), gas=hex(gas), **{"from": self.minter})])
+        except Exception:
+            instrumentation.transaction(call.fn_name, 0, None, False)
+            raise
+
+        receipt = await self.receipts.wait(tx_hash, self.timeout)
+        gas_used, status = receipt['gasUsed'], bool(receipt['status'])
+        instrumentation.transaction(call.fn_name, loop.time() - start,
+                                    gas_used, status)
+
+        self.last_block_number = receipt['blockNumber']
+        self.last_gas_used = gas_used
+        self.sync.blocks.seen(receipt['blockNumber'])
+        self.sync.gas.observe(call, gas, gas_used, status)
+
+        return receipt
+
+    async def get_open_request_ids(self) -> List[int]:
+        return self.sync.status1(await self._call(
+            self.contract.functions.getOpenRequestIdentifiers()))
+
+    async def get_closed_request_ids(self) -> List[int]:
+        return self.sync.status1(await self._call(
+            self.contract.functions.getClosedRequestIdentifiers()))
+
+    async def get_request_ids(self) -> List[int]:
+        open_ids, closed_ids = await self._call_many([
+            self.contract.functions.getOpenRequestIdentifiers(),
+            self.contract.functions.getClosedRequestIdentifiers()])
+
+        return self.sync.status1(open_ids) + self.sync.status1(closed_ids)
+
+    async def get_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        if 'getOpenRequestIdentifiersRange' not in self.sync.abi_names:
+            return await super().get_request_ids_page(offset, limit)
+
+        functions = self.contract.functions
+        open_ids, open_total = self.sync.status(await self._call(
+            functions.getOpenRequestIdentifiersRange(offset, limit)))
+
+        closed_ids, closed_total = self.sync.status(await self._call(
+            functions.getClosedRequestIdentifiersRange(
+                max(0, offset - open_total), limit - len(open_ids))))
+
+        return open_ids + closed_ids, open_total + closed_total
+
+    async def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
+        result = (await self.get_requests_bulk([request_id]))[0]
+
+        if result is not None:
+            del result['extra']
+
+        return result
+
+    async def get_request_extra(self, request_id: int) -> Any:
+        calls, parse = self.sync._request_extra_reads(request_id)
+        return parse(await self._call_many(calls))
+
+    async def get_requests_bulk(self, request_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        calls, parse = self.sync._requests_bulk_reads(request_ids)
+        return parse(await self._call_many(calls))
+
+    async def get_offer(self, offer_id: int) -> Optional[Dict[str, Any]]:
+        result = (await self.get_offers_bulk([offer_id]))[0]
+
+        if result is not None:
+            del result['extra']
+
+        return result
+
+    async def get_offer_extra(self, offer_id: int) -> Any:
+        calls, parse = self.sync._offer_extra_reads(offer_id)
+        return parse(await self._call_many(calls))
+
+    async def get_offers_bulk(self, offer_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        calls, parse = self.sync._offers_bulk_reads(offer_ids)
+        return parse(await self._call_many(calls))
+
+    async def add_request(self, deadline: int) -> int:
+        try:
+            tx_receipt = await self._transact(
+                self.contract.functions.submitRequest(deadline))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
+
+        adds = self.contract.events.RequestAdded().processReceipt(tx_receipt)
+        assert len(adds) == 1, "This should not happen"
+        return adds[0].args.requestID
+
+    async def add_request_extra(self, request_id: int,
+                                extra: List[Any]) -> bool:
+        try:
+            await self._transact(
+                self.contract.functions.submitRequestArrayExtra(
+                    request_id, extra))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return False
+
+        return True
+
+    async def add_request_with_extra(self, deadline: int,
+                                     extra: List[Any]) -> int:
+        if not self.sync.has_combined_submits:
+            return await super().add_request_with_extra(deadline, extra)
+
+        try:
+            tx_receipt = await self._transact(
+                self.contract.functions.submitRequestWithExtra(
+                    deadline, extra))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
+
+        return self.sync._added_ids([tx_receipt], 'RequestAdded',
+                                    'requestID')[0]
+
+    async def add_offer(self, request_id: int) -> int:
+        try:
+            tx_receipt = await self._transact(
+                self.contract.functions.submitOffer(request_id))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
+
+        adds = self.contract.events.OfferAdded().processReceipt(tx_receipt)
+        assert len(adds) == 1, "This should not happen"
+        return adds[0].args.offerID
+
+    async def add_offer_extra(self, offer_id: int, extra: List[Any]) -> bool:
+        await self._transact(
+            self.contract.functions.submitOfferArrayExtra(offer_id, extra))
+        return True
+
+    async def add_offer_with_extra(self, request_id: int,
+                                   extra: List[Any]) -> int:
+        if not self.sync.has_combined_submits:
+            return await super().add_offer_with_extra(request_id, extra)
+
+        try:
+            tx_receipt = await self._transact(
+                self.contract.functions.submitOfferWithExtra(
+                    request_id, extra))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
+
+        return self.sync._added_ids([tx_receipt], 'OfferAdded', 'offerID')[0]
+
+    async def close_request(self, request_id: int) -> bool:
+        await self._transact(self.contract.functions.closeRequest(request_id))
+        return request_id in await self.get_closed_request_ids()
+
+    async def decide_request(self, request_id: int,
+                             selected_offer_ids: List[int] = []) -> bool:
+        await self._transact(self.contract.functions.decideRequest(
+            request_id, selected_offer_ids))
+        return cast(bool, self.sync.status1(await self._call(
+            self.contract.functions.isRequestDecided(request_id))))
+
+    async def delete_request(self, request_id: int) -> bool:
+        try:
+            await self._transact(
+                self.contract.functions.deleteRequest(request_id))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return False
+
+        return not self.sync.status1(await self._call(
+            self.contract.functions.isRequestDefined(request_id)))
+
+    async def get_type(self) -> str:
+        return self.sync.status1(
+            await self._call(self.contract.functions.getType()))
@@ -1,4 +1,5 @@
 import os
+import threading
 from configparser import ConfigParser
 import redis
 import json
@@ -11,7 +12,9 @@ import time
 from flask_restful import Resource, Api, abort
 import requests
 
-from sofie_offer_marketplace.backend.utils import parse_ethereum, get_web3contract, parse_events
+from sofie_offer_marketplace.backend.utils import parse_ethereum, parse_options, parse_index, get_web3contract, parse_events
+from sofie_offer_marketplace.indexer import Index, Indexer
+from sofie_offer_marketplace.scanner import Checkpoint, LogScanner
 
 """ Parsing configurations
 """
@@ -22,13 +25,53 @@ parser.read(configuration_file)
 url, contract_address, minter, artifact = parse_ethereum(parser)
 
 # prepare marketplace instance for the resources
-marketplace = get_web3contract(url, contract_address, minter, artifact)
+marketplace = get_web3contract(url, contract_address, minter, artifact,
+                               **parse_options(parser))
+
+# local index of the marketplace state, if one is configured, see
+# start_indexer
+index_path = parse_index(parser)
+indexer = None
+indexer_lock = threading.Lock()
+
+
+def start_indexer():
+    """
+    Synchronizes the local index with the contract and starts keeping
+    it up to date from the logs, if an index is configured. Only the
+    processes serving the API need the index, so this is done when the
+    server starts (not on import, e.g. in the Celery workers).
+    """
+    global indexer
+    with indexer_lock:
+        if indexer is None and index_path:
+            started = Indexer(marketplace, Index(index_path),
+                              marketplace.contract)
+            started.start(marketplace.web3, contract_address)
+            indexer = started
+
+
+def get_reader():
+    """
+    Returns what reads are served from: the local index once it has
+    been started, otherwise the contract.
+    """
+    return indexer.index if indexer is not None else marketplace
+
+
+def refresh_index(request_ids=(), offer_ids=()):
+    """
+    Updates the index after a write so that the change is visible to
+    the following reads without waiting for the logs.
+    """
+    if indexer is not None:
+        indexer.refresh(request_ids=request_ids, offer_ids=offer_ids)
 
 # prepare events for callback resources
 events, event_input_types = parse_events(artifact)
 
-# create filter for all events
-event_filters = {} # key: event name, value: event filter
+# topics of all events, the logs of all events are scanned together
+event_topics = []
 
 hash2event = {} # key: string of event signature hash, value: event name
 
@@ -45,12 +88,7 @@ for event_name in events:
 
     event_signature_hash = Web3.keccak(text=event_signature).hex()
     hash2event[str(event_signature_hash)] = event_name
-
-    event_filter = marketplace.web3.eth.filter({
-        "address": contract_address,
-        "topics": [event_signature_hash],
-    })
-    event_filters[event_name] = event_filter
+    event_topics.append(event_signature_hash)
 
 # store subscriptions, event_subscriptions into redis
 redis_server = os.getenv("REDIS_HOST", "localhost")
@@ -60,6 +98,24 @@ r.set('subscriptions', json.dumps(subscriptions))
 r.set('event_subscriptions', json.dumps(event_subscriptions))
 
 
+class RedisCheckpoint(Checkpoint):
+    """
+    Log scanner checkpoint stored in redis under `key`, so that the
+    event callbacks continue from the last processed block when the
+    worker is restarted.
+    """
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+
+    def load(self):
+        state = r.get(self.key)
+        return json.loads(state.decode('utf-8')) if state else None
+
+    def save(self, state):
+        r.set(self.key, json.dumps(state))
+
+
 """ Have Flask application
 """
 app = Flask(__name__)
@@ -89,14 +145,21 @@ app.config.update(
 
 celery = make_celery(app)
 
-def call_subscribers(event_name: str, payload: str = '', subs: list = []):
+# the index is started by the server, see start_indexer
+app.before_first_request(start_indexer)
+
+def call_subscribers(event_name: str, payload: str = '', subs: list = [],
+                     retracted: bool = False):
     """
     Calls callbacks which are registered to this event
     """
     # construct request object used for callbacks
-    callback_request = {}
+    callback_request: dict = {}
     callback_request['event'] = event_name
     callback_request['payload'] = payload # str, json serializable
+    if retracted:
+        # the event was removed from the chain by a reorganization
+        callback_request['retracted'] = True
 
     # prepare subscription data
     subscriptions = json.loads(r.get('subscriptions').decode('utf-8'))
@@ -119,7 +182,7 @@ def call_subscriber(url: str, callback_request: dict):
         print(f"Callback at {url} invoked, with response: {res.status_code, res.json()}")
 
 
-def trigger_callbacks_by_event(event_name, payload=''):
+def trigger_callbacks_by_event(event_name, payload='', retracted=False):
 
     print(f"triggering event: {event_name}...")
 
@@ -129,32 +192,49 @@ def trigger_callbacks_by_event(event_name, payload=''):
         print("no subscription")
     else:
         subs = event_subscriptions[event_name]
-        call_subscribers(event_name, payload, subs)
+        call_subscribers(event_name, payload, subs, retracted)
 
 
 @celery.task()
 def launch_event_filters(events):
-    while True:
-        captured = False
-        for event in events:
-            # listening for events
-            entries = event_filters[event].get_new_entries()
-            if entries:
-                captured = True
-                for entry in entries:
-                    # parse entry for event name & data payload
-                    signature_hash = str(entry['topics'][0].hex())
-                    data_payload = entry['data'] # str
-                    event_name = hash2event[signature_hash]
-                    try:
-                        trigger_callbacks_by_event(event_name, data_payload)
-                    except Exception as e:
-                        print(e)
-                        pass
-
-        if not captured:
-            print("no events emitted...")
-        time.sleep(5)
+    scanner = LogScanner(marketplace.web3, contract_address,
+                         topics=[event_topics],
+                         checkpoint=RedisCheckpoint('event_checkpoint'))
+
+    # (block number, event name, payload) of the callbacks made for the
+    # blocks that can still be rolled back, the callbacks made before
+    # the worker was restarted are not known
+    delivered = []
+
+    def handle(entries):
+        for entry in entries:
+            # parse entry for event name & data payload
+            signature_hash = str(entry['topics'][0].hex())
+            data_payload = entry['data'] # str
+            event_name = hash2event[signature_hash]
+            if event_name not in events:
+                continue
+            delivered.append((entry['blockNumber'], event_name, data_payload))
+            try:
+                trigger_callbacks_by_event(event_name, data_payload)
+            except Exception as e:
+                print(e)
+
+        oldest = scanner.block - scanner.max_reorg_depth
+        delivered[:] = [d for d in delivered if d[0] > oldest]
+
+    def rollback(block):
+        # tell the subscribers that the events after `block` are no
+        # longer part of the chain, the newest first
+        while delivered and delivered[-1][0] > block:
+            _, event_name, data_payload = delivered.pop()
+            try:
+                trigger_callbacks_by_event(event_name, data_payload,
+                                           retracted=True)
+            except Exception as e:
+                print(e)
+
+    scanner.run(handle, rollback, poll_interval=5)
 
 
 """ Wrap for Flask RESTful
@@ -164,6 +244,7 @@ from sofie_offer_marketplace.backend.information import Information
 from sofie_offer_marketplace.backend.request import RequestState, Request, RequestExtraRegistration, Requests
 from sofie_offer_marketplace.backend.offer import Offer, OfferExtraRegistration, Offers
 from sofie_offer_marketplace.backend.callbacks import SubscriptionEvents, Subscribe, SubscriptionOperations
+from sofie_offer_marketplace.backend.metrics import Metrics
 
 # wrap for Flask RESTful APIs
 api = Api(app)
@@ -171,6 +252,7 @@ api = Api(app)
 # API end points
 # information related
 api.add_resource(Information, '/info')
+api.add_resource(Metrics, '/metrics')
 
 # request related
 api.add_resource(Request, '/request/<int:request_id>')
@@ -194,4 +276,5 @@ api.add_resource(SubscriptionOperations, '/subscription/<string:subscription_id>
 """ Manual run as main script
 """
 if __name__ == "__main__":
+    start_indexer()
     app.run(debug=True)
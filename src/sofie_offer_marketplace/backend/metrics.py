@@ -0,0 +1,11 @@
+from flask import Response
+from flask_restful import Resource
+
+from .app import marketplace
+
+
+class Metrics(Resource):
+    def get(self):
+        # contract calls and transactions in the Prometheus text format
+        return Response(marketplace.instrumentation.to_prometheus(),
+                        mimetype="text/plain; version=0.0.4")
@@ -1,13 +1,13 @@
 from flask import Flask, request
 from flask_restful import Resource, abort
 
-from .app import marketplace
-from .utils import get_offer_response
+from .app import marketplace, get_reader, refresh_index
+from .utils import get_offer_response, get_offers_response
 
 
 class Offer(Resource):
     def get(self, offer_id):
-        res = get_offer_response(marketplace, offer_id)
+        res = get_offer_response(get_reader(), offer_id)
         if res:
             return res
         abort(404, message="Not found, undefined object")
@@ -32,6 +32,7 @@ class OfferExtraRegistration(Resource):
         res = marketplace.add_offer_extra(offer_id, extra)
         
         if res:
+            refresh_index(offer_ids=[offer_id])
             return {"offer_id": offer_id}
         else:
             abort(400, message="Bad request")
@@ -40,17 +41,17 @@ class OfferExtraRegistration(Resource):
 class Offers(Resource):
     def get(self):
         # collect offer ids
+        reader = get_reader()
         offer_ids = []
-        request_ids = marketplace.get_request_ids()
-        for request_id in request_ids:
-            request = marketplace.get_request(request_id)
-            offer_ids += request['offer_ids']
+        request_ids = reader.get_request_ids()
+        for request in reader.get_requests_bulk(request_ids):
+            # deleted in between
+            if request is not None:
+                offer_ids += request['offer_ids']
         
         # collect offers
-        offers = []
         # TODO: add logic for ids only option
-        for offer_id in offer_ids:
-            offers.append(get_offer_response(marketplace, offer_id))
+        offers = get_offers_response(reader, offer_ids)
         return {'offers': offers}
 
     def post(self):
@@ -64,6 +65,7 @@ class Offers(Resource):
         offer_id = marketplace.add_offer(request_id)
 
         if offer_id >= 0:
+            refresh_index(request_ids=[request_id])
             return {
                 "offer_id": offer_id
             }
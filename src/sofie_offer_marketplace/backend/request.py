@@ -1,8 +1,8 @@
 from flask import Flask, request
 from flask_restful import Resource, abort
 
-from .app import marketplace
-from .utils import get_request_response
+from .app import marketplace, get_reader, refresh_index
+from .utils import get_request_response, get_requests_response
 
 
 class RequestState:
@@ -14,7 +14,7 @@ class RequestState:
 
 class Request(Resource):
     def get(self, request_id):
-        res = get_request_response(marketplace, request_id)
+        res = get_request_response(get_reader(), request_id)
         if res:
             return res
         abort(404, message="Not found, undefined object")
@@ -44,6 +44,7 @@ class Request(Resource):
         if state == RequestState.Closed:
             isclosed = marketplace.close_request(request_id)
             if isclosed:
+                refresh_index(request_ids=[request_id])
                 return {"state": RequestState.Closed}
             else:
                 abort(401, "Failed, authorization required")
@@ -62,6 +63,7 @@ class Request(Resource):
             isdecided = marketplace.decide_request(request_id, selected_offer_ids)
             
             if isdecided:
+                refresh_index(request_ids=[request_id])
                 return {"state": RequestState.Decided}
             else:
                 abort(401, "Failed, authorization required")
@@ -69,6 +71,7 @@ class Request(Resource):
     def delete(self, request_id):
         res = marketplace.delete_request(request_id)
         if res == True:
+            refresh_index(request_ids=[request_id])
             return "Deleted", 204
         else: 
             abort(400, message="Bad request")
@@ -91,6 +94,7 @@ class RequestExtraRegistration(Resource):
 
         res = marketplace.add_request_extra(request_id, extra)
         if res:
+            refresh_index(request_ids=[request_id])
             return
         else:
             abort(400, message="Bad request")
@@ -104,33 +108,64 @@ class Requests(Resource):
             state_filter = "open" # default to open
         # TODO: add logic for ids only option
 
+        # pagination, the cursor is the position in the request identifier
+        # list of the state where the next page starts. The page is read
+        # with the range getters of the contract, or from the index if
+        # there is one, so the cost of a page does not grow with the
+        # number of requests.
+        limit = request.args.get('limit')
+        cursor = request.args.get('cursor')
+        if limit is not None:
+            try:
+                limit = int(limit)
+                cursor = int(cursor) if cursor is not None else 0
+                assert limit > 0 and cursor >= 0
+            except (ValueError, AssertionError):
+                abort(400, message="Bad request, invalid cursor or limit")
+
         # collect requests
+        reader = get_reader()
         requests = []
-        open_requests_ids = marketplace.get_open_request_ids()
-        closed_requests_ids = marketplace.get_closed_request_ids()
-
-        if state_filter == "closed":
-            request_ids = closed_requests_ids
+        if limit is not None:
+            if state_filter == "closed" or state_filter == "decided":
+                request_ids, total = reader.get_closed_request_ids_page(
+                    cursor, limit)
+            elif state_filter == "open":
+                request_ids, total = reader.get_open_request_ids_page(
+                    cursor, limit)
+            else: # "all"
+                request_ids, total = reader.get_request_ids_page(
+                    cursor, limit)
+            next_cursor = cursor + len(request_ids)
+            # a request decided after being closed is in the closed list
+            # twice
+            request_ids = list(dict.fromkeys(request_ids))
+        elif state_filter == "closed":
+            request_ids = reader.get_closed_request_ids()
         elif state_filter == "open":
-            request_ids = open_requests_ids
+            request_ids = reader.get_open_request_ids()
         else: # "all" or "decided"
-            request_ids = open_requests_ids + closed_requests_ids
+            request_ids = reader.get_request_ids()
 
         if state_filter == "decided":
-            for request_id in request_ids:
-                request_response = get_request_response(marketplace, request_id)
+            for request_response in get_requests_response(reader, request_ids):
                 if request_response['state'] == "decided":
                     requests.append(request_response)
         else:
-            for request_id in request_ids:
-                request_response = get_request_response(marketplace, request_id)
-                requests.append(request_response) 
+            requests = get_requests_response(reader, request_ids)
+
+        if limit is not None:
+            return {
+                "requests": requests,
+                "next_cursor": next_cursor if next_cursor < total else None
+            }
         return {"requests": requests}
 
     def post(self):
         deadline = int(request.get_json()['deadline']) # 2000000000
         request_id = marketplace.add_request(deadline)
         if request_id >= 0:
+            refresh_index(request_ids=[request_id])
             return {
                 "id": request_id
             }
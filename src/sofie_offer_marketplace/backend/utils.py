@@ -4,6 +4,10 @@ from datetime import datetime
 from web3 import Web3
 
 from sofie_offer_marketplace.ethereum import Web3Contract
+from sofie_offer_marketplace.metrics import RPCMetrics
+from sofie_offer_marketplace.providers import (MultiEndpointProvider,
+                                               provider_for)
+from sofie_offer_marketplace.transactions import GasEstimator, NonceManager
 
 
 def parse_ethereum(parser, network="marketplace"):
@@ -19,78 +23,167 @@ def parse_ethereum(parser, network="marketplace"):
   return url, contract_address, minter, artifact
 
 
-def get_web3contract(url, contract_address, minter, artifact):
-    protocol = url.split(":")[0].lower()
+def parse_options(parser, network="marketplace"):
+    """
+    Parses the optional settings of the network section, these are
+    returned as a dictionary to be passed as keyword arguments to
+    :func:`get_web3contract`.
+    """
+    c = parser[network]
+    options = {}
+
+    if c.get('aggregator'):
+        options['aggregator'] = Web3.toChecksumAddress(c['aggregator'])
+
+    if c.get('nonce_lock'):
+        options['nonce_lock'] = c['nonce_lock']
+
+    if c.get('gas_multiplier'):
+        options['gas_multiplier'] = float(c['gas_multiplier'])
+
+    if c.get('max_gas'):
+        options['max_gas'] = int(c['max_gas'])
+
+    if c.get('block_max_age'):
+        options['block_max_age'] = float(c['block_max_age'])
+
+    if c.get('call_cache_size'):
+        options['call_cache_size'] = int(c['call_cache_size'])
 
-    # create the web3 instance
-    if protocol in ("http", "https"):
-        w3 = Web3(Web3.HTTPProvider(url))
-    elif protocol in ("ws", "wss"):
-        w3 = Web3(Web3.WebsocketProvider(url))
+    if c.get('read_strategy'):
+        options['read_strategy'] = c['read_strategy']
+
+    if c.get('hedge_percentile'):
+        options['hedge_percentile'] = float(c['hedge_percentile']) or None
+
+    http_options = {}
+    if c.get('rpc_pool_size'):
+        http_options['pool_size'] = int(c['rpc_pool_size'])
+    if c.get('rpc_keep_alive'):
+        http_options['keep_alive'] = c.getboolean('rpc_keep_alive')
+    if c.get('rpc_timeout'):
+        http_options['timeout'] = float(c['rpc_timeout'])
+    if c.get('rpc_connect_timeout'):
+        http_options['connect_timeout'] = float(c['rpc_connect_timeout'])
+    if c.get('rpc_compression'):
+        http_options['compression'] = c.getboolean('rpc_compression')
+    if http_options:
+        options['http_options'] = http_options
+
+    return options
+
+
+def parse_index(parser, network="marketplace"):
+    """
+    Returns the path of the local index database of the network
+    section, or None if the index is not configured.
+    """
+    return parser[network].get('index') or None
+
+
+def get_web3contract(url, contract_address, minter, artifact,
+                     aggregator=None, nonce_lock=None, gas_multiplier=None,
+                     max_gas=None, block_max_age=1.0, call_cache_size=10000,
+                     read_strategy='round_robin', hedge_percentile=0.95,
+                     http_options=None):
+    # create the web3 instance, `url` may list several nodes separated
+    # by commas, the first one of them getting the transactions
+    urls = [u.strip() for u in url.split(",") if u.strip()]
+
+    # calls, transactions and retries for the /metrics end point
+    metrics = RPCMetrics()
+
+    if len(urls) > 1:
+        w3 = Web3(MultiEndpointProvider(urls,
+                                        strategy=read_strategy,
+                                        hedge_percentile=hedge_percentile,
+                                        http_options=http_options,
+                                        instrumentation=metrics))
     else:
-        raise ValueError("Unsupported Web3 protocol")
+        w3 = Web3(provider_for(urls[0], **(http_options or {})))
+
+    # nonces shared by the processes using the same lock file
+    nonce_manager = NonceManager(w3, minter, nonce_lock) \
+        if nonce_lock else None
+
+    gas_estimator = GasEstimator(max_gas=max_gas)
+    if gas_multiplier is not None:
+        gas_estimator.multiplier = gas_multiplier
 
     # instantiate the web3 contract for interaction
     return Web3Contract(
         web3=w3,
         contract_address=contract_address,
         contract_interface=artifact,
-        minter=minter)
+        minter=minter,
+        aggregator=aggregator,
+        nonce_manager=nonce_manager,
+        gas_estimator=gas_estimator,
+        block_max_age=block_max_age,
+        call_cache_size=call_cache_size,
+        instrumentation=metrics)
 
 
 def get_request_response(marketplace, request_id):
-    status, deadline, stage, request_maker = marketplace.contract.functions.getRequest(
-        request_id).call()
-    # undefined request id
-    if status == 2:
-        return
-    extra = marketplace.get_request_extra(request_id)
-
-    is_decided = marketplace.status1(
-        marketplace.contract.functions.isRequestDecided(request_id).call())
-    if is_decided:
+    return get_requests_response(marketplace, [request_id])[0]
+
+
+def get_requests_response(marketplace, request_ids):
+    """
+    Returns the responses of the given requests, fetched with a single
+    bulk read. Undefined requests are returned as None.
+    """
+    return [
+        _request_response(request_id, request) if request else None
+        for request_id, request in zip(
+            request_ids, marketplace.get_requests_bulk(request_ids))]
+
+
+def _request_response(request_id, request):
+    if request['is_decided']:
         state = "decided"
-        decision_time = marketplace.status1(
-            marketplace.contract.functions.getRequestDecisionTime(request_id).call())
-        decision_time = str(datetime.fromtimestamp(decision_time))
+        decision_time = str(datetime.fromtimestamp(request['decision_time']))
     else:
-        state = ("pending", "open", "closed")[stage]
+        state = ("pending", "open", "closed")[
+            [request['is_pending'], request['is_open'],
+             request['is_closed']].index(True)]
         decision_time = None
 
-    offer_ids = marketplace.status1(
-        marketplace.contract.functions.getRequestOfferIDs(request_id).call())
-
-    decided_ids = marketplace.status1(marketplace.contract.functions.getRequestDecision(
-        request_id).call()) if is_decided else []
-
     return {
         "id": request_id,
-        "from": request_maker,
-        "deadline": str(datetime.fromtimestamp(deadline)),
-        "extra": extra,
+        "from": request['request_maker'],
+        "deadline": str(datetime.fromtimestamp(request['deadline'])),
+        "extra": request['extra'],
         "state": state,
-        "offers": offer_ids,
-        "decision": decided_ids,
+        "offers": request['offer_ids'],
+        "decision": request['decided_offer_ids'],
         "decided": decision_time
     }
 
 
 def get_offer_response(marketplace, offer_id):
-    offer = marketplace.get_offer(offer_id)
-    if not offer:
-        return
-    request_id = offer['request_id']
-    author = offer['author']
-    stage = offer['stage']
-    state = ("pending", "open", "closed")[stage]
+    return get_offers_response(marketplace, [offer_id])[0]
+
+
+def get_offers_response(marketplace, offer_ids):
+    """
+    Returns the responses of the given offers, fetched with a single
+    bulk read. Undefined offers are returned as None.
+    """
+    return [
+        _offer_response(offer_id, offer) if offer else None
+        for offer_id, offer in zip(
+            offer_ids, marketplace.get_offers_bulk(offer_ids))]
+
 
-    extra = marketplace.get_offer_extra(offer_id) if state != "pending" else None
+def _offer_response(offer_id, offer):
+    state = ("pending", "open", "closed")[offer['stage']]
 
     return {
         "id": offer_id,
-        "request_id": request_id,
-        "author": author,
-        "extra": extra,
+        "request_id": offer['request_id'],
+        "author": offer['author'],
+        "extra": offer['extra'] if state != "pending" else None,
         "state": state
     }
 
@@ -0,0 +1,194 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Read-through cache of the request and offer data read from a
+contract, see :class:`ContractCache`.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import (Any, Callable, Dict, Hashable, Iterable, List, Optional,
+                    Set, Tuple)
+
+from .core import Contract
+from .scanner import LogDecoder, LogScanner
+
+
+class LRUCache(object):
+    """Cache of at most `max_size` entries which expire `ttl` seconds
+    after they were stored (never if it is None), the least recently
+    used entries are evicted first. Permanent entries never expire, but
+    are evicted like the others."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 30.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: 'OrderedDict[Hashable, Tuple[Optional[float], Any]]' = \
+            OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the value stored for `key`, or None if there is none"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires is not None and expires <= self.clock():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any, permanent: bool = False) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+            expires = self.clock() + self.ttl \
+                if self.ttl is not None and not permanent else None
+            self.entries[key] = (expires, value)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class ContractCache(object):
+    """Read-through cache of the data returned by the bulk read methods of
+    :class:`Contract`, used by :class:`Marketplace` when given.
+
+    The entries changed by the writes of the :class:`Marketplace` are
+    invalidated right away, and those changed by others when their
+    events are passed to :meth:`apply_events`, see :meth:`start`.
+    Without the events, changes made by others are only seen when the
+    entries expire after `ttl` seconds.
+
+    Decided requests and offers with their extra data added can only
+    change by the request being deleted, so they never expire. Deleting
+    a request emits no event for the request, so the events of
+    transactions that may have deleted requests clear the cache.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 30.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.requests = LRUCache(max_size, ttl, clock)
+        self.offers = LRUCache(max_size, ttl, clock)
+
+    def get_requests_bulk(self, contract: Contract, request_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        """Returns the data of the requests like
+        :meth:`Contract.get_requests_bulk`, reading only those that are
+        not cached from `contract`"""
+        return self._get_bulk(self.requests, contract.get_requests_bulk,
+                              request_ids, lambda data: data['is_decided'])
+
+    def get_offers_bulk(self, contract: Contract, offer_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        """Returns the data of the offers like
+        :meth:`Contract.get_offers_bulk`, reading only those that are not
+        cached from `contract`"""
+        return self._get_bulk(self.offers, contract.get_offers_bulk,
+                              offer_ids, lambda data: bool(data.get('stage')))
+
+    def invalidate_request(self, request_id: int) -> None:
+        self.requests.invalidate(request_id)
+
+    def invalidate_offer(self, offer_id: int) -> None:
+        self.offers.invalidate(offer_id)
+
+    def clear(self) -> None:
+        self.requests.clear()
+        self.offers.clear()
+
+    def apply_events(self, events: Iterable[Tuple[str, Dict[str, Any], Any]]
+                     ) -> None:
+        """Invalidates the entries changed by the given decoded events, see
+        :class:`sofie_offer_marketplace.scanner.LogDecoder`"""
+        status_only: Set[Any] = set()
+        other: Set[Any] = set()
+
+        for name, args, tx_hash in events:
+            if name == 'FunctionStatus':
+                if args['status'] == 0:
+                    status_only.add(tx_hash)
+                continue
+
+            other.add(tx_hash)
+
+            if 'requestID' in args:
+                self.invalidate_request(args['requestID'])
+
+            if 'offerID' in args:
+                self.invalidate_offer(args['offerID'])
+
+        # successful transactions without other events may have deleted
+        # requests and their offers, see Indexer.apply_events
+        if status_only - other:
+            self.clear()
+
+    def start(self, web3, web3contract, poll_interval: float = 2.0,
+              **kwargs) -> threading.Thread:
+        """Starts a daemon thread that applies the events of `web3contract`
+        (the web3 contract object) from the current block on, polling
+        for new logs every `poll_interval` seconds. Additional keyword
+        arguments are passed to :class:`LogScanner`."""
+        decoder = LogDecoder(web3contract)
+        scanner = LogScanner(web3, web3contract.address, **kwargs)
+
+        thread = threading.Thread(
+            target=scanner.run,
+            args=(lambda logs: self.apply_events(decoder.decode(logs)),
+                  lambda block: self.clear(), poll_interval),
+            name="contract-cache", daemon=True)
+        thread.start()
+        return thread
+
+    def _get_bulk(self, cache: LRUCache,
+                  fetch: Callable[[List[int]], List[Optional[Dict[str, Any]]]],
+                  ids: List[int], is_final: Callable[[Dict[str, Any]], bool]
+                  ) -> List[Optional[Dict[str, Any]]]:
+        results = {}
+        missing = []
+        for id in dict.fromkeys(ids):
+            data = cache.get(id)
+            if data is None:
+                missing.append(id)
+            else:
+                results[id] = data
+
+        if missing:
+            for id, data in zip(missing, fetch(missing)):
+                # undefined identifiers are not cached, they may be
+                # defined by the next transaction
+                if data is not None:
+                    cache.put(id, data, permanent=is_final(data))
+                results[id] = data
+
+        # callers are free to modify what they get
+        return [copy.deepcopy(results[id]) for id in ids]
@@ -13,10 +13,18 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
 # implied.  See the License for the specific language governing
 # permissions and limitations under the License.
+import asyncio
+import threading
+import weakref
 from abc import ABCMeta, abstractmethod
-from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Any, AsyncIterator, Callable, Dict, Iterable, Iterator,
+                    List, Optional, Tuple)
 
 from .exceptions import ManagerAccessRequired, OwnerAccessRequired, UnknownMarketType
+from .snapshot import MarketSnapshot
 
 
 class Contract(metaclass=ABCMeta):
@@ -31,13 +39,25 @@ class Contract(metaclass=ABCMeta):
 
     All of these methods are supposed to be blocking. It is the
     caller's responsibility to use asyncio if they want asynchronous
-    operations.
+    operations, or to use an :class:`AsyncContract` instead.
     """
 
     @abstractmethod
     def get_request_ids(self) -> List[int]:
         """Returns a list of request identifiers"""
 
+    def get_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        """Returns at most `limit` request identifiers starting from the
+        position `offset` of the :meth:`get_request_ids` list, and the
+        total number of request identifiers.
+
+        The default implementation slices the full list, concrete
+        contracts should override this if they can fetch just the
+        page."""
+        request_ids = self.get_request_ids()
+        return request_ids[offset:offset + limit], len(request_ids)
+
     @abstractmethod
     def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
         """Return a common request attributes for the given request id, or
@@ -103,8 +123,371 @@ class Contract(metaclass=ABCMeta):
     def get_type(self) -> str:
         """Returns the type of marketplace"""
 
+    def get_requests_bulk(self, request_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        """Returns the common attributes of multiple requests at once, in
+        the same order as `request_ids`. Each entry is either None (the
+        identifier does not map to a request) or a dictionary like the
+        one returned by :meth:`get_request` with an additional 'extra'
+        key containing what :meth:`get_request_extra` would return.
+
+        The default implementation just calls the per-request methods,
+        concrete contracts should override this if they can fetch the
+        data with fewer round-trips.
+        """
+        results = []
+        for request_id in request_ids:
+            data = self.get_request(request_id)
+            if data is not None:
+                data['extra'] = self.get_request_extra(request_id)
+            results.append(data)
+        return results
+
+    def get_offers_bulk(self, offer_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        """Returns the common attributes of multiple offers at once, in the
+        same order as `offer_ids`. Each entry is either None or a
+        dictionary like the one returned by :meth:`get_offer` with an
+        additional 'extra' key, see :meth:`get_requests_bulk`."""
+        results = []
+        for offer_id in offer_ids:
+            data = self.get_offer(offer_id)
+            if data is not None:
+                data['extra'] = self.get_offer_extra(offer_id)
+            results.append(data)
+        return results
+
+    def add_request_with_extra(self, deadline: int, extra: List[Any]) -> int:
+        """Creates a new request with its extra data, and returns the
+        identifier of the new request, or -1 if either could not be
+        added.
+
+        The default implementation calls :meth:`add_request` and
+        :meth:`add_request_extra`, concrete contracts should override
+        this if they can do both in a single transaction.
+        """
+        request_id = self.add_request(deadline)
+        if request_id == -1 or not self.add_request_extra(request_id, extra):
+            return -1
+        return request_id
+
+    def add_offer_with_extra(self, request_id: int, extra: List[Any]) -> int:
+        """Adds a new offer with its extra data, see
+        :meth:`add_request_with_extra`"""
+        offer_id = self.add_offer(request_id)
+        if offer_id == -1 or not self.add_offer_extra(offer_id, extra):
+            return -1
+        return offer_id
+
+    def add_requests_bulk(self, deadlines: List[int]) -> List[int]:
+        """Creates multiple requests at once, and returns their identifiers
+        in the same order as `deadlines`, -1 for requests that could
+        not be created.
+
+        The default implementation just calls :meth:`add_request` for
+        each request, concrete contracts should override this if they
+        can send the transactions without waiting for each other.
+        """
+        return [self.add_request(deadline) for deadline in deadlines]
+
+    def add_requests_extra_bulk(self, request_ids: List[int],
+                                extras: List[List[Any]]) -> List[bool]:
+        """Adds the extra data to multiple requests at once, see
+        :meth:`add_requests_bulk`"""
+        return [self.add_request_extra(request_id, extra)
+                for request_id, extra in zip(request_ids, extras)]
+
+    def add_offers_bulk(self, request_ids: List[int]) -> List[int]:
+        """Adds an offer for each of the given requests, see
+        :meth:`add_requests_bulk`"""
+        return [self.add_offer(request_id) for request_id in request_ids]
+
+    def add_offers_extra_bulk(self, offer_ids: List[int],
+                              extras: List[List[Any]]) -> List[bool]:
+        """Adds the extra data to multiple offers at once, see
+        :meth:`add_requests_bulk`"""
+        return [self.add_offer_extra(offer_id, extra)
+                for offer_id, extra in zip(offer_ids, extras)]
+
+    def add_requests_with_extra_bulk(self, deadlines: List[int],
+                                     extras: List[List[Any]]) -> List[int]:
+        """Creates multiple requests with their extra data at once, see
+        :meth:`add_request_with_extra` and :meth:`add_requests_bulk`"""
+        request_ids = self.add_requests_bulk(deadlines)
+        extras_ok = self.add_requests_extra_bulk(
+            [request_id for request_id in request_ids if request_id != -1],
+            [extra for request_id, extra in zip(request_ids, extras)
+             if request_id != -1])
+        return self._with_extra_ids(request_ids, extras_ok)
+
+    def add_offers_with_extra_bulk(self, request_ids: List[int],
+                                   extras: List[List[Any]]) -> List[int]:
+        """Adds multiple offers with their extra data at once, see
+        :meth:`add_requests_with_extra_bulk`"""
+        offer_ids = self.add_offers_bulk(request_ids)
+        extras_ok = self.add_offers_extra_bulk(
+            [offer_id for offer_id in offer_ids if offer_id != -1],
+            [extra for offer_id, extra in zip(offer_ids, extras)
+             if offer_id != -1])
+        return self._with_extra_ids(offer_ids, extras_ok)
+
+    @staticmethod
+    def _with_extra_ids(ids: List[int], extras_ok: List[bool]) -> List[int]:
+        """Returns `ids` with -1 for the identifiers whose extra data could
+        not be added, `extras_ok` being the results of adding the extra
+        data for the identifiers other than -1"""
+        results = iter(extras_ok)
+        return [id if id != -1 and next(results) else -1 for id in ids]
+
+
+class AsyncContract(metaclass=ABCMeta):
+    """Asynchronous counterpart of :class:`Contract`. The methods are the
+    same, see :class:`Contract` for their descriptions, but they are
+    coroutines, so that many operations can be in flight at once on a
+    single event loop."""
+
+    @abstractmethod
+    async def get_request_ids(self) -> List[int]:
+        pass
+
+    async def get_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        request_ids = await self.get_request_ids()
+        return request_ids[offset:offset + limit], len(request_ids)
+
+    @abstractmethod
+    async def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def get_request_extra(self, request_id: int) -> Any:
+        pass
+
+    @abstractmethod
+    async def add_request(self, deadline: int) -> int:
+        pass
+
+    @abstractmethod
+    async def add_request_extra(self, request_id: int,
+                                extra: List[Any]) -> bool:
+        pass
+
+    @abstractmethod
+    async def decide_request(self, request_id: int,
+                             selected_offer_ids: List[int] = []) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_offer(self, offer_id: int) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def get_offer_extra(self, request_id: int) -> Any:
+        pass
+
+    @abstractmethod
+    async def add_offer(self, request_id: int) -> int:
+        pass
+
+    @abstractmethod
+    async def add_offer_extra(self, offer_id: int, extra: List[Any]) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_type(self) -> str:
+        pass
+
+    async def get_requests_bulk(self, request_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        """The default implementation reads all of the requests
+        concurrently with the per-request methods."""
+        async def get(request_id):
+            data, extra = await asyncio.gather(
+                self.get_request(request_id),
+                self.get_request_extra(request_id))
+            if data is not None:
+                data['extra'] = extra
+            return data
+
+        return list(await asyncio.gather(*map(get, request_ids)))
+
+    async def get_offers_bulk(self, offer_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        """The default implementation reads all of the offers concurrently
+        with the per-offer methods."""
+        async def get(offer_id):
+            data, extra = await asyncio.gather(
+                self.get_offer(offer_id),
+                self.get_offer_extra(offer_id))
+            if data is not None:
+                data['extra'] = extra
+            return data
+
+        return list(await asyncio.gather(*map(get, offer_ids)))
+
+    async def add_request_with_extra(self, deadline: int,
+                                     extra: List[Any]) -> int:
+        request_id = await self.add_request(deadline)
+        if request_id == -1 or \
+                not await self.add_request_extra(request_id, extra):
+            return -1
+        return request_id
+
+    async def add_offer_with_extra(self, request_id: int,
+                                   extra: List[Any]) -> int:
+        offer_id = await self.add_offer(request_id)
+        if offer_id == -1 or not await self.add_offer_extra(offer_id, extra):
+            return -1
+        return offer_id
+
+    # The default bulk writes send all of the transactions concurrently
+
+    async def add_requests_with_extra_bulk(self, deadlines: List[int],
+                                           extras: List[List[Any]]
+                                           ) -> List[int]:
+        return list(await asyncio.gather(
+            *map(self.add_request_with_extra, deadlines, extras)))
+
+    async def add_offers_with_extra_bulk(self, request_ids: List[int],
+                                         extras: List[List[Any]]
+                                         ) -> List[int]:
+        return list(await asyncio.gather(
+            *map(self.add_offer_with_extra, request_ids, extras)))
+
+    async def add_requests_bulk(self, deadlines: List[int]) -> List[int]:
+        return list(await asyncio.gather(*map(self.add_request, deadlines)))
+
+    async def add_requests_extra_bulk(self, request_ids: List[int],
+                                      extras: List[List[Any]]) -> List[bool]:
+        return list(await asyncio.gather(
+            *map(self.add_request_extra, request_ids, extras)))
+
+    async def add_offers_bulk(self, request_ids: List[int]) -> List[int]:
+        return list(await asyncio.gather(*map(self.add_offer, request_ids)))
+
+    async def add_offers_extra_bulk(self, offer_ids: List[int],
+                                    extras: List[List[Any]]) -> List[bool]:
+        return list(await asyncio.gather(
+            *map(self.add_offer_extra, offer_ids, extras)))
+
+
+class LazyOffers(Sequence):
+    """Read-only list of the offers with the identifiers `offer_ids`,
+    which are read only when they are accessed. Iterating or slicing
+    reads all of the (yet unread) offers at once, indexing reads just
+    the one offer. The length is known without reading anything.
+
+    The offers are read with `load`, which takes a list of offer
+    identifiers and returns a dictionary of offer id -> offer. The read
+    offers are kept in `loaded`, which can be shared between lists so
+    that e.g. the decided offers of a request are not read twice.
+    """
+
+    def __init__(self, offer_ids: Iterable[int],
+                 load: Callable[[List[int]], Dict[int, 'Offer']],
+                 loaded: Dict[int, 'Offer'] = None) -> None:
+        self.offer_ids = list(offer_ids)
+        self.load = load
+        self.loaded = loaded if loaded is not None else {}
+
+    def _load(self, offer_ids: List[int]) -> None:
+        missing = [offer_id for offer_id in offer_ids
+                   if offer_id not in self.loaded]
+        if missing:
+            self.loaded.update(self.load(missing))
+
+    def __len__(self) -> int:
+        return len(self.offer_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            offer_ids = self.offer_ids[index]
+            self._load(offer_ids)
+            return [self.loaded.get(offer_id) for offer_id in offer_ids]
+
+        offer_id = self.offer_ids[index]
+        self._load([offer_id])
+        return self.loaded.get(offer_id)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, LazyOffers)):
+            return self[:] == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return "LazyOffers({!r})".format(self.offer_ids)
+
+
+class OfferIdentityMap(object):
+    """Offer objects shared by the reads of one or more
+    :class:`Marketplace` instances, so that every offer is read and
+    built only once. Only offers whose data cannot change anymore,
+    i.e. which have their extra data added, are kept, and only for as
+    long as they are referenced elsewhere.
+    """
+
+    def __init__(self) -> None:
+        self.offers: 'weakref.WeakValueDictionary[int, Offer]' = \
+            weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+
+    def get_many(self, offer_ids: Iterable[int]) -> Dict[int, 'Offer']:
+        """Returns the known offers of `offer_ids` as a dictionary of offer
+        id -> offer"""
+        with self.lock:
+            offers = {}
+            for offer_id in offer_ids:
+                offer = self.offers.get(offer_id)
+                if offer is not None:
+                    offers[offer_id] = offer
+            return offers
+
+    def add(self, offer_id: int, offer: 'Offer',
+            data: Dict[str, Any]) -> 'Offer':
+        """Stores `offer` built from `data` if it is final, and returns the
+        stored offer of `offer_id` if there already is one"""
+        if not data.get('stage'):
+            return offer
+
+        with self.lock:
+            return self.offers.setdefault(offer_id, offer)
+
+    def discard(self, offer_id: int) -> None:
+        with self.lock:
+            self.offers.pop(offer_id, None)
+
+
+class MarshallerMeta(type):
+    """Metaclass of :class:`Request` and :class:`Offer`. The base classes
+    keep their attributes in slots instead of a per-instance
+    dictionary, which makes a big difference in memory use when there
+    are lots of instances. Subclasses get slots for the attribute names
+    listed in their `extra_fields` attribute, e.g.
+
+        class FlowerOffer(Offer):
+            extra_fields = ('price',)
+
+    Subclasses that list neither `extra_fields` nor `__slots__` get a
+    per-instance dictionary as usual.
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        if '__slots__' not in namespace and 'extra_fields' in namespace:
+            namespace['__slots__'] = tuple(namespace['extra_fields'])
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class Request(object, metaclass=MarshallerMeta):
+    __slots__ = ('request_id', 'deadline', 'is_decided', 'is_pending',
+                 'is_open', 'is_closed', 'offers', 'decided_offers')
+
+    # (name, array typecode) of the values in the extra data, in order,
+    # for MarketSnapshot
+    extra_columns: Tuple[Tuple[str, str], ...] = ()
 
-class Request(object):
     def __init__(self,
                  request_id: int = None,
                  deadline: int = None,
@@ -114,8 +497,8 @@ class Request(object):
                  is_closed: bool = None,
                  # FIXME: when python 3.7 becomes minimum, we can
                  # change to PEP-563
-                 offers: List['Offer'] = [],
-                 decided_offers: List['Offer'] = [],
+                 offers: List['Offer'] = None,
+                 decided_offers: List['Offer'] = None,
                  **kwargs) -> None:
         assert not kwargs, \
             (("Request base class initializer should not "
@@ -127,27 +510,54 @@ class Request(object):
         self.is_pending = is_pending
         self.is_open = is_open
         self.is_closed = is_closed
-        self.offers = offers
-        self.decided_offers = decided_offers
+        self.offers = offers if offers is not None else []
+        self.decided_offers = \
+            decided_offers if decided_offers is not None else []
 
     def marshal_extra(self) -> List[Any]:
         return []
 
+    @classmethod
+    def marshal_extra_batch(cls, requests: List['Request']) -> List[Any]:
+        """Returns the extra data of many requests at once, in the same
+        order. Subclasses can override this to encode the extra data of
+        all requests together."""
+        return [request.marshal_extra() for request in requests]
+
     @classmethod
     def from_data(cls,
                   request_id: int,
                   common: Dict[str, Any],
-                  extra: List[Any] = [],
-                  init_args: Dict[str, Any] = {}):
+                  extra: List[Any] = None,
+                  init_args: Dict[str, Any] = None):
         return cls(request_id=request_id,
-                   deadline=common['deadline'],
-                   is_decided=common['is_decided'],
-                   is_pending=common['is_pending'],
-                   is_open=common['is_open'],
-                   is_closed=common['is_closed'],
-                   offers=common['offers'],
-                   decided_offers=common['decided_offers'],
-                   **init_args)
+                   **cls._common_args(common),
+                   **(init_args or {}))
+
+    @classmethod
+    def from_data_batch(cls,
+                        request_ids: List[int],
+                        commons: List[Dict[str, Any]],
+                        extras: List[Any]) -> List['Request']:
+        """Builds many requests at once, like calling :meth:`from_data` for
+        each of them. Subclasses can override this to decode the extra
+        data of all requests together."""
+        return [cls.from_data(request_id=request_id, common=common,
+                              extra=extra)
+                for request_id, common, extra
+                in zip(request_ids, commons, extras)]
+
+    @staticmethod
+    def _common_args(common: Dict[str, Any]) -> Dict[str, Any]:
+        """Picks the initializer arguments of the base class from the
+        common request data"""
+        return dict(deadline=common['deadline'],
+                    is_decided=common['is_decided'],
+                    is_pending=common['is_pending'],
+                    is_open=common['is_open'],
+                    is_closed=common['is_closed'],
+                    offers=common['offers'],
+                    decided_offers=common['decided_offers'])
 
     @classmethod
     def from_args(cls,
@@ -156,7 +566,12 @@ class Request(object):
         assert False, "Not implemented"
 
 
-class Offer(object):
+class Offer(object, metaclass=MarshallerMeta):
+    # __weakref__ for OfferIdentityMap
+    __slots__ = ('offer_id', 'request_id', 'author', '__weakref__')
+
+    extra_columns: Tuple[Tuple[str, str], ...] = ()
+
     # NOTE: inconsistent... shouldn't request_id be instead request,
     # e.g. request object?
     def __init__(self,
@@ -175,16 +590,33 @@ class Offer(object):
     def marshal_extra(self) -> List[Any]:
         return []
 
+    @classmethod
+    def marshal_extra_batch(cls, offers: List['Offer']) -> List[Any]:
+        """See :meth:`Request.marshal_extra_batch`"""
+        return [offer.marshal_extra() for offer in offers]
+
     @classmethod
     def from_data(cls,
                   offer_id: int,
                   common: Dict[str, Any],
-                  extra: List[Any] = [],
-                  init_args: Dict[str, Any] = {}):
+                  extra: List[Any] = None,
+                  init_args: Dict[str, Any] = None):
         return cls(offer_id=offer_id,
-                   request_id=common['request_id'],
-                   author=common['author'],
-                   **init_args)
+                   **cls._common_args(common),
+                   **(init_args or {}))
+
+    @classmethod
+    def from_data_batch(cls,
+                        offer_ids: List[int],
+                        commons: List[Dict[str, Any]],
+                        extras: List[Any]) -> List['Offer']:
+        """See :meth:`Request.from_data_batch`"""
+        return [cls.from_data(offer_id=offer_id, common=common, extra=extra)
+                for offer_id, common, extra in zip(offer_ids, commons, extras)]
+
+    @staticmethod
+    def _common_args(common: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(request_id=common['request_id'], author=common['author'])
 
     @classmethod
     def from_args(cls,
@@ -211,21 +643,29 @@ def register_marshaller(type_name, request_class, offer_class):
     default_known_types[type_name] = (request_class, offer_class)
 
 
-class Marketplace(object):
+class MarketplaceBase(object):
+    """The parts of :class:`Marketplace` and :class:`AsyncMarketplace` that
+    do not read the contract: building requests and offers from the
+    contract data, and the methods that change the marketplace, which
+    call the contract through the `_run` method of the subclass."""
+
     def __init__(self,
-                 contract: Contract,
+                 marketplace_type: str,
                  is_owner: bool = False,
                  is_manager: bool = False,
-                 # these are ok with duck typing
-                 marketplace_type: str = None,
                  fallback_request_class=None,
                  fallback_offer_class=None,
-                 known_types=default_known_types
+                 known_types=default_known_types,
+                 cache=None,
+                 offer_chunk_size: int = 100,
+                 identity_map: Optional[OfferIdentityMap] = None
                  ) -> None:
-        self.contract = contract
+        self.type = marketplace_type
+        self.cache = cache
+        self.identity_map = identity_map
+        self.offer_chunk_size = offer_chunk_size
         self.is_manager = is_manager
         self.is_owner = is_owner
-        self.type = marketplace_type or contract.get_type()
         self.request_class, self.offer_class = known_types.get(
             self.type,
             (fallback_request_class, fallback_offer_class))
@@ -234,102 +674,212 @@ class Marketplace(object):
         """returns type"""
         return self.type
 
-    def get_requests(self):
-        """Returns list of current requests"""
-        requests = []
-        for request_id in self.contract.get_request_ids():
-            request = self.get_request(request_id)
-            assert request is not None, \
+    # request states for iter_requests: (request id list method of the
+    # contract, request flag)
+    request_states = {'open': ('get_open_request_ids', 'is_open'),
+                      'closed': ('get_closed_request_ids', 'is_closed'),
+                      'decided': ('get_closed_request_ids', 'is_decided')}
+
+    @staticmethod
+    def _request_id_pages(request_ids, page_size):
+        # a request can be in the closed list twice if it is decided
+        # after being closed
+        request_ids = sorted(set(request_ids))
+        return [request_ids[i:i + page_size]
+                for i in range(0, len(request_ids), page_size)]
+
+    def _page_from_data(self, request_ids, datas, offers):
+        # requests deleted while iterating are skipped
+        defined = [(request_id, data)
+                   for request_id, data in zip(request_ids, datas)
+                   if data is not None]
+        return self._requests_from_data(
+            [request_id for request_id, _ in defined],
+            [data for _, data in defined], offers)
+
+    def _filter_state(self, requests, state):
+        if state is None:
+            return requests
+
+        _, flag = self.request_states[state]
+        return [request for request in requests if getattr(request, flag)]
+
+    @staticmethod
+    def _offer_ids_of(datas):
+        """Returns the identifiers of the offers and decided offers of the
+        given request data"""
+        return [offer_id
+                for data in datas if data is not None
+                for offer_id in (data.get('offer_ids', []) +
+                                 data.get('decided_offer_ids', []))]
+
+    def _requests_from_data(self, request_ids, datas, offers):
+        """Builds request objects from the contract data with a single
+        :meth:`Request.from_data_batch` call"""
+        extras = []
+        for request_id, data in zip(request_ids, datas):
+            assert data is not None, \
                 "request id {!r} not found even if in list".format(request_id)
-            requests.append(request)
-        return requests
-
-    def get_request(self, request_id):
-        """Returns a specific request"""
-        assert self.request_class, "cannot fetch without a request class"
-
-        data = self.contract.get_request(request_id)
-
-        if data is None:
-            return None
-
-        extra = self.contract.get_request_extra(request_id)
+            extras.append(data.pop('extra'))
+            self._set_offers(data, offers)
+
+        return self.request_class.from_data_batch(request_ids, datas, extras)
+
+    def _set_offers(self, data, offers):
+        """Replaces the offer identifiers of the request data with the offer
+        objects from the `offers` dictionary (offer id -> offer), or with
+        lazy offer lists if `offers` is None"""
+        if offers is None:
+            loaded: Dict[int, Offer] = {}
+            data['offers'] = LazyOffers(
+                data.pop('offer_ids', []), self._get_offers_bulk, loaded)
+            data['decided_offers'] = LazyOffers(
+                data.pop('decided_offer_ids', []), self._get_offers_bulk,
+                loaded)
+            return
 
         # Turn offer_ids into offers
         data['offers'] = [
-            self.get_offer(offer_id)
+            offers.get(offer_id)
             for offer_id in data.pop('offer_ids', [])]
 
         # If we have decisions, turn them into offer objects
         data['decided_offers'] = [
-            self.get_offer(offer_id)
+            offers.get(offer_id)
             for offer_id in data.pop('decided_offer_ids', [])]
 
         assert None not in data['decided_offers']
 
-        return self.request_class.from_data(
-            request_id=request_id,
-            common=data,
-            extra=extra)
+    def _known_offers(self, offer_ids) -> Dict[int, Offer]:
+        if self.identity_map is None:
+            return {}
+        return self.identity_map.get_many(offer_ids)
+
+    @staticmethod
+    def _merge_offers(offer_ids, known, read) -> Dict[int, Offer]:
+        """Returns the known and read offers in the order of `offer_ids`"""
+        if not known:
+            return read
+
+        offers = {}
+        for offer_id in offer_ids:
+            offer = known.get(offer_id) or read.get(offer_id)
+            if offer is not None:
+                offers[offer_id] = offer
+        return offers
+
+    def _snapshot_from_data(self, request_ids, datas, offer_ids, offer_datas):
+        return MarketSnapshot.from_data(
+            request_ids, datas, offer_ids, offer_datas,
+            getattr(self.request_class, 'extra_columns', ()),
+            getattr(self.offer_class, 'extra_columns', ()))
+
+    def _offers_from_data(self, offer_ids, datas) -> Dict[int, Offer]:
+        """Builds offer objects from the contract data with a single
+        :meth:`Offer.from_data_batch` call, leaving out undefined offers"""
+        defined = [(offer_id, data)
+                   for offer_id, data in zip(offer_ids, datas)
+                   if data is not None]
+
+        if not defined:
+            return {}
+
+        offer_ids = [offer_id for offer_id, _ in defined]
+        datas = [data for _, data in defined]
+        extras = [data.pop('extra') for data in datas]
+        offers = self.offer_class.from_data_batch(offer_ids, datas, extras)
+
+        if self.identity_map is not None:
+            offers = [self.identity_map.add(offer_id, offer, data)
+                      for offer_id, offer, data
+                      in zip(offer_ids, offers, datas)]
+
+        return dict(zip(offer_ids, offers))
 
-    def get_offers(self, request_id):
-        """Returns offers made for a specific request"""
-        # offers = []
+    async def add_request(self, request):
+        """Adds the request"""
+        assert request.request_id is None
 
-        # for offer_id in self.contract.getRequestOfferIDs(request_id):
-        #     offer = self.get_offer(offer_id)
-        #     offers.append(offer)
+        if not self.is_manager:
+            raise ManagerAccessRequired()
 
-        # return offers
-        assert False, "not implemented, potentially to be removed"
+        request_id = await self._run(self.contract.add_request_with_extra,
+                                     request.deadline,
+                                     request.marshal_extra())
 
-    def get_offer(self, offer_id) -> Optional[Offer]:
-        """Returns a specific offer"""
-        assert self.offer_class, "cannot fetch without an offer class"
+        assert request_id != -1, "request could not be added"
 
-        data = self.contract.get_offer(offer_id)
+        if self.cache is not None:
+            self.cache.invalidate_request(request_id)
 
-        if data is None:
-            return None
+        return await self._run(self.get_request, request_id)
 
-        extra = self.contract.get_offer_extra(offer_id)
+    # FIXME: adding an offer should occur via request object
+    async def add_offer(self, offer):
+        """Adds offer"""
+        assert offer.offer_id is None and offer.request_id is not None
 
-        return self.offer_class.from_data(
-            offer_id=offer_id,
-            common=data,
-            extra=extra)
+        offer_id = await self._run(self.contract.add_offer_with_extra,
+                                   offer.request_id,
+                                   offer.marshal_extra())
 
-    async def add_request(self, request):
-        """Adds the request"""
-        assert request.request_id is None
+        assert offer_id != -1, "offer could not be added"
+
+        if self.cache is not None:
+            self.cache.invalidate_request(offer.request_id)
+            self.cache.invalidate_offer(offer_id)
+
+        return await self._run(self.get_offer, offer_id)
+
+    async def add_requests(self, requests):
+        """Adds multiple requests at once, see :meth:`add_request`. All of
+        the transactions are sent without waiting for each other when
+        the contract supports it. Returns the added requests in the same
+        order."""
+        assert all(request.request_id is None for request in requests)
 
         if not self.is_manager:
             raise ManagerAccessRequired()
 
-        request_id = self.contract.add_request(request.deadline)
+        if not requests:
+            return []
 
-        extra_ok = self.contract.add_request_extra(
-            request_id,
-            request.marshal_extra())
+        request_ids = await self._run(
+            self.contract.add_requests_with_extra_bulk,
+            [request.deadline for request in requests],
+            self.request_class.marshal_extra_batch(requests))
 
-        assert extra_ok, "extra data could not be added to request"
+        assert -1 not in request_ids, "request could not be added"
 
-        return self.get_request(request_id)
+        if self.cache is not None:
+            for request_id in request_ids:
+                self.cache.invalidate_request(request_id)
 
-    # FIXME: adding an offer should occur via request object
-    async def add_offer(self, offer):
-        """Adds offer"""
-        assert offer.offer_id is None and offer.request_id is not None
+        return await self._run(self._get_requests_by_id, request_ids)
+
+    async def add_offers(self, offers):
+        """Adds multiple offers at once, see :meth:`add_requests`"""
+        assert all(offer.offer_id is None and offer.request_id is not None
+                   for offer in offers)
+
+        if not offers:
+            return []
 
-        offer_id = self.contract.add_offer(offer.request_id)
+        offer_ids = await self._run(
+            self.contract.add_offers_with_extra_bulk,
+            [offer.request_id for offer in offers],
+            self.offer_class.marshal_extra_batch(offers))
 
-        extra_ok = self.contract.add_offer_extra(
-            offer_id,
-            offer.marshal_extra())
+        assert -1 not in offer_ids, "offer could not be added"
 
-        assert extra_ok, "extra data could not be added to offer"
+        if self.cache is not None:
+            for offer in offers:
+                self.cache.invalidate_request(offer.request_id)
+            for offer_id in offer_ids:
+                self.cache.invalidate_offer(offer_id)
 
-        return self.get_offer(offer_id)
+        added = await self._run(self._get_offers_bulk, offer_ids)
+        return [added.get(offer_id) for offer_id in offer_ids]
 
     # FIXME: decide should be part of a request object
     async def decide_request(self, request, offers=[]):
@@ -339,8 +889,14 @@ class Marketplace(object):
         if not self.is_manager:
             raise ManagerAccessRequired()
 
-        return self.contract.decide_request(request.request_id,
-                                            [o.offer_id for o in offers])
+        decided = await self._run(self.contract.decide_request,
+                                  request.request_id,
+                                  [o.offer_id for o in offers])
+
+        if self.cache is not None:
+            self.cache.invalidate_request(request.request_id)
+
+        return decided
 
     async def add_offerer(self, address):
         """Adds the specified offerer as a valid offerer, if the contract type
@@ -381,3 +937,357 @@ class Marketplace(object):
         if not self.is_owner:
             raise OwnerAccessRequired()
         assert False, "Not implemented yet"
+
+
+class Marketplace(MarketplaceBase):
+    def __init__(self,
+                 contract: Contract,
+                 is_owner: bool = False,
+                 is_manager: bool = False,
+                 # these are ok with duck typing
+                 marketplace_type: str = None,
+                 fallback_request_class=None,
+                 fallback_offer_class=None,
+                 known_types=default_known_types,
+                 cache=None,
+                 max_workers: int = None,
+                 offer_chunk_size: int = 100,
+                 lazy_offers: bool = False,
+                 identity_map: OfferIdentityMap = None
+                 ) -> None:
+        """If `cache` (a :class:`~sofie_offer_marketplace.cache.ContractCache`)
+        is given, requests and offers are read through it.
+
+        Offers are read in chunks of `offer_chunk_size` offers. If
+        `max_workers` is given, the chunks are read in parallel by a
+        pool of that many threads, which is also used for the blocking
+        contract calls of the asynchronous methods. Call :meth:`close`
+        to shut the pool down.
+
+        If `lazy_offers` is true, the offers of requests are not read
+        along with the requests, instead the requests get
+        :class:`LazyOffers` lists which read the offers when they are
+        accessed.
+
+        Each offer is built only once per call, e.g. decided offers are
+        the same objects in `offers` and `decided_offers`. If
+        `identity_map` is given, the final offers in it are reused
+        across calls and not read again."""
+        super().__init__(marketplace_type or contract.get_type(),
+                         is_owner=is_owner,
+                         is_manager=is_manager,
+                         fallback_request_class=fallback_request_class,
+                         fallback_offer_class=fallback_offer_class,
+                         known_types=known_types,
+                         cache=cache,
+                         offer_chunk_size=offer_chunk_size,
+                         identity_map=identity_map)
+        self.contract = contract
+        self.lazy_offers = lazy_offers
+        self.executor = ThreadPoolExecutor(max_workers) \
+            if max_workers is not None else None
+
+    def close(self):
+        """Shuts down the thread pool, if any"""
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def get_requests(self, offset: int = 0, limit: int = None):
+        """Returns list of current requests. If `limit` is given, only at
+        most `limit` requests starting from the position `offset` are
+        returned."""
+        assert self.request_class, "cannot fetch without a request class"
+
+        if limit is None:
+            request_ids = self.contract.get_request_ids()[offset:]
+        else:
+            request_ids, _ = self.contract.get_request_ids_page(offset, limit)
+
+        return self._get_requests_by_id(request_ids)
+
+    def iter_requests(self, state: str = None, prefetch: int = 2,
+                      page_size: int = 100) -> Iterator[Request]:
+        """Yields the requests in the order of their identifiers, or only
+        those in `state` ('open', 'closed' or 'decided') if given.
+
+        The requests are read in pages of `page_size` requests, and up to
+        `prefetch` pages are read ahead by background threads while the
+        page before them is consumed, so the first requests are available
+        right away and at most `prefetch` + 1 pages are in memory at a
+        time."""
+        assert self.request_class, "cannot fetch without a request class"
+
+        pages = self._request_id_pages(self._state_request_ids(state),
+                                       page_size)
+
+        if not prefetch:
+            for page in pages:
+                yield from self._requests_page(page, state)
+            return
+
+        executor = ThreadPoolExecutor(prefetch)
+        futures: deque = deque()
+        try:
+            for page in pages:
+                futures.append(
+                    executor.submit(self._requests_page, page, state))
+                # the page consumed next and `prefetch` pages after it
+                if len(futures) > prefetch:
+                    yield from futures.popleft().result()
+
+            while futures:
+                yield from futures.popleft().result()
+        finally:
+            # the generator may be closed before it is exhausted
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _state_request_ids(self, state):
+        if state is None:
+            return self.contract.get_request_ids()
+
+        method, _ = self.request_states[state]
+        if hasattr(self.contract, method):
+            return getattr(self.contract, method)()
+        return self.contract.get_request_ids()
+
+    def _requests_page(self, request_ids, state):
+        """Reads the given requests, leaving out those not in `state`"""
+        datas = self._read_requests(request_ids)
+        offers = None if self.lazy_offers else \
+            self._get_offers_bulk(self._offer_ids_of(datas))
+
+        return self._filter_state(
+            self._page_from_data(request_ids, datas, offers), state)
+
+    def get_request(self, request_id):
+        """Returns a specific request"""
+        assert self.request_class, "cannot fetch without a request class"
+
+        data = self._read_requests([request_id])[0]
+
+        if data is None:
+            return None
+
+        offers = None if self.lazy_offers else \
+            self._get_offers_bulk(self._offer_ids_of([data]))
+
+        return self._requests_from_data([request_id], [data], offers)[0]
+
+    def _read_requests(self, request_ids):
+        """Reads the request data from the contract, or through the cache if
+        there is one"""
+        if self.cache is not None:
+            return self.cache.get_requests_bulk(self.contract, request_ids)
+        return self.contract.get_requests_bulk(request_ids)
+
+    def _read_offers(self, offer_ids):
+        """Reads the offer data from the contract, or through the cache if
+        there is one"""
+        if self.cache is not None:
+            return self.cache.get_offers_bulk(self.contract, offer_ids)
+        return self.contract.get_offers_bulk(offer_ids)
+
+    def _get_offers_bulk(self, offer_ids) -> Dict[int, Offer]:
+        """Fetches the given offers with a single bulk contract call and
+        returns them as a dictionary of offer id -> offer. Offers that
+        are not defined are left out."""
+        assert self.offer_class, "cannot fetch without an offer class"
+
+        # dict keeps the order while removing duplicates
+        offer_ids = list(dict.fromkeys(offer_ids))
+        known = self._known_offers(offer_ids)
+        missing = [offer_id for offer_id in offer_ids if offer_id not in known]
+
+        return self._merge_offers(
+            offer_ids, known,
+            self._offers_from_data(missing,
+                                   self._read_offers_chunked(missing)))
+
+    def _read_offers_chunked(self, offer_ids):
+        """Reads the data of the offers in chunks of `offer_chunk_size`,
+        in parallel if there is a thread pool"""
+        chunks = [offer_ids[i:i + self.offer_chunk_size]
+                  for i in range(0, len(offer_ids), self.offer_chunk_size)]
+
+        if self.executor is not None and len(chunks) > 1:
+            datas = list(self.executor.map(self._read_offers, chunks))
+        else:
+            datas = [self._read_offers(chunk) for chunk in chunks]
+
+        return [data for chunk in datas for data in chunk]
+
+    def snapshot(self) -> MarketSnapshot:
+        """Returns all of the requests and their offers as a
+        :class:`MarketSnapshot`. The snapshot is built directly from the
+        bulk contract data, no request or offer objects are created."""
+        request_ids = self.contract.get_request_ids()
+        datas = self._read_requests(request_ids)
+        offer_ids = list(dict.fromkeys(self._offer_ids_of(datas)))
+
+        return self._snapshot_from_data(
+            request_ids, datas, offer_ids,
+            self._read_offers_chunked(offer_ids))
+
+    def get_offers(self, request_id):
+        """Returns offers made for a specific request"""
+        # offers = []
+
+        # for offer_id in self.contract.getRequestOfferIDs(request_id):
+        #     offer = self.get_offer(offer_id)
+        #     offers.append(offer)
+
+        # return offers
+        assert False, "not implemented, potentially to be removed"
+
+    def get_offer(self, offer_id) -> Optional[Offer]:
+        """Returns a specific offer"""
+        return self._get_offers_bulk([offer_id]).get(offer_id)
+
+    def _get_requests_by_id(self, request_ids):
+        """Returns the requests of `request_ids`, which all have to exist"""
+        datas = self._read_requests(request_ids)
+        offers = None if self.lazy_offers else \
+            self._get_offers_bulk(self._offer_ids_of(datas))
+
+        return self._requests_from_data(request_ids, datas, offers)
+
+    async def _run(self, func, *args):
+        """Runs the blocking `func` in an executor (the thread pool if there
+        is one), so that the event loop is not blocked while waiting for
+        the contract"""
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor, func, *args)
+
+
+class AsyncMarketplace(MarketplaceBase):
+    """The same as :class:`Marketplace` on top of an
+    :class:`AsyncContract`. All of the methods that use the contract,
+    including the getters, are coroutines. The type of the marketplace
+    has to be read from the contract asynchronously, so unless
+    `marketplace_type` is given the instances are created with
+    :meth:`create`.
+
+    The chunks of offers are read concurrently on the event loop, a
+    thread pool is not needed.
+    """
+
+    def __init__(self,
+                 contract: AsyncContract,
+                 marketplace_type: Optional[str] = None,
+                 **kwargs) -> None:
+        assert marketplace_type is not None, \
+            "use AsyncMarketplace.create() to read the type from the contract"
+        assert kwargs.get('cache') is None, \
+            "cache is not supported with asynchronous contracts"
+        super().__init__(marketplace_type, **kwargs)
+        self.contract = contract
+
+    @classmethod
+    async def create(cls, contract: AsyncContract, **kwargs):
+        return cls(contract, marketplace_type=await contract.get_type(),
+                   **kwargs)
+
+    async def get_requests(self, offset: int = 0, limit: int = None):
+        assert self.request_class, "cannot fetch without a request class"
+
+        if limit is None:
+            request_ids = (await self.contract.get_request_ids())[offset:]
+        else:
+            request_ids, _ = await self.contract.get_request_ids_page(
+                offset, limit)
+
+        return await self._get_requests_by_id(request_ids)
+
+    async def _get_requests_by_id(self, request_ids):
+        datas = await self.contract.get_requests_bulk(request_ids)
+        offers = await self._get_offers_bulk(self._offer_ids_of(datas))
+
+        return self._requests_from_data(request_ids, datas, offers)
+
+    async def iter_requests(self, state: str = None, prefetch: int = 2,
+                            page_size: int = 100) -> AsyncIterator[Request]:
+        """Asynchronous generator version of
+        :meth:`Marketplace.iter_requests`, the pages are read ahead by
+        tasks on the event loop"""
+        assert self.request_class, "cannot fetch without a request class"
+
+        if state is None:
+            request_ids = await self.contract.get_request_ids()
+        else:
+            method, _ = self.request_states[state]
+            request_ids = await getattr(
+                self.contract, method, self.contract.get_request_ids)()
+
+        tasks: deque = deque()
+        try:
+            for page in self._request_id_pages(request_ids, page_size):
+                tasks.append(asyncio.ensure_future(
+                    self._requests_page(page, state)))
+                if len(tasks) > prefetch:
+                    for request in await tasks.popleft():
+                        yield request
+
+            while tasks:
+                for request in await tasks.popleft():
+                    yield request
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _requests_page(self, request_ids, state):
+        datas = await self.contract.get_requests_bulk(request_ids)
+        offers = await self._get_offers_bulk(self._offer_ids_of(datas))
+        return self._filter_state(
+            self._page_from_data(request_ids, datas, offers), state)
+
+    async def get_request(self, request_id):
+        assert self.request_class, "cannot fetch without a request class"
+
+        data = (await self.contract.get_requests_bulk([request_id]))[0]
+
+        if data is None:
+            return None
+
+        offers = await self._get_offers_bulk(self._offer_ids_of([data]))
+
+        return self._requests_from_data([request_id], [data], offers)[0]
+
+    async def _get_offers_bulk(self, offer_ids) -> Dict[int, Offer]:
+        assert self.offer_class, "cannot fetch without an offer class"
+
+        offer_ids = list(dict.fromkeys(offer_ids))
+        known = self._known_offers(offer_ids)
+        missing = [offer_id for offer_id in offer_ids if offer_id not in known]
+
+        return self._merge_offers(
+            offer_ids, known,
+            self._offers_from_data(missing,
+                                   await self._read_offers_chunked(missing)))
+
+    async def _read_offers_chunked(self, offer_ids):
+        chunks = [offer_ids[i:i + self.offer_chunk_size]
+                  for i in range(0, len(offer_ids), self.offer_chunk_size)]
+
+        datas = await asyncio.gather(
+            *(self.contract.get_offers_bulk(chunk) for chunk in chunks))
+
+        return [data for chunk in datas for data in chunk]
+
+    async def snapshot(self) -> MarketSnapshot:
+        request_ids = await self.contract.get_request_ids()
+        datas = await self.contract.get_requests_bulk(request_ids)
+        offer_ids = list(dict.fromkeys(self._offer_ids_of(datas)))
+
+        return self._snapshot_from_data(
+            request_ids, datas, offer_ids,
+            await self._read_offers_chunked(offer_ids))
+
+    async def get_offer(self, offer_id) -> Optional[Offer]:
+        assert self.offer_class, "cannot fetch without an offer class"
+
+        return (await self._get_offers_bulk([offer_id])).get(offer_id)
+
+    async def _run(self, func, *args):
+        return await func(*args)
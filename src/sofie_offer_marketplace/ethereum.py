@@ -15,10 +15,24 @@
 # permissions and limitations under the License.
 
 from .core import Contract
-from typing import Any, Dict, List, Optional, cast
+from .transactions import (GasEstimator, NonceManager, PendingTransaction,
+                           ReceiptPoller)
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, cast
+from collections import OrderedDict
 from enum import Enum
+import copy
+import json
+import logging
+import threading
+import time
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from .metrics import Instrumentation
+from .providers import post_batch
 from . import exceptions
 
+logger = logging.getLogger(__name__)
+
 
 class Status(Enum):
     Successful = 0
@@ -35,6 +49,278 @@ class Status(Enum):
     DuplicateManager = 11
     InvalidInput = 12
 
+# Minimal interface of the read aggregator contract in
+# solidity/contracts/Multicall.sol
+MULTICALL_ABI = [{
+    "type": "function",
+    "name": "aggregate",
+    "constant": True,
+    "stateMutability": "view",
+    "inputs": [{
+        "name": "calls",
+        "type": "tuple[]",
+        "components": [{"name": "target", "type": "address"},
+                       {"name": "callData", "type": "bytes"}]}],
+    "outputs": [{"name": "blockNumber", "type": "uint256"},
+                {"name": "success", "type": "bool[]"},
+                {"name": "returnData", "type": "bytes[]"}]
+}]
+
+
+def decode_call_output(web3, call, data: bytes) -> Any:
+    """Decodes the raw return data of the contract function call `call`
+    the same way as `call.call()` would do."""
+    output_types = get_abi_output_types(call.abi)
+    output_data = web3.codec.decode_abi(output_types, data)
+    normalized = map_abi_data(BASE_RETURN_NORMALIZERS,
+                              output_types, output_data)
+
+    if len(normalized) == 1:
+        return normalized[0]
+
+    return normalized
+
+
+class BatchResult(object):
+    """Placeholder for the result of a single call added to a
+    :class:`CallBatch`. The value is available through :meth:`result`
+    once the batch has been executed."""
+
+    def __init__(self, batch: 'CallBatch') -> None:
+        self.batch = batch
+        self.done = False
+        self.value: Any = None
+
+    def result(self) -> Any:
+        if not self.done:
+            self.batch.execute()
+        assert self.done, "batch execution did not produce a result"
+        return self.value
+
+
+class CallBatch(object):
+    """Collects contract function calls (e.g.
+    `contract.functions.getRequest(1)`, not yet `.call()`'ed) and
+    executes them as JSON-RPC batch requests, where each batch contains
+    at most `max_size` `eth_call`s. The decoded results are then
+    handed back in the same order as the calls were added.
+
+    Batching is only supported with HTTP providers (see
+    :func:`post_batch`), other providers (and nodes that refuse
+    batches) fall back to calling the functions one by one.
+    """
+
+    def __init__(self,
+                 web3,
+                 max_size: int = 1000,
+                 block_identifier: Any = 'latest') -> None:
+        assert max_size > 0
+        self.web3 = web3
+        self.max_size = max_size
+        self.block_identifier = block_identifier
+        self.pending: List[Any] = []
+
+    def add(self, call) -> BatchResult:
+        """Adds a contract function call into the batch"""
+        result = BatchResult(self)
+        self.pending.append((call, result))
+        return result
+
+    def execute(self) -> List[Any]:
+        """Executes all pending calls and returns their results"""
+        pending, self.pending = self.pending, []
+
+        values: List[Any] = []
+        for i in range(0, len(pending), self.max_size):
+            chunk = pending[i:i + self.max_size]
+            values += self._execute_chunk([call for call, _ in chunk])
+
+        for (_, result), value in zip(pending, values):
+            result.value = value
+            result.done = True
+
+        return values
+
+    def _execute_chunk(self, calls: List[Any]) -> List[Any]:
+        provider = self.web3.provider if self.web3 is not None else None
+
+        if len(calls) < 2:
+            return [call.call(block_identifier=self.block_identifier)
+                    for call in calls]
+
+        block = self.block_identifier
+        if isinstance(block, int):
+            block = hex(block)
+
+        payload = [
+            {"jsonrpc": "2.0",
+             "method": "eth_call",
+             "params": [{"to": call.address,
+                         "data": call._encode_transaction_data()},
+                        block],
+             "id": request_id}
+            for request_id, call in enumerate(calls)]
+
+        response = post_batch(provider, payload)
+
+        # batches are not supported by the provider, or the node
+        # answered with a single error object
+        if not isinstance(response, list):
+            return [call.call(block_identifier=self.block_identifier)
+                    for call in calls]
+
+        responses = {item['id']: item for item in response}
+        assert len(responses) == len(calls), \
+            "node returned {} results for {} calls".format(
+                len(responses), len(calls))
+
+        return [self._decode(call, responses[request_id])
+                for request_id, call in enumerate(calls)]
+
+    def _decode(self, call, response: Dict[str, Any]) -> Any:
+        if 'error' in response:
+            raise ValueError(response['error'])
+
+        return decode_call_output(
+            self.web3, call, bytes.fromhex(response['result'][2:]))
+
+
+class Multicall(object):
+    """Client for the read aggregator contract
+    (solidity/contracts/Multicall.sol). It packs many contract
+    function calls into a single `eth_call` of the aggregator, so that
+    they are all evaluated against the same block with one round-trip.
+    This also works with nodes that do not accept JSON-RPC batches.
+
+    Calls are sent in chunks of at most `max_size` calls to stay below
+    the gas cap nodes put on `eth_call`. All chunks after the first one
+    are pinned to the block the first chunk was evaluated in, and that
+    block number is available as `block_number` after :meth:`call`.
+    """
+
+    def __init__(self, web3, address: str, max_size: int = 500) -> None:
+        assert max_size > 0
+        self.web3 = web3
+        self.contract = web3.eth.contract(address=address, abi=MULTICALL_ABI)
+        self.max_size = max_size
+        self.block_number: Optional[int] = None
+
+    def call(self, calls: List[Any],
+             block_identifier: Any = 'latest') -> List[Any]:
+        """Executes the given contract function calls (e.g.
+        `contract.functions.getRequest(1)`) and returns their results
+        in the same order"""
+        values: List[Any] = []
+        self.block_number = None
+
+        for i in range(0, len(calls), self.max_size):
+            chunk = calls[i:i + self.max_size]
+
+            block_number, success, return_data = \
+                self.contract.functions.aggregate([
+                    (call.address, call._encode_transaction_data())
+                    for call in chunk]).call(
+                        block_identifier=block_identifier)
+
+            block_identifier = self.block_number = block_number
+
+            for call, ok, data in zip(chunk, success, return_data):
+                if not ok:
+                    raise ValueError(
+                        "aggregated call {} failed".format(call))
+
+                values.append(decode_call_output(self.web3, call, data))
+
+        return values
+
+
+class LatestBlock(object):
+    """Latest block number of the node, fetched at most once every
+    `max_age` seconds. Block numbers seen otherwise (e.g. in the
+    receipts of own transactions) are taken into account with
+    :meth:`seen`, so that reads pinned to the latest block always see
+    the writes made through the same contract."""
+
+    def __init__(self, web3, max_age: float = 1.0) -> None:
+        self.web3 = web3
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.number: Optional[int] = None
+        self.fetched = 0.0
+
+    def cached(self) -> Optional[int]:
+        """Returns the latest block number if it is fresh enough, None if
+        it has to be fetched"""
+        with self.lock:
+            if self.number is not None and \
+                    time.monotonic() - self.fetched < self.max_age:
+                return self.number
+        return None
+
+    def update(self, number: int) -> int:
+        """Stores the latest block number fetched from the node"""
+        with self.lock:
+            self.number = max(number, self.number or 0)
+            self.fetched = time.monotonic()
+            return self.number
+
+    def seen(self, number: int) -> None:
+        with self.lock:
+            if self.number is not None and number > self.number:
+                self.number = number
+
+    def get(self) -> int:
+        number = self.cached()
+        if number is None:
+            number = self.update(self.web3.eth.blockNumber)
+        return number
+
+
+class CallCache(object):
+    """Results of contract function calls by the block they were made
+    in, keeping at most `max_size` of the most recently used ones. The
+    result of a call in a given block never changes, so the cache does
+    not need to be invalidated. Only calls made in a block given by
+    number are cached."""
+
+    _missing = object()
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.results: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    @staticmethod
+    def key(block_identifier: Any,
+            call) -> Optional[Tuple[int, str, str]]:
+        """Returns the cache key of `call` in the given block, None if it
+        cannot be cached"""
+        if not isinstance(block_identifier, int):
+            return None
+        return block_identifier, call.address, call._encode_transaction_data()
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached result, or `CallCache._missing`"""
+        with self.lock:
+            value = self.results.get(key, self._missing)
+            if value is self._missing:
+                return value
+            self.results.move_to_end(key)
+
+        # the results are lists, which the callers may modify
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self.lock:
+            self.results[key] = copy.deepcopy(value)
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+
 class Web3Contract(Contract):
     """Concrete implementation of the :class:`Contract` interface that
     works with Ethereum using the Web3 library. It requires a web3
@@ -43,6 +329,42 @@ class Web3Contract(Contract):
 
     All methods in this class are synchronous and **can block**
     indefinitely.
+
+    Read calls that do not depend on each other are sent together as
+    JSON-RPC batches (see :class:`CallBatch`) of at most
+    `max_batch_size` calls. If the address of a read aggregator
+    contract is given in `aggregator`, they are instead packed into
+    aggregated calls (see :class:`Multicall`). Contracts that provide
+    the `getRequestFull` and `getOfferFull` views are read with those,
+    one call per request or offer.
+
+    All of the calls of a read are made in the same block, so that they
+    give consistent results. Unless the contract is pinned to a block
+    (`block_identifier`, see also :meth:`pinned`), that is the latest
+    block. Its number is fetched from the node at most every
+    `block_max_age` seconds and reused in between, so reads may lag
+    behind the chain by that much. If `block_max_age` is 0, single
+    calls are made in the "latest" block of the node as such, and the
+    number is fetched for every read of several calls. Call results are
+    cached by the block number they were made in (at most
+    `call_cache_size` of them), so the same reads in the same block
+    are served locally.
+
+    Every contract call and transaction is reported to
+    `instrumentation` (see :class:`Instrumentation` and
+    :class:`RPCMetrics`).
+
+    Transactions are sent from `minter`. If a :class:`NonceManager` is
+    given in `nonce_manager`, their nonces are assigned locally instead
+    of by the node. The write methods wait for the transactions to be
+    mined unless `wait` is false (see also :meth:`nowait`), in which
+    case they return a :class:`PendingTransaction` whose result is
+    what the method would have returned. The gas limits of the
+    transactions are chosen by `gas_estimator` (by default a
+    :class:`GasEstimator` with its default settings). All of the
+    transactions are waited for with one :class:`ReceiptPoller`, which
+    can be shared with other contracts using the same node.
+
     :param object contract_interface: Note here the code assumes the parameter
         to be the complete contract artifact, not the abi inside
     """
@@ -53,7 +375,17 @@ class Web3Contract(Contract):
                  contract_address=None,
                  contract_interface=None,
                  contract_file=None,
-                 minter=None):
+                 minter=None,
+                 max_batch_size=1000,
+                 aggregator=None,
+                 nonce_manager: NonceManager = None,
+                 wait: bool = True,
+                 gas_estimator: GasEstimator = None,
+                 receipt_poller: ReceiptPoller = None,
+                 block_identifier: Any = None,
+                 block_max_age: float = 1.0,
+                 call_cache_size: int = 10000,
+                 instrumentation: Instrumentation = None):
         assert sum([v is not None for v in [contract, contract_interface,
                                             contract_file]]) == 1, "One and only one of contract, contract_interface and contract_file parameters may be specified"
 
@@ -75,6 +407,28 @@ class Web3Contract(Contract):
         self.last_block_number = None
         self.last_gas_used = None
         self.minter = minter
+        self.max_batch_size = max_batch_size
+        self.multicall = Multicall(web3, aggregator) \
+            if aggregator is not None else None
+        self.nonces = nonce_manager
+        self.wait = wait
+        self.gas = gas_estimator if gas_estimator is not None \
+            else GasEstimator()
+        self.receipts = receipt_poller if receipt_poller is not None \
+            else ReceiptPoller(web3)
+        self.block_identifier = block_identifier
+        self.blocks = LatestBlock(web3, block_max_age)
+        self.cache = CallCache(call_cache_size)
+        self.instrumentation = instrumentation \
+            if instrumentation is not None else Instrumentation()
+
+        self.abi_names = {
+            entry.get('name') for entry in getattr(contract, 'abi', [])}
+        self.has_full_getters = \
+            {'getRequestFull', 'getOfferFull'} <= self.abi_names
+        self.has_combined_submits = \
+            {'submitRequestWithExtra', 'submitOfferWithExtra'} \
+            <= self.abi_names
 
 
     def status(self, result: List[Any]) -> List[Any]:
@@ -98,218 +452,661 @@ class Web3Contract(Contract):
         return self.status(result)[0]
 
 
+    def _block(self, consistent: bool = True) -> Any:
+        """Returns the block the reads are made in, a block number if
+        `consistent` is true (for reads of several calls)"""
+        if self.block_identifier is not None:
+            return self.block_identifier
+        if not consistent and not self.blocks.max_age:
+            return 'latest'
+        return self.blocks.get()
+
+
+    def _call_many(self, calls: List[Any]) -> List[Any]:
+        """Executes the given contract function calls (e.g.
+        `contract.functions.getRequest(1)`) in the same block and
+        returns their results in the same order. Results already in the
+        cache for that block are not fetched again."""
+        block = self._block(len(calls) > 1)
+        keys = [self.cache.key(block, call) for call in calls]
+        values = [self.cache.get(key) if key is not None
+                  else CallCache._missing for key in keys]
+        missing = [i for i, value in enumerate(values)
+                   if value is CallCache._missing]
+
+        for call, value in zip(calls, values):
+            if value is not CallCache._missing:
+                self.instrumentation.cached(call.fn_name)
+
+        if missing:
+            start = time.monotonic()
+            if self.multicall is not None:
+                fetched = self.multicall.call([calls[i] for i in missing],
+                                              block)
+            else:
+                batch = CallBatch(self.web3, max_size=self.max_batch_size,
+                                  block_identifier=block)
+                for i in missing:
+                    batch.add(calls[i])
+                fetched = batch.execute()
+
+            self._instrument_calls([calls[i] for i in missing],
+                                   [keys[i] for i in missing],
+                                   time.monotonic() - start)
+
+            for i, value in zip(missing, fetched):
+                values[i] = value
+                if keys[i] is not None:
+                    self.cache.put(keys[i], value)
+
+        return values
+
+
+    def _instrument_calls(self, calls: List[Any],
+                          keys: List[Optional[Tuple[int, str, str]]],
+                          latency: float) -> None:
+        """Reports calls fetched together in `latency` seconds, `keys`
+        being their cache keys (which contain the call data)"""
+        for call, key in zip(calls, keys):
+            data = key[2] if key is not None \
+                else call._encode_transaction_data()
+            self.instrumentation.call(call.fn_name, latency,
+                                      (len(data) - 2) // 2)
+
+
+    def _call(self, call) -> Any:
+        return self._call_many([call])[0]
+
+
+    def _call_after(self, receipt, call) -> Any:
+        """Executes `call` in the block of the transaction of `receipt`,
+        so that the result reflects the transaction"""
+        return self.pinned(receipt.blockNumber)._call(call)
+
+
+    def pinned(self, block_identifier: Any = None) -> 'Web3Contract':
+        """Returns a view of this contract whose reads are all made in the
+        block `block_identifier`, by default the latest block. This
+        gives consistent results over several reads. A view of an
+        already pinned contract is pinned to the same block unless
+        another one is given."""
+        if block_identifier is None:
+            block_identifier = self._block()
+
+        view = copy.copy(self)
+        view.block_identifier = block_identifier
+        return view
+
+
+    def nowait(self) -> 'Web3Contract':
+        """Returns a view of this contract whose write methods return
+        :class:`PendingTransaction` handles instead of waiting for the
+        transactions to be mined"""
+        view = copy.copy(self)
+        view.wait = False
+        return view
+
+
+    def _send(self, call, then: Callable[[Any], Any] = None,
+              nonce: int = None) -> PendingTransaction:
+        """Sends the contract function call `call` as a transaction and
+        returns its handle, whose result is what `then` returns for the
+        receipt. The nonce is taken from the nonce manager if there is
+        one and `nonce` is not given. The gas limit comes from the gas
+        estimator."""
+        tx = {'gas': self.gas.gas(call, self.minter), 'from': self.minter}
+
+        nonces = self.nonces if nonce is None else None
+        if nonces is not None:
+            nonce = nonces.take()
+        if nonce is not None:
+            tx['nonce'] = nonce
+
+        start = time.monotonic()
+        try:
+            tx_hash = call.transact(tx)
+        except Exception:
+            # the nonce was not used, the following ones would wait
+            # for it forever
+            if nonces is not None:
+                nonces.release(tx['nonce'])
+            self.instrumentation.transaction(call.fn_name, 0, None, False)
+            raise
+
+        # the mined transaction is recorded by the poller, also when
+        # its result is not waited for
+        return PendingTransaction(
+            self.web3, tx_hash, then, poller=self.receipts,
+            mined=lambda receipt: self._mined(receipt, call, tx['gas'],
+                                              start))
+
+
+    def _mined(self, receipt, call, gas: int, start: float) -> None:
+        self.last_block_number = receipt.blockNumber
+        self.last_gas_used = receipt.gasUsed
+        self.blocks.seen(receipt.blockNumber)
+        self.gas.observe(call, gas, receipt.gasUsed, bool(receipt.status))
+        self.instrumentation.transaction(
+            call.fn_name, time.monotonic() - start, receipt.gasUsed,
+            bool(receipt.status))
+
+
+    def _finish(self, pending: PendingTransaction) -> Any:
+        """Returns the result of `pending`, or `pending` itself if not
+        waiting for transactions"""
+        return pending.result() if self.wait else pending
+
+
+    def _transact_many(self, calls: List[Any]) -> List[Optional[Any]]:
+        """Sends the given contract function calls as transactions from
+        `minter` with consecutive nonces without waiting in between, and
+        then waits for all of their receipts. Returns the receipts in
+        the same order, None for transactions that could not be sent.
+        If sending a transaction fails, the rest are not sent, as they
+        would wait for the missing nonce forever. `last_gas_used` is set
+        to the gas used by the last transaction."""
+        if self.nonces is not None:
+            nonce = self.nonces.take(len(calls))
+        else:
+            nonce = self.web3.eth.getTransactionCount(
+                self.minter or self.web3.eth.defaultAccount, 'pending')
+
+        pendings = []
+        for i, call in enumerate(calls):
+            try:
+                pendings.append(self._send(call, nonce=nonce))
+            except Exception:
+                logger.exception("Sending transaction %d of %d failed",
+                                 i + 1, len(calls))
+                if self.nonces is not None:
+                    self.nonces.release(nonce, len(calls) - i)
+                break
+            nonce += 1
+
+        # the transactions are mined concurrently, so this waits for
+        # about as long as for the last one
+        receipts = [pending.result() for pending in pendings]
+
+        # the transactions may be mined in any order, the gas used by
+        # each one is reported to the instrumentation
+        if receipts:
+            self.last_block_number = receipts[-1].blockNumber
+            self.last_gas_used = receipts[-1].gasUsed
+
+        return receipts + [None] * (len(calls) - len(receipts))
+
+
+    def _added_id(self, receipt, event: str, arg: str) -> int:
+        """Returns the identifier of the object added by the transaction of
+        `receipt`"""
+        adds = getattr(self.contract.events, event)().processReceipt(receipt)
+        assert len(adds) == 1, "This should not happen"
+        return adds[0].args[arg]
+
+
+    def _added_ids(self, receipts: List[Optional[Any]], event: str,
+                   arg: str) -> List[int]:
+        """Returns the identifiers of the objects added by the transactions
+        of `receipts`, -1 for failed transactions"""
+        return [self._added_id(receipt, event, arg)
+                if receipt is not None and receipt.status else -1
+                for receipt in receipts]
+
+
     def get_open_request_ids(self) -> List[int]:
-        return self.status1(
-            self.contract.functions.getOpenRequestIdentifiers().call())
+        return self.status1(self._call(
+            self.contract.functions.getOpenRequestIdentifiers()))
 
     def get_closed_request_ids(self) -> List[int]:
-        return self.status1(
-            self.contract.functions.getClosedRequestIdentifiers().call())
+        return self.status1(self._call(
+            self.contract.functions.getClosedRequestIdentifiers()))
 
 
     def get_request_ids(self) -> List[int]:
-        return self.get_open_request_ids() + self.get_closed_request_ids()
+        open_ids, closed_ids = self._call_many([
+            self.contract.functions.getOpenRequestIdentifiers(),
+            self.contract.functions.getClosedRequestIdentifiers()])
 
+        return self.status1(open_ids) + self.status1(closed_ids)
 
-    def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
-        if not self.status1(
-                self.contract.functions.isRequestDefined(request_id).call()):
-            return None
 
-        #deadline, stage = self.status(
-        #    self.contract.functions.getRequest(request_id).call())
+    def get_open_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        """Returns at most `limit` open request identifiers starting from
+        the position `offset`, and the total number of open requests"""
+        if 'getOpenRequestIdentifiersRange' not in self.abi_names:
+            request_ids = self.get_open_request_ids()
+            return request_ids[offset:offset + limit], len(request_ids)
 
-        status, deadline, stage, address = self.contract.functions.getRequest(request_id).call()
+        request_ids, total = self.status(self._call(
+            self.contract.functions
+                .getOpenRequestIdentifiersRange(offset, limit)))
+        return request_ids, total
+
+    def get_closed_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        """Returns at most `limit` closed request identifiers starting from
+        the position `offset`, and the total number of closed requests"""
+        if 'getClosedRequestIdentifiersRange' not in self.abi_names:
+            request_ids = self.get_closed_request_ids()
+            return request_ids[offset:offset + limit], len(request_ids)
+
+        request_ids, total = self.status(self._call(
+            self.contract.functions
+                .getClosedRequestIdentifiersRange(offset, limit)))
+        return request_ids, total
 
-        is_pending = stage == 0
-        is_open = stage == 1
-        is_closed = stage == 2
 
-        is_decided = self.status1(
-            self.contract.functions.isRequestDecided(request_id).call())
+    def get_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        # both reads from the same block, so that no request moving from
+        # the open to the closed ones is seen twice or missed
+        contract = self.pinned() if self.block_identifier is None else self
+        open_ids, open_total = contract.get_open_request_ids_page(
+            offset, limit)
 
-        offer_ids = self.status1(
-            self.contract.functions.getRequestOfferIDs(request_id).call())
+        # the rest of the page, if any, comes from the closed requests
+        closed_ids, closed_total = contract.get_closed_request_ids_page(
+            max(0, offset - open_total), limit - len(open_ids))
 
-        if is_decided:
-            decided_ids = self.status1(
-                self.contract.functions.getRequestDecision(request_id).call())
-        else:
-            decided_ids = []
+        return open_ids + closed_ids, open_total + closed_total
 
-        result = dict(deadline=deadline,
-                      is_decided=is_decided,
-                      is_pending=is_pending,
-                      is_open=is_open,
-                      is_closed=is_closed,
-                      offer_ids=offer_ids,
-                      decided_offer_ids=decided_ids)
+
+    def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
+        result = self.get_requests_bulk([request_id])[0]
+
+        if result is not None:
+            del result['extra']
 
         return result
 
 
     def get_request_extra(self, request_id: int) -> Any:
-        if not self.status1(
-                self.contract.functions.isRequestDefined(request_id).call()):
-            return None
+        calls, parse = self._request_extra_reads(request_id)
+        return parse(self._call_many(calls))
+
+
+    def get_requests_bulk(self, request_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        # In addition to the common attributes, the results contain the
+        # 'request_maker' address and the 'decision_time' (None if not
+        # decided) of the request.
+        calls, parse = self._requests_bulk_reads(request_ids)
+        return parse(self._call_many(calls))
+
+
+    # The reads are split into the contract function calls to make and
+    # a function that parses their results, so that the same reads can
+    # be executed both synchronously and asynchronously (see
+    # AsyncWeb3Contract).
+
+    def _request_extra_reads(self, request_id: int) \
+            -> Tuple[List[Any], Callable[[List[Any]], Any]]:
+        def parse(responses: List[Any]) -> Any:
+            is_defined, extra = responses
+
+            if not self.status1(is_defined):
+                return None
+
+            return self.status(extra)
+
+        return [self.contract.functions.isRequestDefined(request_id),
+                self.contract.functions.getRequestExtra(request_id)], parse
+
+
+    def _requests_bulk_reads(self, request_ids: List[int]) \
+            -> Tuple[List[Any], Callable[[List[Any]], Any]]:
+        if self.has_full_getters:
+            return self._requests_full_reads(request_ids)
+
+        # Everything is fetched with a single `_call_many`, so that with
+        # an aggregator the results come from the same block. The
+        # getters return UndefinedID status for unknown identifiers and
+        # the decision getters ReqNotDecided for undecided requests,
+        # those results are just ignored.
+        functions = self.contract.functions
+        request_ids = list(request_ids)
+
+        calls = [
+            call
+            for request_id in request_ids
+            for call in (functions.getRequest(request_id),
+                         functions.getRequestExtra(request_id),
+                         functions.isRequestDecided(request_id),
+                         functions.getRequestOfferIDs(request_id),
+                         functions.getRequestDecision(request_id),
+                         functions.getRequestDecisionTime(request_id))]
+
+        def parse(outputs: List[Any]) -> List[Optional[Dict[str, Any]]]:
+            responses = iter(outputs)
+
+            results: List[Optional[Dict[str, Any]]] = []
+            for request_id in request_ids:
+                request, extra, is_decided, offer_ids, decision, \
+                    decision_time = [next(responses) for _ in range(6)]
+
+                if request[0] != Status.Successful.value:
+                    results.append(None)
+                    continue
+
+                status, deadline, stage, request_maker = request
+                is_decided = self.status1(is_decided)
+
+                results.append(self._request_result(
+                    deadline=deadline,
+                    stage=stage,
+                    request_maker=request_maker,
+                    is_decided=is_decided,
+                    decision_time=self.status1(decision_time)
+                    if is_decided else None,
+                    offer_ids=self.status1(offer_ids),
+                    decided_offer_ids=self.status1(decision)
+                    if is_decided else [],
+                    extra=self.status(extra)))
+
+            return results
+
+        return calls, parse
+
+
+    def _requests_full_reads(self, request_ids: List[int]) \
+            -> Tuple[List[Any], Callable[[List[Any]], Any]]:
+        def parse(responses: List[Any]) -> List[Optional[Dict[str, Any]]]:
+            results: List[Optional[Dict[str, Any]]] = []
+            for response in responses:
+                if response[0] != Status.Successful.value:
+                    results.append(None)
+                    continue
+
+                deadline, stage, request_maker, is_decided, decision_time, \
+                    offer_ids, decided_offer_ids, extra = \
+                    self.status(response)
+
+                results.append(self._request_result(
+                    deadline=deadline,
+                    stage=stage,
+                    request_maker=request_maker,
+                    is_decided=is_decided,
+                    decision_time=decision_time if is_decided else None,
+                    offer_ids=offer_ids,
+                    decided_offer_ids=decided_offer_ids if is_decided else [],
+                    extra=extra))
+
+            return results
+
+        return [self.contract.functions.getRequestFull(request_id)
+                for request_id in request_ids], parse
+
+
+    def _request_result(self, stage: int, **values: Any) -> Dict[str, Any]:
+        return dict(values,
+                    is_pending=stage == 0,
+                    is_open=stage == 1,
+                    is_closed=stage == 2)
 
-        extra = self.status(
-            self.contract.functions.getRequestExtra(request_id).call())
 
-        if isinstance(extra, list):
-            return extra
+    def add_request(self, deadline: int) -> int:
+        try:
+            pending = self._send(
+                self.contract.functions.submitRequest(deadline),
+                lambda receipt: self._added_id(
+                    receipt, 'RequestAdded', 'requestID'))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
 
-        return [extra]
+        return self._finish(pending)
 
 
-    def add_request(self, deadline: int) -> int:
+    def add_request_extra(self, request_id: int, extra: List[Any]) -> bool:
         try:
-            tx_hash = self.contract.functions.submitRequest(
-                deadline).transact({'gas': 1000000, 'from': self.minter})
-        except Exception as e:
-            print(e)
-            return -1
+            pending = self._send(
+                self.contract.functions.submitRequestArrayExtra(
+                    request_id, extra),
+                lambda receipt: True)
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return False
 
-        tx_receipt = self.web3.eth.waitForTransactionReceipt(tx_hash)
+        return self._finish(pending)
 
-        self.last_block_number = tx_receipt.blockNumber
-        self.last_gas_used = tx_receipt.gasUsed
 
-        adds = self.contract.events.RequestAdded().processReceipt(tx_receipt)
-        assert len(adds) == 1, "This should not happen"
-        request_id = adds[0].args.requestID
+    def add_requests_bulk(self, deadlines: List[int]) -> List[int]:
+        receipts = self._transact_many([
+            self.contract.functions.submitRequest(deadline)
+            for deadline in deadlines])
+        return self._added_ids(receipts, 'RequestAdded', 'requestID')
 
-        return request_id
 
+    def add_requests_extra_bulk(self, request_ids: List[int],
+                                extras: List[List[Any]]) -> List[bool]:
+        receipts = self._transact_many([
+            self.contract.functions.submitRequestArrayExtra(request_id, extra)
+            for request_id, extra in zip(request_ids, extras)])
+        return [receipt is not None and bool(receipt.status)
+                for receipt in receipts]
+
+
+    # The contracts built from this version have `submit*WithExtra`
+    # functions that add the object and its extra data in a single
+    # transaction, older ones need two transactions (see Contract)
+
+    def add_request_with_extra(self, deadline: int, extra: List[Any]) -> int:
+        if not self.has_combined_submits:
+            return super().add_request_with_extra(deadline, extra)
 
-    def add_request_extra(self, request_id: int, extra: List[Any]) -> bool:
         try:
-            tx_hash = self.contract.functions.submitRequestArrayExtra(
-                request_id,
-                extra).transact({'gas': 1000000, 'from': self.minter})
-        except Exception as e:
-            print(e)
-            return False
+            pending = self._send(
+                self.contract.functions.submitRequestWithExtra(
+                    deadline, extra),
+                lambda receipt: self._added_ids(
+                    [receipt], 'RequestAdded', 'requestID')[0])
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
+
+        return self._finish(pending)
 
-        tx_receipt = self.web3.eth.waitForTransactionReceipt(tx_hash)
 
-        self.last_block_number = tx_receipt.blockNumber
-        self.last_gas_used = tx_receipt.gasUsed
+    def add_requests_with_extra_bulk(self, deadlines: List[int],
+                                     extras: List[List[Any]]) -> List[int]:
+        if not self.has_combined_submits:
+            return super().add_requests_with_extra_bulk(deadlines, extras)
 
-        return True
+        receipts = self._transact_many([
+            self.contract.functions.submitRequestWithExtra(deadline, extra)
+            for deadline, extra in zip(deadlines, extras)])
+        return self._added_ids(receipts, 'RequestAdded', 'requestID')
 
 
     def get_offer(self, offer_id: int) -> Optional[Dict[str, Any]]:
-        if not self.status1(
-                self.contract.functions.isOfferDefined(offer_id).call()):
-            return None
+        result = self.get_offers_bulk([offer_id])[0]
 
-        request_id, author, stage = self.status(
-            self.contract.functions.getOffer(offer_id).call())
+        if result is not None:
+            del result['extra']
 
-        return dict(
-            request_id=request_id,
-            author=author,
-            stage=stage)
+        return result
 
 
     def get_offer_extra(self, offer_id: int) -> Any:
-        if not self.status1(
-                self.contract.functions.isOfferDefined(offer_id).call()):
-            return None
+        calls, parse = self._offer_extra_reads(offer_id)
+        return parse(self._call_many(calls))
 
-        extra = self.status(
-            self.contract.functions.getOfferExtra(offer_id).call())
 
-        if isinstance(extra, list):
-            return extra
+    def get_offers_bulk(self, offer_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        calls, parse = self._offers_bulk_reads(offer_ids)
+        return parse(self._call_many(calls))
 
-        return [extra]
 
+    def _offer_extra_reads(self, offer_id: int) \
+            -> Tuple[List[Any], Callable[[List[Any]], Any]]:
+        def parse(responses: List[Any]) -> Any:
+            is_defined, extra = responses
 
-    def add_offer(self, request_id: int) -> int:
-        try:
-            tx_hash = self.contract.functions.submitOffer(
-                request_id).transact({'gas': 1000000, 'from': self.minter})
-        except Exception as e:
-            print(e)
-            return -1
+            if not self.status1(is_defined):
+                return None
 
-        tx_receipt = self.web3.eth.waitForTransactionReceipt(tx_hash)
+            return self.status(extra)
 
-        self.last_block_number = tx_receipt.blockNumber
-        self.last_gas_used = tx_receipt.gasUsed
+        return [self.contract.functions.isOfferDefined(offer_id),
+                self.contract.functions.getOfferExtra(offer_id)], parse
 
-        adds = self.contract.events.OfferAdded().processReceipt(tx_receipt)
-        assert len(adds) == 1, "This should not happen"
-        offer_id = adds[0].args.offerID
 
-        return offer_id
+    def _offers_bulk_reads(self, offer_ids: List[int]) \
+            -> Tuple[List[Any], Callable[[List[Any]], Any]]:
+        if self.has_full_getters:
+            return self._offers_full_reads(offer_ids)
+
+        functions = self.contract.functions
+        offer_ids = list(offer_ids)
+
+        calls = [
+            call
+            for offer_id in offer_ids
+            for call in (functions.getOffer(offer_id),
+                         functions.getOfferExtra(offer_id))]
+
+        def parse(outputs: List[Any]) -> List[Optional[Dict[str, Any]]]:
+            responses = iter(outputs)
+
+            results: List[Optional[Dict[str, Any]]] = []
+            for offer_id in offer_ids:
+                offer, extra = next(responses), next(responses)
+
+                if offer[0] != Status.Successful.value:
+                    results.append(None)
+                    continue
+
+                request_id, author, stage = self.status(offer)
+                results.append(dict(
+                    request_id=request_id,
+                    author=author,
+                    stage=stage,
+                    extra=self.status(extra)))
+
+            return results
+
+        return calls, parse
+
+
+    def _offers_full_reads(self, offer_ids: List[int]) \
+            -> Tuple[List[Any], Callable[[List[Any]], Any]]:
+        def parse(responses: List[Any]) -> List[Optional[Dict[str, Any]]]:
+            results: List[Optional[Dict[str, Any]]] = []
+            for response in responses:
+                if response[0] != Status.Successful.value:
+                    results.append(None)
+                    continue
+
+                request_id, author, stage, extra = self.status(response)
+                results.append(dict(
+                    request_id=request_id,
+                    author=author,
+                    stage=stage,
+                    extra=extra))
+
+            return results
+
+        return [self.contract.functions.getOfferFull(offer_id)
+                for offer_id in offer_ids], parse
+
+
+    def add_offer(self, request_id: int) -> int:
+        try:
+            pending = self._send(
+                self.contract.functions.submitOffer(request_id),
+                lambda receipt: self._added_id(
+                    receipt, 'OfferAdded', 'offerID'))
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
+
+        return self._finish(pending)
 
 
     def add_offer_extra(self, offer_id: int, extra: List[Any]) -> bool:
         # FIXME: This is now tied to the flower market specifically
-        tx_hash = self.contract.functions.submitOfferArrayExtra(
-            offer_id,
-            extra).transact({'gas': 1000000, 'from': self.minter})
+        return self._finish(self._send(
+            self.contract.functions.submitOfferArrayExtra(offer_id, extra),
+            lambda receipt: True))
 
-        tx_receipt = self.web3.eth.waitForTransactionReceipt(tx_hash)
 
-        self.last_block_number = tx_receipt.blockNumber
-        self.last_gas_used = tx_receipt.gasUsed
+    def add_offers_bulk(self, request_ids: List[int]) -> List[int]:
+        receipts = self._transact_many([
+            self.contract.functions.submitOffer(request_id)
+            for request_id in request_ids])
+        return self._added_ids(receipts, 'OfferAdded', 'offerID')
 
-        return True
 
+    def add_offers_extra_bulk(self, offer_ids: List[int],
+                              extras: List[List[Any]]) -> List[bool]:
+        receipts = self._transact_many([
+            self.contract.functions.submitOfferArrayExtra(offer_id, extra)
+            for offer_id, extra in zip(offer_ids, extras)])
+        return [receipt is not None and bool(receipt.status)
+                for receipt in receipts]
 
-    def close_request(self, request_id: int):
-        tx_hash = self.contract.functions \
-            .closeRequest(request_id) \
-            .transact({'gas': 1000000, 'from': self.minter})
 
-        tx_receipt = self.web3.eth.waitForTransactionReceipt(tx_hash)
+    def add_offer_with_extra(self, request_id: int, extra: List[Any]) -> int:
+        if not self.has_combined_submits:
+            return super().add_offer_with_extra(request_id, extra)
 
-        self.last_block_number = tx_receipt.blockNumber
-        self.last_gas_used = tx_receipt.gasUsed
+        try:
+            pending = self._send(
+                self.contract.functions.submitOfferWithExtra(
+                    request_id, extra),
+                lambda receipt: self._added_ids(
+                    [receipt], 'OfferAdded', 'offerID')[0])
+        except Exception:
+            logger.exception("Sending transaction failed")
+            return -1
 
-        return request_id in self.status1(
-            self.contract.functions
-                .getClosedRequestIdentifiers()
-                .call()
-            )
+        return self._finish(pending)
 
 
-    def decide_request(self, request_id: int,
-                       selected_offer_ids: List[int] = []) -> bool:
-        tx_hash = self.contract.functions.decideRequest(
-            request_id,
-            selected_offer_ids).transact({'gas': 1000000, 'from': self.minter})
+    def add_offers_with_extra_bulk(self, request_ids: List[int],
+                                   extras: List[List[Any]]) -> List[int]:
+        if not self.has_combined_submits:
+            return super().add_offers_with_extra_bulk(request_ids, extras)
 
-        tx_receipt = self.web3.eth.waitForTransactionReceipt(tx_hash)
+        receipts = self._transact_many([
+            self.contract.functions.submitOfferWithExtra(request_id, extra)
+            for request_id, extra in zip(request_ids, extras)])
+        return self._added_ids(receipts, 'OfferAdded', 'offerID')
 
-        self.last_block_number = tx_receipt.blockNumber
-        self.last_gas_used = tx_receipt.gasUsed
 
-        return cast(bool, self.status1(
-            self.contract.functions.isRequestDecided(request_id).call()))
+    def close_request(self, request_id: int):
+        return self._finish(self._send(
+            self.contract.functions.closeRequest(request_id),
+            lambda receipt: request_id in self.status1(self._call_after(
+                receipt,
+                self.contract.functions.getClosedRequestIdentifiers()))))
+
+
+    def decide_request(self, request_id: int,
+                       selected_offer_ids: List[int] = []) -> bool:
+        return self._finish(self._send(
+            self.contract.functions.decideRequest(
+                request_id, selected_offer_ids),
+            lambda receipt: cast(bool, self.status1(self._call_after(
+                receipt,
+                self.contract.functions.isRequestDecided(request_id))))))
 
 
     def delete_request(self, request_id: int) -> bool:
         try:
-            tx_hash = self.contract.functions \
-                .deleteRequest(request_id) \
-                .transact({'gas': 1000000, 'from': self.minter})
-        except Exception as e:
-            print(e)
+            pending = self._send(
+                self.contract.functions.deleteRequest(request_id),
+                lambda receipt: not self.status1(self._call_after(
+                    receipt,
+                    self.contract.functions.isRequestDefined(request_id))))
+        except Exception:
+            logger.exception("Sending transaction failed")
             return False
 
-        tx_receipt = self.web3.eth.waitForTransactionReceipt(tx_hash)
-
-        self.last_block_number = tx_receipt.blockNumber
-        self.last_gas_used = tx_receipt.gasUsed
-
-        return not self.status1(
-            self.contract.functions.isRequestDefined(request_id).call())
+        return self._finish(pending)
 
 
     def get_type(self) -> str:
-        return self.status1(self.contract.functions.getType().call())
+        return self.status1(self._call(self.contract.functions.getType()))
@@ -0,0 +1,417 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Local index of the marketplace state. The :class:`Index` keeps a
+copy of the requests and offers of a marketplace contract in an SQLite
+database, and provides the same bulk read methods as
+:class:`sofie_offer_marketplace.ethereum.Web3Contract` so that it can
+be used in place of the contract for reads.
+
+The :class:`Indexer` keeps the index up to date from the logs emitted
+by the contract. The logs do not carry the request and offer data
+itself, so they are used to find out which requests and offers have
+changed, and those are then re-read from the contract with the bulk
+read methods. The position of the indexer in the logs is stored in the
+index database, so a persistent index is brought up to date from where
+it left off.
+"""
+
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .core import Contract
+from .scanner import Checkpoint, LogDecoder, LogScanner
+
+# Events that change the state of requests and offers
+EVENTS = ('RequestAdded', 'RequestExtraAdded', 'RequestClosed',
+          'RequestDecided', 'OfferAdded', 'OfferExtraAdded',
+          'TradeSettled', 'FunctionStatus')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    request_id INTEGER PRIMARY KEY,
+    deadline INTEGER,
+    stage INTEGER,
+    request_maker TEXT,
+    is_decided INTEGER,
+    decision_time INTEGER,
+    offer_ids TEXT,
+    decided_offer_ids TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS requests_stage ON requests (stage, request_id);
+CREATE TABLE IF NOT EXISTS offers (
+    offer_id INTEGER PRIMARY KEY,
+    request_id INTEGER,
+    author TEXT,
+    stage INTEGER,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS offers_request ON offers (request_id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    state TEXT
+);
+"""
+
+STAGE_PENDING, STAGE_OPEN, STAGE_CLOSED = 0, 1, 2
+
+
+class Index(object):
+    """SQLite copy of the requests and offers of a marketplace. The
+    database is created in `path` if it does not exist yet, by default
+    the index is kept in memory only.
+
+    The index can be shared between threads, all access is serialized
+    with a lock.
+    """
+
+    def __init__(self, path: str = ':memory:') -> None:
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+
+    def put_requests(self,
+                     requests: Iterable[Tuple[int, Optional[Dict[str, Any]]]]
+                     ) -> None:
+        """Stores the given (request id, data) pairs, where data is in the
+        format returned by :meth:`Contract.get_requests_bulk`. Requests
+        with None as data are removed along with their offers."""
+        with self.lock, self.db:
+            for request_id, data in requests:
+                if data is None:
+                    self.db.execute(
+                        "DELETE FROM requests WHERE request_id = ?",
+                        (request_id,))
+                    self.db.execute(
+                        "DELETE FROM offers WHERE request_id = ?",
+                        (request_id,))
+                    continue
+
+                if data['is_pending']:
+                    stage = STAGE_PENDING
+                elif data['is_open']:
+                    stage = STAGE_OPEN
+                else:
+                    stage = STAGE_CLOSED
+
+                self.db.execute(
+                    "INSERT OR REPLACE INTO requests VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (request_id, data['deadline'], stage,
+                     data.get('request_maker'), bool(data['is_decided']),
+                     data.get('decision_time'),
+                     json.dumps(list(data['offer_ids'])),
+                     json.dumps(list(data['decided_offer_ids'])),
+                     json.dumps(data['extra'])))
+
+    def put_offers(self,
+                   offers: Iterable[Tuple[int, Optional[Dict[str, Any]]]]
+                   ) -> None:
+        """Stores the given (offer id, data) pairs, where data is in the
+        format returned by :meth:`Contract.get_offers_bulk`. Offers with
+        None as data are removed."""
+        with self.lock, self.db:
+            for offer_id, data in offers:
+                if data is None:
+                    self.db.execute(
+                        "DELETE FROM offers WHERE offer_id = ?", (offer_id,))
+                    continue
+
+                self.db.execute(
+                    "INSERT OR REPLACE INTO offers VALUES (?, ?, ?, ?, ?)",
+                    (offer_id, data['request_id'], data['author'],
+                     data.get('stage'), json.dumps(data['extra'])))
+
+    def get_requests_bulk(self, request_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        request_ids = list(request_ids)
+        rows = self._select(
+            "SELECT * FROM requests WHERE request_id IN ({})", request_ids)
+
+        results = {}
+        for (request_id, deadline, stage, request_maker, is_decided,
+             decision_time, offer_ids, decided_offer_ids, extra) in rows:
+            results[request_id] = dict(
+                deadline=deadline,
+                is_decided=bool(is_decided),
+                is_pending=stage == STAGE_PENDING,
+                is_open=stage == STAGE_OPEN,
+                is_closed=stage == STAGE_CLOSED,
+                request_maker=request_maker,
+                decision_time=decision_time,
+                offer_ids=json.loads(offer_ids),
+                decided_offer_ids=json.loads(decided_offer_ids),
+                extra=json.loads(extra))
+
+        return [results.get(request_id) for request_id in request_ids]
+
+    def get_offers_bulk(self, offer_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        offer_ids = list(offer_ids)
+        rows = self._select(
+            "SELECT * FROM offers WHERE offer_id IN ({})", offer_ids)
+
+        results = {}
+        for offer_id, request_id, author, stage, extra in rows:
+            results[offer_id] = dict(
+                request_id=request_id,
+                author=author,
+                stage=stage,
+                extra=json.loads(extra))
+
+        return [results.get(offer_id) for offer_id in offer_ids]
+
+    def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
+        result = self.get_requests_bulk([request_id])[0]
+
+        if result is not None:
+            del result['extra']
+
+        return result
+
+    def get_offer(self, offer_id: int) -> Optional[Dict[str, Any]]:
+        result = self.get_offers_bulk([offer_id])[0]
+
+        if result is not None:
+            del result['extra']
+
+        return result
+
+    def get_open_request_ids(self) -> List[int]:
+        return self.get_open_request_ids_page(0, -1)[0]
+
+    def get_closed_request_ids(self) -> List[int]:
+        return self.get_closed_request_ids_page(0, -1)[0]
+
+    def get_request_ids(self) -> List[int]:
+        return self.get_open_request_ids() + self.get_closed_request_ids()
+
+    def get_open_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        return self._request_ids_page(STAGE_OPEN, offset, limit)
+
+    def get_closed_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        return self._request_ids_page(STAGE_CLOSED, offset, limit)
+
+    def get_request_ids_page(self, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        open_ids, open_total = self.get_open_request_ids_page(offset, limit)
+
+        closed_ids, closed_total = self.get_closed_request_ids_page(
+            max(0, offset - open_total), limit - len(open_ids))
+
+        return open_ids + closed_ids, open_total + closed_total
+
+    def _request_ids_page(self, stage: int, offset: int, limit: int) \
+            -> Tuple[List[int], int]:
+        # a negative limit means no limit in SQLite
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT request_id FROM requests WHERE stage = ? "
+                "ORDER BY request_id LIMIT ? OFFSET ?",
+                (stage, limit, offset)).fetchall()
+            (total,) = self.db.execute(
+                "SELECT COUNT(*) FROM requests WHERE stage = ?",
+                (stage,)).fetchone()
+
+        return [request_id for (request_id,) in rows], total
+
+    def _select(self, query: str, ids: List[int]) -> List[Tuple]:
+        # SQLite limits the number of parameters of a statement
+        rows: List[Tuple] = []
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows += self.db.execute(
+                    query.format(",".join("?" * len(chunk))),
+                    chunk).fetchall()
+        return rows
+
+
+class IndexCheckpoint(Checkpoint):
+    """Log scanner checkpoint stored in the database of an
+    :class:`Index` under `name`"""
+
+    def __init__(self, index: Index, name: str = 'indexer') -> None:
+        super().__init__()
+        self.index = index
+        self.name = name
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        with self.index.lock:
+            row = self.index.db.execute(
+                "SELECT state FROM checkpoints WHERE name = ?",
+                (self.name,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save(self, state: Dict[str, Any]) -> None:
+        with self.index.lock, self.index.db:
+            self.index.db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?)",
+                (self.name, json.dumps(state)))
+
+
+class Indexer(object):
+    """Keeps an :class:`Index` up to date with a marketplace contract.
+    The requests and offers are read with the bulk read methods of
+    `contract`, and the logs of `web3contract` (the underlying web3
+    contract object, only needed for :meth:`apply_logs`) are used to
+    find out what has changed.
+
+    The state changed by the logs is read in the block of the logs, if
+    the contract can be pinned to a block (see
+    :meth:`Web3Contract.pinned`), so that the index does not fall
+    behind the logs when `contract` reuses the latest block number.
+    """
+
+    def __init__(self, contract: Contract, index: Index,
+                 web3contract=None, page_size: int = 500) -> None:
+        self.contract = contract
+        self.index = index
+        self.web3contract = web3contract
+        self.page_size = page_size
+        self.decoder = LogDecoder(web3contract, EVENTS) \
+            if web3contract is not None else None
+
+    def sync_all(self, block: int = None) -> None:
+        """Reads all requests and their offers from the contract into the
+        index, removing any requests that no longer exist. The contract
+        is read in `block` if given."""
+        request_ids = self._reader(block).get_request_ids()
+        self.refresh(request_ids=request_ids, block=block)
+
+        stale = set(self.index.get_request_ids()) - set(request_ids)
+        self.index.put_requests((request_id, None) for request_id in stale)
+
+    def refresh(self, request_ids: Iterable[int] = (),
+                offer_ids: Iterable[int] = (), block: int = None) -> None:
+        """Re-reads the given requests, all of their offers and the given
+        offers from the contract into the index, in `block` if given"""
+        contract = self._reader(block)
+        request_ids = list(dict.fromkeys(request_ids))
+        offer_ids = list(offer_ids)
+
+        for i in range(0, len(request_ids), self.page_size):
+            chunk = request_ids[i:i + self.page_size]
+            requests = contract.get_requests_bulk(chunk)
+            self.index.put_requests(zip(chunk, requests))
+
+            for request in requests:
+                if request is not None:
+                    offer_ids += request['offer_ids']
+
+        offer_ids = list(dict.fromkeys(offer_ids))
+
+        for i in range(0, len(offer_ids), self.page_size):
+            chunk = offer_ids[i:i + self.page_size]
+            self.index.put_offers(
+                zip(chunk, contract.get_offers_bulk(chunk)))
+
+    def _reader(self, block: Optional[int]) -> Contract:
+        """Returns the contract pinned to `block`, if given and supported
+        by the contract"""
+        pinned = getattr(self.contract, 'pinned', None)
+        if block is None or pinned is None:
+            return self.contract
+        return pinned(block)
+
+    def apply_logs(self, logs: Iterable[Dict[str, Any]]) -> None:
+        """Applies raw logs (as returned by `eth_getLogs` or log filters)
+        of the contract to the index"""
+        assert self.decoder is not None, \
+            "web3 contract is needed for decoding logs"
+
+        logs = list(logs)
+        block = max((log['blockNumber'] for log in logs), default=None)
+        self.apply_events(self.decoder.decode(logs), block)
+
+    def apply_events(self, events: Iterable[Tuple[str, Dict[str, Any], Any]],
+                     block: int = None) -> None:
+        """Applies decoded events, given as (event name, arguments,
+        transaction hash) tuples, to the index. The changed state is
+        read in `block` if given, which should be the block of the last
+        event."""
+        request_ids: Set[int] = set()
+        offer_ids: Set[int] = set()
+        status_only: Set[Any] = set()
+        other: Set[Any] = set()
+
+        for name, args, tx_hash in events:
+            if name == 'FunctionStatus':
+                if args['status'] == 0:
+                    status_only.add(tx_hash)
+                continue
+
+            other.add(tx_hash)
+
+            if 'requestID' in args:
+                request_ids.add(args['requestID'])
+
+            if 'offerID' in args:
+                offer_ids.add(args['offerID'])
+
+        self.refresh(request_ids=request_ids, offer_ids=offer_ids,
+                     block=block)
+
+        # Deleting a request only emits a FunctionStatus event, so
+        # successful transactions without other events may have
+        # deleted requests
+        if status_only - other:
+            self._remove_deleted(block)
+
+    def _remove_deleted(self, block: int = None) -> None:
+        existing = set(self._reader(block).get_request_ids())
+        self.index.put_requests(
+            (request_id, None)
+            for request_id in self.index.get_closed_request_ids()
+            if request_id not in existing)
+
+    def start(self, web3, address: str, poll_interval: float = 2.0,
+              **kwargs) -> threading.Thread:
+        """Starts a daemon thread that applies the logs of the contract at
+        `address` to the index, polling for new logs every
+        `poll_interval` seconds. An index that has not been scanned
+        before is first synchronized with the contract. Additional
+        keyword arguments are passed to :class:`LogScanner`."""
+        checkpoint = IndexCheckpoint(self.index)
+        start_block = None
+
+        if checkpoint.load() is None:
+            # the logs of the current block may be applied again after
+            # the synchronization, which only re-reads the same state
+            start_block = web3.eth.blockNumber
+            self.sync_all(start_block)
+
+        scanner = LogScanner(web3, address, checkpoint=checkpoint,
+                             start_block=start_block, **kwargs)
+
+        thread = threading.Thread(
+            target=scanner.run,
+            args=(self.apply_logs, self._rollback, poll_interval),
+            name="indexer", daemon=True)
+        thread.start()
+        return thread
+
+    def _rollback(self, block: int) -> None:
+        # the requests and offers changed by the dropped blocks are not
+        # known anymore, so everything is read again
+        self.sync_all()
@@ -0,0 +1,209 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Instrumentation of the contract calls and transactions made by
+:class:`Web3Contract`. :class:`Instrumentation` is the hook interface,
+and :class:`RPCMetrics` an implementation aggregating the events into
+histograms, which can be exported in the Prometheus text format.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                   10, 30, 60)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 4096, 16384, 65536)
+GAS_BUCKETS = (25000, 50000, 100000, 200000, 400000, 800000, 1600000,
+               3200000)
+
+
+class Instrumentation(object):
+    """Hook called by :class:`Web3Contract` around every contract call
+    and transaction, and by :class:`MultiEndpointProvider` for retried
+    requests. This implementation does nothing, subclasses record what
+    they need."""
+
+    def call(self, name: str, latency: float, size: int) -> None:
+        """A contract function `name` was called, `latency` being the
+        seconds taken by the round-trip it was part of (calls are
+        batched) and `size` the bytes of its call data"""
+
+    def cached(self, name: str) -> None:
+        """A call of the contract function `name` was answered from the
+        call cache"""
+
+    def transaction(self, name: str, latency: float,
+                    gas_used: Optional[int], success: bool) -> None:
+        """A transaction calling the contract function `name` was mined
+        `latency` seconds after it was sent, or could not be sent
+        (`gas_used` None)"""
+
+    def retry(self, method: str) -> None:
+        """The JSON-RPC request `method` was sent again to another node"""
+
+
+class Histogram(object):
+    """Counts of observed values in buckets with the given upper
+    bounds, and their sum"""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Returns (upper bound, number of values at most it) pairs, the
+        last bound being infinity"""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),),
+                                self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum": self.sum,
+                "buckets": self.cumulative()}
+
+
+class RPCMetrics(Instrumentation):
+    """Aggregates the instrumentation events into histograms per
+    contract function: latencies and call data sizes of calls, and
+    latencies and gas used of transactions. Also counts cache hits,
+    failed transactions and retried JSON-RPC requests. The events can
+    come from any thread.
+
+    :meth:`snapshot` returns the current values as a dictionary,
+    :meth:`to_prometheus` in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.call_latency: Dict[str, Histogram] = \
+            defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.call_size: Dict[str, Histogram] = \
+            defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.cache_hits: Dict[str, int] = defaultdict(int)
+        self.transaction_latency: Dict[str, Histogram] = \
+            defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.transaction_gas: Dict[str, Histogram] = \
+            defaultdict(lambda: Histogram(GAS_BUCKETS))
+        self.transaction_failures: Dict[str, int] = defaultdict(int)
+        self.retries: Dict[str, int] = defaultdict(int)
+
+    def call(self, name: str, latency: float, size: int) -> None:
+        with self.lock:
+            self.call_latency[name].observe(latency)
+            self.call_size[name].observe(size)
+
+    def cached(self, name: str) -> None:
+        with self.lock:
+            self.cache_hits[name] += 1
+
+    def transaction(self, name: str, latency: float,
+                    gas_used: Optional[int], success: bool) -> None:
+        with self.lock:
+            if gas_used is not None:
+                self.transaction_latency[name].observe(latency)
+                self.transaction_gas[name].observe(gas_used)
+            if not success:
+                self.transaction_failures[name] += 1
+
+    def retry(self, method: str) -> None:
+        with self.lock:
+            self.retries[method] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the metrics as dictionaries by the names of contract
+        functions (JSON-RPC methods for the retries)"""
+        with self.lock:
+            return {
+                "call_latency": self._dicts(self.call_latency),
+                "call_size": self._dicts(self.call_size),
+                "cache_hits": dict(self.cache_hits),
+                "transaction_latency":
+                    self._dicts(self.transaction_latency),
+                "transaction_gas": self._dicts(self.transaction_gas),
+                "transaction_failures": dict(self.transaction_failures),
+                "retries": dict(self.retries),
+            }
+
+    @staticmethod
+    def _dicts(histograms: Dict[str, Histogram]) -> Dict[str, Any]:
+        return {name: histogram.to_dict()
+                for name, histogram in histograms.items()}
+
+    def to_prometheus(self, prefix: str = "marketplace_") -> str:
+        """Returns the metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        with self.lock:
+            self._histograms(lines, prefix + "call_latency_seconds",
+                             "Latency of contract calls", "function",
+                             self.call_latency)
+            self._histograms(lines, prefix + "call_size_bytes",
+                             "Call data size of contract calls", "function",
+                             self.call_size)
+            self._counters(lines, prefix + "call_cache_hits_total",
+                           "Contract calls answered from the cache",
+                           "function", self.cache_hits)
+            self._histograms(lines, prefix + "transaction_latency_seconds",
+                             "Time from sending to mining transactions",
+                             "function", self.transaction_latency)
+            self._histograms(lines, prefix + "transaction_gas_used",
+                             "Gas used by transactions", "function",
+                             self.transaction_gas)
+            self._counters(lines, prefix + "transaction_failures_total",
+                           "Failed transactions", "function",
+                           self.transaction_failures)
+            self._counters(lines, prefix + "rpc_retries_total",
+                           "JSON-RPC requests sent again to another node",
+                           "method", self.retries)
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histograms(lines: List[str], metric: str, help: str, label: str,
+                    histograms: Dict[str, Histogram]) -> None:
+        lines.append("# HELP {} {}".format(metric, help))
+        lines.append("# TYPE {} histogram".format(metric))
+        for name, histogram in sorted(histograms.items()):
+            for bound, count in histogram.cumulative():
+                lines.append('{}_bucket{{{}="{}",le="{}"}} {}'.format(
+                    metric, label, name,
+                    "+Inf" if bound == float('inf') else bound, count))
+            lines.append('{}_sum{{{}="{}"}} {}'.format(
+                metric, label, name, histogram.sum))
+            lines.append('{}_count{{{}="{}"}} {}'.format(
+                metric, label, name, histogram.count))
+
+    @staticmethod
+    def _counters(lines: List[str], metric: str, help: str, label: str,
+                  counters: Dict[str, int]) -> None:
+        lines.append("# HELP {} {}".format(metric, help))
+        lines.append("# TYPE {} counter".format(metric))
+        for name, value in sorted(counters.items()):
+            lines.append('{}{{{}="{}"}} {}'.format(metric, label, name, value))
@@ -0,0 +1,441 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Web3 providers: HTTP providers with tunable connection pools (see
+:func:`http_provider`), talking to several Ethereum nodes (see
+:class:`MultiEndpointProvider`), and helpers for JSON-RPC batches.
+"""
+
+import concurrent.futures
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import (Any, Callable, Deque, Dict, List, Optional, Union,
+                    cast)
+
+import requests
+from eth_typing import URI
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider, WebsocketProvider
+from web3._utils.request import make_post_request
+from web3.providers.base import BaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .metrics import Instrumentation
+
+
+class SessionHTTPProvider(HTTPProvider):
+    """HTTP provider posting its requests with its own `session`. The
+    `session` argument of the web3 HTTP provider only puts the session
+    in a cache shared by all providers, keyed by the URL and holding 8
+    sessions, so providers of the same node would share the last
+    session given, and sessions of more nodes would be closed."""
+
+    def __init__(self, endpoint_uri: str, session: requests.Session,
+                 request_kwargs: Dict[str, Any] = None) -> None:
+        super().__init__(endpoint_uri, request_kwargs=request_kwargs)
+        self.session = session
+
+    def make_request(self, method: RPCEndpoint,
+                     params: Any) -> RPCResponse:
+        return self.decode_rpc_response(
+            self._post(self.encode_rpc_request(method, params)))
+
+    def make_batch_request(self, payload: List[Dict[str, Any]]) -> Any:
+        """Sends a JSON-RPC batch, see :func:`post_batch`"""
+        return json.loads(self._post(json.dumps(payload).encode('utf-8')))
+
+    def _post(self, data: bytes) -> bytes:
+        kwargs = self.get_request_kwargs()
+        kwargs.setdefault('timeout', 10)
+        response = self.session.post(cast(str, self.endpoint_uri),
+                                     data=data, **kwargs)
+        response.raise_for_status()
+        return response.content
+
+
+def http_provider(url: str,
+                  pool_size: int = 10,
+                  keep_alive: bool = True,
+                  timeout: float = 10,
+                  connect_timeout: float = None,
+                  compression: bool = True) -> SessionHTTPProvider:
+    """Returns an HTTP provider for the node at `url` with its own
+    session (see :class:`SessionHTTPProvider`), which keeps at most
+    `pool_size` connections open for reuse. Threads beyond that open
+    connections of their own, which are closed after each request, so
+    `pool_size` should be at least the number of threads making
+    requests.
+
+    If `keep_alive` is false, the connections are closed after every
+    request. `timeout` is the read timeout of requests and
+    `connect_timeout` (by default the same) the timeout of opening
+    connections, in seconds. If `compression` is true, the node may
+    compress its responses."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    if not compression:
+        session.headers['Accept-Encoding'] = 'identity'
+
+    return SessionHTTPProvider(
+        url, session,
+        request_kwargs={'timeout': (connect_timeout or timeout, timeout)})
+
+
+def provider_for(url: str, **http_options: Any) -> BaseProvider:
+    """Returns a web3 provider for the node at `url`, `http_options` being
+    passed to :func:`http_provider` for HTTP nodes"""
+    protocol = url.split(":")[0].lower()
+
+    if protocol in ("http", "https"):
+        return http_provider(url, **http_options)
+    if protocol in ("ws", "wss"):
+        return WebsocketProvider(url)
+
+    raise ValueError("Unsupported Web3 protocol")
+
+
+def post_batch(provider: Optional[BaseProvider],
+               payload: List[Dict[str, Any]]) -> Optional[Any]:
+    """Sends the JSON-RPC requests of `payload` as a single batch with
+    `provider` and returns the decoded response. Returns None if the
+    provider does not support batches, in which case the requests have
+    to be made one by one. Besides HTTP providers, providers with a
+    `make_batch_request(payload)` method (like
+    :class:`MultiEndpointProvider`) support batches."""
+    make_batch_request = getattr(provider, 'make_batch_request', None)
+    if make_batch_request is not None:
+        return make_batch_request(payload)
+
+    if isinstance(provider, HTTPProvider):
+        return json.loads(make_post_request(
+            cast(URI, provider.endpoint_uri),
+            json.dumps(payload).encode('utf-8'),
+            **provider.get_request_kwargs()))
+
+    return None
+
+
+class Endpoint(object):
+    """A node of :class:`MultiEndpointProvider`, with the latencies of
+    its last `window` successful requests, its health and the latest
+    block it is known to have."""
+
+    def __init__(self, provider: BaseProvider, window: int = 100) -> None:
+        self.provider = provider
+        self.lock = threading.Lock()
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.head = -1
+
+    @property
+    def uri(self) -> Optional[str]:
+        return getattr(self.provider, 'endpoint_uri', None)
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def advanced(self, block_number: int) -> None:
+        with self.lock:
+            self.head = max(self.head, block_number)
+
+    def succeeded(self, latency: float) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+            self.failures = 0
+
+    def failed(self, max_failures: int, eject_time: float) -> None:
+        """Counts a failed request, ejecting the endpoint for
+        `eject_time` seconds after `max_failures` failures in a row"""
+        with self.lock:
+            self.failures += 1
+            if self.failures >= max_failures:
+                self.failures = 0
+                self.ejected_until = time.monotonic() + eject_time
+
+    def mean_latency(self) -> float:
+        """Mean of the recent latencies, 0 if there are none yet so that
+        new endpoints get tried"""
+        with self.lock:
+            latencies = list(self.latencies)
+        return sum(latencies) / len(latencies) if latencies else 0.0
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """The `q` quantile (0..1) of the recent latencies, None if there
+        are less than `min_samples` of them"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class MultiEndpointProvider(BaseProvider):
+    """Web3 provider that spreads the requests over several nodes. The
+    first endpoint is the primary one, which gets all of the requests
+    that depend on the node (sending transactions, account nonces,
+    personal and miner APIs, see `PRIMARY_METHODS`). Other requests are
+    reads, sent to the healthy endpoints in `strategy` order:
+    `'round_robin'` or `'least_latency'` (by the mean of the recent
+    latencies).
+
+    A read that has not been answered in the `hedge_percentile` quantile
+    of the recent latencies of its endpoint (but at least
+    `min_hedge_delay` seconds) is also sent to the next endpoint, and
+    the first answer is used. `hedge_percentile` None disables hedging.
+    Reads that fail are retried with the rest of the endpoints.
+
+    Endpoints failing `max_failures` requests in a row (errors of the
+    connection, not JSON-RPC errors) are ejected for `eject_time`
+    seconds. If all of them are ejected, they are all tried anyway.
+
+    The nodes may not be at the same block. The latest block number is
+    asked from all of the healthy endpoints, and the lowest one is
+    answered, so that every one of them has that block. Reads made in
+    a given block (see `BLOCK_METHODS`) are only sent to the endpoints
+    known to have the block, or if there are none, to the most advanced
+    ones first.
+
+    `endpoints` are URLs or web3 providers, the providers of URLs are
+    created with `http_options` (see :func:`provider_for`). Requests
+    sent again to another node are reported to `instrumentation`.
+    """
+
+    PRIMARY_METHODS = frozenset((
+        'eth_sendTransaction', 'eth_sendRawTransaction', 'eth_sign',
+        'eth_signTransaction', 'eth_signTypedData', 'eth_accounts',
+        'eth_coinbase', 'eth_getTransactionCount'))
+
+    PRIMARY_PREFIXES = ('personal_', 'miner_', 'evm_', 'admin_')
+
+    # reads whose last parameter is the block they are made in
+    BLOCK_METHODS = frozenset((
+        'eth_call', 'eth_getBalance', 'eth_getCode', 'eth_getStorageAt'))
+
+    def __init__(self,
+                 endpoints: List[Union[str, BaseProvider]],
+                 strategy: str = 'round_robin',
+                 hedge_percentile: Optional[float] = 0.95,
+                 min_hedge_delay: float = 0.05,
+                 max_failures: int = 3,
+                 eject_time: float = 30.0,
+                 max_workers: int = 16,
+                 http_options: Dict[str, Any] = None,
+                 instrumentation: Instrumentation = None) -> None:
+        assert endpoints, "at least one endpoint is needed"
+        assert strategy in ('round_robin', 'least_latency'), \
+            "unknown strategy {}".format(strategy)
+        super().__init__()
+
+        self.endpoints = [
+            Endpoint(provider_for(endpoint, **(http_options or {}))
+                     if isinstance(endpoint, str) else endpoint)
+            for endpoint in endpoints]
+        self.strategy = strategy
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_failures = max_failures
+        self.eject_time = eject_time
+        self.counter = itertools.count()
+        self.instrumentation = instrumentation \
+            if instrumentation is not None else Instrumentation()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rpc-hedge")
+
+    @property
+    def endpoint_uri(self) -> Optional[str]:
+        """URI of the primary endpoint"""
+        return self.endpoints[0].uri
+
+    def make_request(self, method: RPCEndpoint,
+                     params: Any) -> RPCResponse:
+        def request(provider: BaseProvider) -> RPCResponse:
+            return provider.make_request(method, params)
+
+        if method in self.PRIMARY_METHODS or \
+                method.startswith(self.PRIMARY_PREFIXES):
+            return self._call(self.endpoints[0], request)
+
+        if method == 'eth_blockNumber':
+            return self._block_number()
+
+        return self._read(method, request, self._block_of(method, params))
+
+    def make_batch_request(self, payload: List[Dict[str, Any]]) \
+            -> Optional[Any]:
+        """Sends a JSON-RPC batch of reads, see :func:`post_batch`. Returns
+        None if some endpoint does not support batches."""
+        if not all(isinstance(endpoint.provider, HTTPProvider) or
+                   hasattr(endpoint.provider, 'make_batch_request')
+                   for endpoint in self.endpoints):
+            return None
+
+        blocks = [self._block_of(item['method'], item.get('params'))
+                  for item in payload]
+        block = max((block for block in blocks if block is not None),
+                    default=None)
+
+        return self._read('batch',
+                          lambda provider: post_batch(provider, payload),
+                          block)
+
+    def isConnected(self) -> bool:
+        return any(endpoint.provider.isConnected()
+                   for endpoint in self.endpoints)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+    @classmethod
+    def _block_of(cls, method: str, params: Any) -> Optional[int]:
+        """Returns the number of the block a read is made in, None if it
+        is not made in a block given by number"""
+        if method not in cls.BLOCK_METHODS or not params:
+            return None
+
+        block = params[-1]
+        if isinstance(block, int):
+            return block
+        if isinstance(block, str) and block.startswith('0x'):
+            return int(block, 16)
+        return None
+
+    def _healthy(self) -> List[Endpoint]:
+        now = time.monotonic()
+        return [endpoint for endpoint in self.endpoints
+                if endpoint.healthy(now)] or list(self.endpoints)
+
+    def _block_number(self) -> RPCResponse:
+        """Asks the healthy endpoints for their latest block, and returns
+        the answer with the lowest block number"""
+        def request(provider: BaseProvider) -> RPCResponse:
+            return provider.make_request(RPCEndpoint('eth_blockNumber'), [])
+
+        endpoints = self._healthy()
+        futures = [self.executor.submit(self._call, endpoint, request)
+                   for endpoint in endpoints]
+
+        answers = []
+        response: Optional[RPCResponse] = None
+        error: Optional[Exception] = None
+        for endpoint, future in zip(endpoints, futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+
+            if 'result' in response:
+                number = int(response['result'], 16)
+                endpoint.advanced(number)
+                answers.append((number, response))
+
+        if answers:
+            return min(answers, key=lambda answer: answer[0])[1]
+        if response is not None:
+            # a JSON-RPC error
+            return response
+        assert error is not None, "every endpoint answered or failed"
+        raise error
+
+    def _candidates(self, block: int = None) -> List[Endpoint]:
+        """Returns the endpoints to read from, in the order to try them,
+        for reads made in `block` if given"""
+        candidates = self._healthy()
+
+        if block is not None:
+            synced = [endpoint for endpoint in candidates
+                      if endpoint.head >= block]
+            if not synced:
+                return sorted(candidates,
+                              key=lambda endpoint: -endpoint.head)
+            candidates = synced
+
+        if self.strategy == 'least_latency':
+            return sorted(candidates, key=Endpoint.mean_latency)
+
+        start = next(self.counter) % len(candidates)
+        return candidates[start:] + candidates[:start]
+
+    def _hedge_delay(self, endpoint: Endpoint) -> Optional[float]:
+        if self.hedge_percentile is None:
+            return None
+
+        delay = endpoint.percentile(self.hedge_percentile)
+        return max(delay, self.min_hedge_delay) if delay is not None \
+            else None
+
+    def _read(self, method: str,
+              request: Callable[[BaseProvider], Any],
+              block: int = None) -> Any:
+        candidates = self._candidates(block)
+        first, rest = candidates[0], candidates[1:]
+        delay = self._hedge_delay(first) if rest else None
+        error: Optional[BaseException] = None
+
+        if delay is None:
+            futures = []
+            try:
+                return self._call(first, request)
+            except Exception as e:
+                error = e
+        else:
+            futures = [self.executor.submit(self._call, first, request)]
+            done, _ = concurrent.futures.wait(futures, timeout=delay)
+            if not done:
+                self.instrumentation.retry(method)
+                futures.append(
+                    self.executor.submit(self._call, rest.pop(0), request))
+
+        while futures:
+            done, pending = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            futures = list(pending)
+
+        # fail over to the rest of the endpoints
+        for endpoint in rest:
+            self.instrumentation.retry(method)
+            try:
+                return self._call(endpoint, request)
+            except Exception as e:
+                error = e
+
+        assert error is not None, "every endpoint failed"
+        raise error
+
+    def _call(self, endpoint: Endpoint,
+              request: Callable[[BaseProvider], Any]) -> Any:
+        start = time.monotonic()
+        try:
+            result = request(endpoint.provider)
+        except Exception:
+            endpoint.failed(self.max_failures, self.eject_time)
+            raise
+
+        endpoint.succeeded(time.monotonic() - start)
+        return result
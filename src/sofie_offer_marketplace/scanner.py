@@ -0,0 +1,279 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Incremental scanning of contract logs. The :class:`LogScanner`
+reads logs with `eth_getLogs` in block ranges and records the last
+processed block and its hash in a :class:`Checkpoint`, so that
+scanning resumes where it left off after a restart. Chain
+reorganizations are detected by comparing the recorded block hashes
+with the chain, and scanning is rolled back to the last block that is
+still part of the chain. The :class:`LogDecoder` turns the raw logs
+into events.
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import requests
+from eth_utils import event_abi_to_log_topic
+from web3.exceptions import BlockNotFound
+
+
+class Checkpoint(object):
+    """Position of a :class:`LogScanner`. The base class keeps it in
+    memory only, subclasses override :meth:`load` and :meth:`save` to
+    persist it.
+
+    The state is a JSON serializable dictionary with the last
+    processed block in `block` and a list of recent (block number,
+    block hash) pairs in `hashes`.
+    """
+
+    def __init__(self) -> None:
+        self.state: Optional[Dict[str, Any]] = None
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        return self.state
+
+    def save(self, state: Dict[str, Any]) -> None:
+        self.state = state
+
+
+class FileCheckpoint(Checkpoint):
+    """Checkpoint stored as JSON in the file `path`"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state: Dict[str, Any]) -> None:
+        # write and rename so that the checkpoint is never left
+        # partially written
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+
+class LogScanner(object):
+    """Scans the logs of the contract at `address` (optionally only those
+    matching `topics`) in block ranges.
+
+    The range size adapts to the node: it is doubled after a range is
+    read successfully (up to `max_chunk` blocks) and halved when the
+    node fails to return the logs of a range, e.g. because there are
+    too many of them. Blocks are processed only when they have
+    `confirmations` blocks on top of them. If there is no checkpoint
+    yet, scanning starts from `start_block`, or from the current block
+    if it is None.
+
+    The hashes of the last `history` blocks that had logs or ended a
+    range are kept for detecting reorganizations. A reorganization
+    deeper than that rescans the `max_reorg_depth` blocks before the
+    oldest recorded one, but not the blocks before `start_block`.
+    """
+
+    def __init__(self,
+                 web3,
+                 address: str,
+                 topics: Optional[List[Union[str, List[str]]]] = None,
+                 checkpoint: Optional[Checkpoint] = None,
+                 start_block: Optional[int] = None,
+                 chunk: int = 100,
+                 min_chunk: int = 1,
+                 max_chunk: int = 10000,
+                 confirmations: int = 0,
+                 history: int = 64,
+                 max_reorg_depth: int = 1000) -> None:
+        self.web3 = web3
+        self.address = address
+        self.topics = topics
+        self.checkpoint = checkpoint if checkpoint is not None \
+            else Checkpoint()
+        self.start_block = start_block
+        self.chunk = chunk
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.confirmations = confirmations
+        self.history = history
+        self.max_reorg_depth = max_reorg_depth
+
+        self.state = self.checkpoint.load()
+
+    @property
+    def block(self) -> Optional[int]:
+        """Last processed block, or None if nothing has been scanned yet"""
+        return self.state['block'] if self.state is not None else None
+
+    def scan(self,
+             handler: Callable[[List[Any]], None],
+             on_rollback: Optional[Callable[[int], None]] = None) -> int:
+        """Scans the blocks after the last processed one up to the current
+        block, calling `handler` with the logs of each range in order.
+        The checkpoint is saved after each range, so a range whose
+        handler fails is scanned again on the next call.
+
+        If a reorganization is detected, `on_rollback` is called with
+        the last block that is still part of the chain before scanning
+        continues from it. Returns the number of processed logs.
+        """
+        head = self.web3.eth.blockNumber - self.confirmations
+
+        if self.state is None:
+            start = self.start_block if self.start_block is not None \
+                else head + 1
+            self.state = {'block': start - 1, 'hashes': []}
+        else:
+            self._check_reorg(on_rollback)
+
+        count = 0
+        while self.state['block'] < head:
+            from_block = self.state['block'] + 1
+            to_block = min(head, from_block + self.chunk - 1)
+
+            # read before the logs, if the block is replaced in between
+            # the next scan sees a different hash and scans it again
+            to_hash = self._block_hash(to_block)
+            try:
+                logs = self._get_logs(from_block, to_block)
+            except (ValueError, requests.exceptions.Timeout):
+                if self.chunk <= self.min_chunk:
+                    raise
+                self.chunk = max(self.min_chunk, self.chunk // 2)
+                continue
+
+            handler(logs)
+            count += len(logs)
+
+            self._advance(to_block, to_hash, logs)
+            self.chunk = min(self.max_chunk, self.chunk * 2)
+
+        return count
+
+    def run(self,
+            handler: Callable[[List[Any]], None],
+            on_rollback: Optional[Callable[[int], None]] = None,
+            poll_interval: float = 2.0) -> None:
+        """Scans for new logs every `poll_interval` seconds, forever"""
+        while True:
+            try:
+                self.scan(handler, on_rollback)
+            except Exception as e:
+                print("log scanner:", e)
+            time.sleep(poll_interval)
+
+    def _get_logs(self, from_block: int, to_block: int) -> List[Any]:
+        params: Dict[str, Any] = {
+            "address": self.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+        }
+        if self.topics is not None:
+            params["topics"] = self.topics
+
+        return self.web3.eth.getLogs(params)
+
+    def _block_hash(self, number: int) -> Optional[str]:
+        try:
+            return self.web3.eth.getBlock(number)['hash'].hex()
+        except BlockNotFound:
+            return None
+
+    def _advance(self, block: int, block_hash: Optional[str],
+                 logs: List[Any]) -> None:
+        assert self.state is not None
+        # the hashes of the blocks with logs are taken from the logs, so
+        # they are the hashes of the blocks the logs were read from
+        log_hashes = {log['blockNumber']: log['blockHash'].hex()
+                      for log in logs}
+        if block not in log_hashes:
+            log_hashes[block] = block_hash
+
+        hashes = self.state['hashes'] + [
+            [number, log_hashes[number]] for number in sorted(log_hashes)]
+        self.state = {'block': block, 'hashes': hashes[-self.history:]}
+        self.checkpoint.save(self.state)
+
+    def _check_reorg(self, on_rollback) -> None:
+        assert self.state is not None
+        hashes = list(self.state['hashes'])
+        if not hashes or self._block_hash(hashes[-1][0]) == hashes[-1][1]:
+            return
+
+        # drop the ranges that are no longer part of the chain
+        hashes.pop()
+        while hashes and self._block_hash(hashes[-1][0]) != hashes[-1][1]:
+            hashes.pop()
+
+        if hashes:
+            block = hashes[-1][0]
+        else:
+            # even the oldest recorded block was replaced
+            oldest = self.state['hashes'][0][0]
+            block = max(oldest - self.max_reorg_depth,
+                        (self.start_block or 0) - 1)
+
+        self.state = {'block': block, 'hashes': hashes}
+        self.checkpoint.save(self.state)
+
+        if on_rollback is not None:
+            on_rollback(block)
+
+
+class LogDecoder(object):
+    """Decodes the raw logs of `web3contract` (a web3 contract object)
+    into (event name, arguments, transaction hash) tuples. Only the
+    events named in `events` are decoded, or all events of the
+    contract if it is None, other logs are skipped."""
+
+    def __init__(self, web3contract,
+                 events: Optional[Iterable[str]] = None) -> None:
+        events = set(events) if events is not None else None
+        self.topics: Dict[bytes, Any] = {}
+
+        for entry in web3contract.abi:
+            if entry['type'] != 'event':
+                continue
+            if events is not None and entry['name'] not in events:
+                continue
+            self.topics[event_abi_to_log_topic(entry)] = \
+                getattr(web3contract.events, entry['name'])()
+
+    def decode(self, logs: Iterable[Dict[str, Any]]) \
+            -> List[Tuple[str, Dict[str, Any], Any]]:
+        events = []
+        for log in logs:
+            if not log['topics']:
+                continue
+
+            event = self.topics.get(bytes(log['topics'][0]))
+            if event is None:
+                continue
+
+            decoded = event.processLog(log)
+            events.append((decoded.event, dict(decoded.args),
+                           decoded.transactionHash))
+
+        return events
@@ -0,0 +1,155 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Column-oriented snapshot of the requests and offers of a
+marketplace, see :class:`MarketSnapshot`.
+"""
+
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+# (name, array typecode) of the columns of every request and offer
+REQUEST_COLUMNS = (('request_id', 'Q'), ('deadline', 'Q'),
+                   ('is_decided', 'b'), ('is_pending', 'b'),
+                   ('is_open', 'b'), ('is_closed', 'b'),
+                   ('offer_count', 'L'), ('decided_count', 'L'))
+
+OFFER_COLUMNS = (('offer_id', 'Q'), ('request_id', 'Q'),
+                 ('author', 'L'), ('stage', 'b'))
+
+Column = Union[array, List[Any]]
+
+
+class MarketSnapshot(object):
+    """Requests and offers stored as columns instead of objects, for
+    analytics over lots of them. :attr:`requests` and :attr:`offers`
+    map column names to `array.array` columns, row `i` of a table
+    being the `i`:th value of each of its columns. Besides the common
+    columns (see `REQUEST_COLUMNS` and `OFFER_COLUMNS`) there are the
+    columns of the extra data listed in the `extra_columns` attribute
+    of the request and offer classes, extra data that is missing is 0.
+
+    The contract values are uint256, so a column with a value that
+    does not fit its typecode (e.g. 2**64 or more for `'Q'`) is a
+    plain list instead.
+
+    The author column of offers holds indexes into :attr:`authors`, so
+    that every address is stored only once.
+
+    The columns support the buffer protocol, so they can be used with
+    NumPy without copying, see :meth:`to_numpy`.
+    """
+
+    def __init__(self,
+                 requests: Dict[str, Column],
+                 offers: Dict[str, Column],
+                 authors: List[str]) -> None:
+        self.requests = requests
+        self.offers = offers
+        self.authors = authors
+
+    @classmethod
+    def from_data(cls,
+                  request_ids: Sequence[int],
+                  request_datas: Sequence[Optional[Dict[str, Any]]],
+                  offer_ids: Sequence[int],
+                  offer_datas: Sequence[Optional[Dict[str, Any]]],
+                  request_extra_columns: Sequence[Tuple[str, str]] = (),
+                  offer_extra_columns: Sequence[Tuple[str, str]] = ()
+                  ) -> 'MarketSnapshot':
+        """Builds a snapshot from the data returned by
+        :meth:`Contract.get_requests_bulk` and
+        :meth:`Contract.get_offers_bulk`. Undefined requests and offers
+        are left out."""
+        requests: Dict[str, Column] = {
+            name: array(code)
+            for name, code in REQUEST_COLUMNS + tuple(request_extra_columns)}
+        append = cls._append
+
+        for request_id, data in zip(request_ids, request_datas):
+            if data is None:
+                continue
+
+            append(requests, 'request_id', request_id)
+            append(requests, 'deadline', data['deadline'])
+            for flag in ('is_decided', 'is_pending', 'is_open', 'is_closed'):
+                append(requests, flag, bool(data[flag]))
+            append(requests, 'offer_count', len(data.get('offer_ids', [])))
+            append(requests, 'decided_count',
+                   len(data.get('decided_offer_ids', [])))
+            cls._append_extra(requests, request_extra_columns,
+                              data.get('extra'))
+
+        offers: Dict[str, Column] = {
+            name: array(code)
+            for name, code in OFFER_COLUMNS + tuple(offer_extra_columns)}
+        authors: List[str] = []
+        author_index: Dict[str, int] = {}
+
+        for offer_id, data in zip(offer_ids, offer_datas):
+            if data is None:
+                continue
+
+            author = data['author']
+            if author not in author_index:
+                author_index[author] = len(authors)
+                authors.append(sys.intern(author))
+
+            append(offers, 'offer_id', offer_id)
+            append(offers, 'request_id', data['request_id'])
+            append(offers, 'author', author_index[author])
+            append(offers, 'stage', data.get('stage') or 0)
+            cls._append_extra(offers, offer_extra_columns, data.get('extra'))
+
+        return cls(requests, offers, authors)
+
+    @staticmethod
+    def _append(columns: Dict[str, Column], name: str, value: Any) -> None:
+        column = columns[name]
+        try:
+            column.append(value)
+        except OverflowError:
+            columns[name] = list(column) + [value]
+
+    @classmethod
+    def _append_extra(cls, columns: Dict[str, Column],
+                      extra_columns: Sequence[Tuple[str, str]],
+                      extra: Any) -> None:
+        if not isinstance(extra, (list, tuple)):
+            extra = ()
+
+        for i, (name, _) in enumerate(extra_columns):
+            value = extra[i] if i < len(extra) else None
+            cls._append(columns, name, value or 0)
+
+    def offer_authors(self) -> List[str]:
+        """Returns the author addresses of the offers, row by row"""
+        return [self.authors[i] for i in self.offers['author']]
+
+    def to_numpy(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Returns the request and offer columns as NumPy arrays sharing the
+        memory of the columns. Columns that are lists become arrays of
+        Python integers. This needs the `numpy` package."""
+        import numpy
+
+        def convert(columns):
+            return {name: numpy.frombuffer(column, dtype=column.typecode)
+                    if isinstance(column, array)
+                    else numpy.array(column, dtype=object)
+                    for name, column in columns.items()}
+
+        return convert(self.requests), convert(self.offers)
@@ -0,0 +1,557 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed
+# with this work for additional information regarding copyright
+# ownership.  The ASF licenses this file to you under the Apache
+# License, Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain a copy of the
+# License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.  See the License for the specific language governing
+# permissions and limitations under the License.
+
+"""Transaction helpers for :class:`Web3Contract`: local nonce
+management (:class:`NonceManager`), gas limits of transactions
+(:class:`GasEstimator`), handles of sent transactions
+(:class:`PendingTransaction`) and waiting for their receipts
+(:class:`ReceiptPoller`).
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import (IO, Any, Callable, Dict, Hashable, Iterator, List,
+                    Optional, Tuple)
+
+from hexbytes import HexBytes
+from web3._utils.method_formatters import receipt_formatter
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+from .providers import post_batch
+
+fcntl: Optional[ModuleType]
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class NonceManager(object):
+    """Assigns the nonces of the transactions sent from `address`
+    locally, so that transactions can be sent back-to-back without
+    waiting for the node to see the previous ones. The first nonce is
+    the pending transaction count of the node, which is read again only
+    after nonces have been released (see :meth:`release`).
+
+    The manager is thread-safe. If `lock_path` is given, the next nonce
+    is kept in that file and the file is locked while taking nonces,
+    so that processes sharing the file (on the same host) can share
+    the account too.
+    """
+
+    def __init__(self, web3, address: str, lock_path: str = None) -> None:
+        if lock_path is not None and fcntl is None:
+            raise ValueError("lock files are not supported on this platform")
+
+        self.web3 = web3
+        self.address = address
+        self.lock_path = lock_path
+        self.lock = threading.Lock()
+        self.next_nonce: Optional[int] = None
+        self.synced = False
+
+    def take(self, count: int = 1) -> int:
+        """Reserves `count` consecutive nonces and returns the first one"""
+        with self._locked() as f:
+            nonce = self._next(f)
+            if nonce is None or not self.synced:
+                chain = self.web3.eth.getTransactionCount(self.address,
+                                                          'pending')
+                nonce = chain if nonce is None else max(nonce, chain)
+                self.synced = True
+
+            self.next_nonce = nonce + count
+            self._write(f, self.next_nonce)
+            return nonce
+
+    def release(self, nonce: int, count: int = 1) -> None:
+        """Gives back the `count` nonces from `nonce`, after their
+        transactions could not be sent. They are taken again only if
+        they are still the last ones handed out, later nonces of other
+        transactions are kept. The next :meth:`take` checks the pending
+        transaction count of the node again, in case a transaction
+        reached the node after all."""
+        with self._locked() as f:
+            if self._next(f) == nonce + count:
+                self.next_nonce = nonce
+                self._write(f, nonce)
+            self.synced = False
+
+    def _next(self, f: Optional[IO[str]]) -> Optional[int]:
+        """The next nonce, kept in the lock file if there is one"""
+        return self._read(f) if f is not None else self.next_nonce
+
+    @contextmanager
+    def _locked(self) -> Iterator[Optional[IO[str]]]:
+        """Holds the thread lock and the file lock, yielding the lock file
+        if there is one"""
+        with self.lock:
+            if self.lock_path is None:
+                yield None
+                return
+
+            assert fcntl is not None, "checked in __init__"
+            with open(self.lock_path, 'a+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield f
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(f: Optional[IO[str]]) -> Optional[int]:
+        if f is None:
+            return None
+
+        f.seek(0)
+        content = f.read().strip()
+        return int(content) if content else None
+
+    @staticmethod
+    def _write(f: Optional[IO[str]], nonce: Optional[int]) -> None:
+        if f is None:
+            return
+
+        f.seek(0)
+        f.truncate()
+        if nonce is not None:
+            f.write(str(nonce))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class GasEstimator(object):
+    """Chooses the gas limits of transactions. The gas of a contract
+    function call is estimated by the node the first time, and the
+    estimate is cached by the name of the function and the shape of
+    its arguments (the lengths of arrays and strings, and which numbers
+    are zero), so that e.g. all requests with the same number of extra
+    elements share one estimate. Storing zero costs much less gas than
+    storing other numbers, so they are estimated separately. The limit
+    is the estimate times `multiplier`, at most `max_gas`.
+
+    The gas actually used by mined transactions is fed back with
+    :meth:`observe`, which raises the cached estimate if a
+    transaction used more than estimated, and drops it if a
+    transaction ran out of gas.
+
+    The gas of the functions in `uncached` depends on the state of the
+    contract (e.g. deciding a request goes through all of its offers),
+    so they are estimated for every transaction. If the node cannot
+    estimate the gas, e.g. because the transaction would fail,
+    `fallback_gas` is used.
+
+    The contract functions return a non-zero status instead of
+    reverting when they fail (e.g. an offer to a closed request), and
+    end early, so the estimates of such calls are too low for the
+    calls that succeed. Before an estimate is cached the call is made
+    once, and the estimate is only cached if it returns a successful
+    status, see :meth:`succeeded`.
+    """
+
+    def __init__(self,
+                 multiplier: float = 1.2,
+                 max_gas: int = None,
+                 fallback_gas: int = 1000000,
+                 uncached=('decideRequest', 'closeRequest',
+                           'deleteRequest')) -> None:
+        self.multiplier = multiplier
+        self.max_gas = max_gas
+        self.fallback_gas = fallback_gas
+        self.uncached = set(uncached)
+        self.lock = threading.Lock()
+        self.estimates: Dict[Tuple[str, Hashable], int] = {}
+
+    @classmethod
+    def key(cls, call) -> Tuple[str, Hashable]:
+        """Returns the cache key of the contract function call `call`"""
+        return call.fn_name, tuple(cls._shape(arg) for arg in call.args)
+
+    @classmethod
+    def _shape(cls, arg: Any) -> Hashable:
+        if isinstance(arg, (list, tuple)):
+            return tuple(cls._shape(item) for item in arg)
+        if isinstance(arg, (str, bytes)):
+            return len(arg)
+        if isinstance(arg, int):
+            return arg == 0
+        return None
+
+    def lookup(self, call) -> Optional[int]:
+        """Returns the cached gas limit of `call`, or None if it has to be
+        estimated"""
+        if call.fn_name in self.uncached:
+            return None
+
+        with self.lock:
+            estimate = self.estimates.get(self.key(call))
+        return self._limit(estimate) if estimate is not None else None
+
+    def cached(self, call) -> bool:
+        """Returns True if the estimates of `call` are cached"""
+        return call.fn_name not in self.uncached
+
+    @staticmethod
+    def succeeded(call, output: Any) -> bool:
+        """Returns False if `output`, the return value of `call`, has a
+        status that is not successful"""
+        outputs = call.abi.get('outputs', [])
+        if not outputs or outputs[0].get('name') != 'status':
+            return True
+
+        status = output[0] if len(outputs) > 1 else output
+        return status == 0
+
+    def add(self, call, estimate: Optional[int], cache: bool = True) -> int:
+        """Stores the estimate of the node for `call` (None if it could not
+        be estimated) unless `cache` is False, and returns the gas limit
+        to use"""
+        if estimate is None:
+            return self.fallback_gas
+
+        if cache and self.cached(call):
+            with self.lock:
+                self.estimates[self.key(call)] = estimate
+        return self._limit(estimate)
+
+    def gas(self, call, sender: str) -> int:
+        """Returns the gas limit of `call` sent from `sender`, estimating
+        it with the node if it is not cached"""
+        limit = self.lookup(call)
+        if limit is not None:
+            return limit
+
+        cache = False
+        try:
+            estimate = call.estimateGas({'from': sender})
+            if self.cached(call):
+                cache = self.succeeded(call, call.call({'from': sender}))
+        except Exception as e:
+            logger.warning("Estimating gas failed: %s", e)
+            estimate = None
+        return self.add(call, estimate, cache)
+
+    def observe(self, call, gas: int, gas_used: int,
+                success: bool = True) -> None:
+        """Feeds back the gas used by a transaction of `call` which was sent
+        with the gas limit `gas`. Only successful transactions raise
+        the cached estimates, failed ones end early. Estimates that are
+        not cached are not added, as the status returned by the call is
+        not known here."""
+        if not self.cached(call):
+            return
+
+        key = self.key(call)
+        with self.lock:
+            if gas_used >= gas:
+                # ran out of gas, estimate again next time
+                self.estimates.pop(key, None)
+            elif success and gas_used > self.estimates.get(key, gas_used):
+                self.estimates[key] = gas_used
+
+    def _limit(self, estimate: int) -> int:
+        limit = math.ceil(estimate * self.multiplier)
+        return min(limit, self.max_gas) if self.max_gas else limit
+
+
+class ReceiptPoller(object):
+    """Waits for the receipts of any number of transactions with a
+    single polling loop, run in a background thread while there are
+    transactions to wait for. The loop asks the node for the latest
+    block number every `poll_interval` seconds, and when there is a
+    new block, fetches the receipts of all of the waited transactions
+    with one JSON-RPC batch (one by one with providers that do not
+    support batches, see :func:`post_batch`). The load on the node thus
+    depends on the number of blocks, not on the number of transactions
+    waited for.
+    """
+
+    def __init__(self, web3, poll_interval: float = 0.1) -> None:
+        self.web3 = web3
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        # transaction hash -> [hash as given, future, waiters,
+        # block number the receipt was last looked for at, deadlines of
+        # the waiters with a timeout]
+        self.waiting: Dict[str, List[Any]] = {}
+        self.thread: Optional[threading.Thread] = None
+
+    def watch(self, tx_hash,
+              timeout: float = None) -> concurrent.futures.Future:
+        """Returns a future of the receipt of the transaction `tx_hash`.
+        The transaction is polled until it is mined or until every
+        caller of :meth:`watch` has called :meth:`unwatch`, callers
+        giving a `timeout` stop waiting by themselves after that many
+        seconds."""
+        key = HexBytes(tx_hash).hex()
+
+        with self.lock:
+            entry = self.waiting.get(key)
+            if entry is None:
+                entry = self.waiting[key] = [
+                    tx_hash, concurrent.futures.Future(), 0, None, []]
+            entry[2] += 1
+            if timeout is not None:
+                entry[4].append(time.monotonic() + timeout)
+
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="receipt-poller", daemon=True)
+                self.thread.start()
+
+            return entry[1]
+
+    def unwatch(self, tx_hash) -> None:
+        """Stops waiting for the transaction `tx_hash` on behalf of one
+        caller of :meth:`watch`"""
+        key = HexBytes(tx_hash).hex()
+
+        with self.lock:
+            entry = self.waiting.get(key)
+            if entry is not None:
+                entry[2] -= 1
+                if entry[2] <= 0:
+                    del self.waiting[key]
+            self._expire()
+
+    def _expire(self) -> None:
+        """Stops waiting on behalf of the callers whose timeout has
+        passed, called with the lock held"""
+        now = time.monotonic()
+        for key, entry in list(self.waiting.items()):
+            deadlines = [deadline for deadline in entry[4] if deadline > now]
+            if len(deadlines) < len(entry[4]):
+                entry[2] -= len(entry[4]) - len(deadlines)
+                entry[4] = deadlines
+                if entry[2] <= 0:
+                    del self.waiting[key]
+
+    def wait(self, tx_hash, timeout: float = 120) -> Any:
+        """Waits for the receipt of the transaction `tx_hash` and returns
+        it. Raises `TimeExhausted` if it is not mined within `timeout`
+        seconds."""
+        future = self.watch(tx_hash)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise TimeExhausted(
+                "Transaction {} is not in the chain after {} seconds"
+                .format(HexBytes(tx_hash).hex(), timeout))
+        finally:
+            self.unwatch(tx_hash)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._poll()
+            except Exception as e:
+                # the node may be temporarily unavailable, try again
+                logger.warning("Polling receipts failed: %s", e)
+
+            with self.lock:
+                if not self.waiting:
+                    self.thread = None
+                    return
+
+            time.sleep(self.poll_interval)
+
+    def _poll(self) -> None:
+        """Fetches the receipts of the transactions that have not been
+        looked for in the latest block"""
+        block_number = self.web3.eth.blockNumber
+
+        with self.lock:
+            self._expire()
+            due = [(key, entry[0]) for key, entry in self.waiting.items()
+                   if entry[3] != block_number]
+        if not due:
+            return
+
+        receipts = self._receipts([tx_hash for _, tx_hash in due])
+
+        mined = []
+        with self.lock:
+            for (key, _), receipt in zip(due, receipts):
+                entry = self.waiting.get(key)
+                if entry is None:
+                    continue
+
+                entry[3] = block_number
+                if receipt is not None:
+                    del self.waiting[key]
+                    mined.append((entry[1], receipt))
+
+        # outside of the lock, the callbacks of the futures may watch
+        # other transactions
+        for future, receipt in mined:
+            if not future.done():
+                future.set_result(receipt)
+
+    def _receipts(self, tx_hashes: List[Any]) -> List[Optional[Any]]:
+        """Returns the receipts of the given transactions, None for the
+        ones that have not been mined"""
+        provider = getattr(self.web3, 'provider', None)
+
+        if len(tx_hashes) < 2:
+            return [self._receipt(tx_hash) for tx_hash in tx_hashes]
+
+        payload = [{"jsonrpc": "2.0",
+                    "method": "eth_getTransactionReceipt",
+                    "params": [HexBytes(tx_hash).hex()],
+                    "id": request_id}
+                   for request_id, tx_hash in enumerate(tx_hashes)]
+
+        response = post_batch(provider, payload)
+
+        # batches are not supported by the provider, or the node
+        # answered with a single error object
+        if not isinstance(response, list):
+            return [self._receipt(tx_hash) for tx_hash in tx_hashes]
+
+        responses = {item['id']: item for item in response}
+        receipts: List[Optional[Any]] = []
+        for request_id in range(len(tx_hashes)):
+            item = responses[request_id]
+            if 'error' in item:
+                raise ValueError(item['error'])
+            receipt = item['result']
+            receipts.append(AttributeDict.recursive(
+                receipt_formatter(receipt)) if receipt is not None else None)
+        return receipts
+
+    def _receipt(self, tx_hash) -> Optional[Any]:
+        try:
+            return self.web3.eth.getTransactionReceipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+
+class PendingTransaction(object):
+    """Handle of a sent transaction. :meth:`result` waits for the
+    receipt of the transaction and returns what `then` returns for the
+    receipt (the receipt itself if `then` is not given). The receipt is
+    waited for with `poller` (a :class:`ReceiptPoller`) if given,
+    otherwise by polling the node for this transaction alone. The
+    handle can also be awaited, in which case the waiting is done in
+    the default executor of the event loop, or in the poller.
+
+    `mined` is called once with the receipt when the transaction is
+    mined. With a poller, this happens even if the result is never
+    asked for (within `timeout` seconds), e.g. for recording metrics.
+    """
+
+    def __init__(self, web3, tx_hash,
+                 then: Callable[[Any], Any] = None,
+                 timeout: float = 120,
+                 poller: ReceiptPoller = None,
+                 mined: Callable[[Any], None] = None) -> None:
+        self.web3 = web3
+        self.tx_hash = tx_hash
+        self.then = then
+        self.timeout = timeout
+        self.poller = poller
+        self.mined = mined
+        self.lock = threading.Lock()
+        self.mined_lock = threading.Lock()
+        self._done = False
+        self._mined = False
+        self._result: Any = None
+
+        if poller is not None and mined is not None:
+            poller.watch(tx_hash, timeout).add_done_callback(
+                lambda future: self._observe(future.result()))
+
+    def done(self) -> bool:
+        """Returns true if the transaction has been mined, without
+        blocking"""
+        if self._done:
+            return True
+
+        try:
+            receipt = self.web3.eth.getTransactionReceipt(self.tx_hash)
+        except TransactionNotFound:
+            return False
+        return receipt is not None
+
+    def result(self, timeout: float = None) -> Any:
+        """Waits for the transaction to be mined. Raises `TimeExhausted`
+        if it is not mined within `timeout` seconds (by default the
+        timeout given to the initializer)."""
+        if timeout is None:
+            timeout = self.timeout
+
+        with self.lock:
+            if not self._done:
+                if self.poller is not None:
+                    receipt = self.poller.wait(self.tx_hash, timeout)
+                else:
+                    receipt = self.web3.eth.waitForTransactionReceipt(
+                        self.tx_hash, timeout=timeout)
+                self._finish(receipt)
+
+            return self._result
+
+    def _finish(self, receipt) -> None:
+        self._observe(receipt)
+        self._result = self.then(receipt) if self.then else receipt
+        self._done = True
+
+    def _observe(self, receipt) -> None:
+        with self.mined_lock:
+            if not self._mined:
+                self._mined = True
+                if self.mined is not None:
+                    self.mined(receipt)
+
+    async def _wait_poller(self) -> Any:
+        poller = self.poller
+        assert poller is not None, "checked in __await__"
+        future = poller.watch(self.tx_hash)
+        try:
+            # the future is shared, only stop waiting for it
+            receipt = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeExhausted(
+                "Transaction {} is not in the chain after {} seconds"
+                .format(HexBytes(self.tx_hash).hex(), self.timeout))
+        finally:
+            poller.unwatch(self.tx_hash)
+
+        with self.lock:
+            if not self._done:
+                self._finish(receipt)
+            return self._result
+
+    def __await__(self):
+        if self.poller is not None:
+            return self._wait_poller().__await__()
+
+        return asyncio.get_event_loop().run_in_executor(
+            None, self.result).__await__()
+
+    def __repr__(self) -> str:
+        return "PendingTransaction({!r})".format(self.tx_hash)
@@ -25,6 +25,8 @@ register_marshaller("eu.sofie-iot.offer-marketplace-demo.flower",
 
 
 class FallbackRequest(om.Request):
+    extra_fields = ('unknown_extra',)
+
     def __init__(self,
                  request_id: int = None,
                  deadline: int = None,
@@ -32,8 +34,8 @@ class FallbackRequest(om.Request):
                  is_decided: bool = None,
                  is_open: bool = None,
                  is_closed: bool = None,
-                 offers: List['om.Offer'] = [],
-                 decided_offers: List['om.Offer'] = [],
+                 offers: List['om.Offer'] = None,
+                 decided_offers: List['om.Offer'] = None,
                  **kwargs) -> None:
         super().__init__(request_id, deadline, is_pending, is_decided, is_open, is_closed, offers, decided_offers)
 
@@ -58,8 +60,9 @@ class FallbackRequest(om.Request):
     def from_data(cls,
                   request_id: int,
                   common: Dict[str, Any],
-                  extra: List[Any] = [],
-                  init_args: Dict[str, Any] = {}):
+                  extra: List[Any] = None,
+                  init_args: Dict[str, Any] = None):
+        init_args = dict(init_args or {})
         init_args['unknown_extra'] = extra
 
         return super(FallbackRequest, cls).from_data(
@@ -73,6 +76,8 @@ class FallbackRequest(om.Request):
 
 
 class FallbackOffer(om.Offer):
+    extra_fields = ('unknown_extra',)
+
     def __init__(self,
                  offer_id=None,
                  request_id=None,
@@ -89,8 +94,9 @@ class FallbackOffer(om.Offer):
     def from_data(cls,
                   offer_id: int,
                   common: Dict[str, Any],
-                  extra: List[Any] = [],
-                  init_args: Dict[str, Any] = {}):
+                  extra: List[Any] = None,
+                  init_args: Dict[str, Any] = None):
+        init_args = dict(init_args or {})
         init_args['unknown_extra'] = extra
 
         return super(FallbackOffer, cls).from_data(
@@ -209,7 +215,9 @@ async def async_main():
         is_owner=args.owner,
         marketplace_type=args.override_type,
         fallback_request_class=FallbackRequest,
-        fallback_offer_class=FallbackOffer
+        fallback_offer_class=FallbackOffer,
+        # offers are read only by the commands that show them
+        lazy_offers=True
     )
 
     if m.request_class is FallbackRequest:
@@ -219,7 +227,7 @@ async def async_main():
         print(f"Warning: Marketplace type {m.get_type()} does not map into a known offer class, using fallback")
 
     if args.command in ['list-requests', 'list']:
-        for r in m.get_requests():
+        for r in m.iter_requests():
             print("#{:<4} {}".format(r.request_id, str(r)))
 
     elif args.command == 'add-request':
@@ -7,31 +7,52 @@ from datetime import datetime
 import time
 
 
+def _columns(extras, count):
+    """Transposes the extra data of many requests or offers into `count`
+    columns of values"""
+    if not extras:
+        return [()] * count
+    return list(zip(*(extra[:count] for extra in extras)))
+
+
 class FlowerRequest(om.Request):
     types = ['rose', 'tulip', 'jasmine', 'white']
 
+    extra_fields = ('quantity', 'type')
+    extra_columns = (('quantity', 'Q'), ('type', 'B'))
+
     def __init__(self, quantity=None, type=None, **kwargs):
         super().__init__(**kwargs)
         self.quantity = quantity
         self.type = type
 
         # this could be made into a general mixin
-        if 'decided_offers' in kwargs and kwargs['decided_offers']:
-            assert (len(kwargs['decided_offers']) == 1), \
-                "flower market can only have one decided offer"
+        assert len(self.decided_offers) <= 1, \
+            "flower market can only have one decided offer"
 
-            self.decided_offer = kwargs['decided_offers'][0]
-        else:
-            self.decided_offer = None
+    @property
+    def decided_offer(self):
+        # read on access, the decided offers may be lazy
+        return self.decided_offers[0] if self.decided_offers else None
 
     @classmethod
-    def from_data(cls, request_id, common, extra=None, init_args={}):
+    def from_data(cls, request_id, common, extra=None, init_args=None):
+        init_args = dict(init_args or {})
         init_args['quantity'] = extra[0]
         init_args['type'] = extra[1]
 
         return super(FlowerRequest, cls).from_data(
             request_id, common, init_args=init_args)
 
+    @classmethod
+    def from_data_batch(cls, request_ids, commons, extras):
+        quantities, types = _columns(extras, 2)
+
+        return [cls(request_id=request_id, quantity=quantity, type=type,
+                    **cls._common_args(common))
+                for request_id, common, quantity, type
+                in zip(request_ids, commons, quantities, types)]
+
     @classmethod
     def from_args(cls, deadline, args):
         return cls(
@@ -45,6 +66,10 @@ class FlowerRequest(om.Request):
     def marshal_extra(self):
         return [[self.quantity, self.type]]
 
+    @classmethod
+    def marshal_extra_batch(cls, requests):
+        return [[[request.quantity, request.type]] for request in requests]
+
     @property
     def stage_str(self):
         if self.is_pending:
@@ -66,16 +91,28 @@ class FlowerRequest(om.Request):
 
 
 class FlowerOffer(om.Offer):
+    extra_fields = ('price',)
+    extra_columns = (('price', 'Q'),)
+
     def __init__(self, price=None, **kwargs):
         super().__init__(**kwargs)
         self.price = price
 
     @classmethod
-    def from_data(cls, offer_id, common, extra=None, init_args={}):
+    def from_data(cls, offer_id, common, extra=None, init_args=None):
+        init_args = dict(init_args or {})
         init_args['price'] = extra[0]
         return super(FlowerOffer, cls).from_data(
             offer_id, common, init_args=init_args)
 
+    @classmethod
+    def from_data_batch(cls, offer_ids, commons, extras):
+        prices, = _columns(extras, 1)
+
+        return [cls(offer_id=offer_id, price=price,
+                    **cls._common_args(common))
+                for offer_id, common, price in zip(offer_ids, commons, prices)]
+
     @classmethod
     def from_args(cls, request_id, args):
         return cls(
@@ -88,6 +125,10 @@ class FlowerOffer(om.Offer):
     def marshal_extra(self):
         return [[self.price]]
 
+    @classmethod
+    def marshal_extra_batch(cls, offers):
+        return [[[offer.price]] for offer in offers]
+
     def __str__(self):
         return "price {} (@{})".format(self.price, self.author or "unset")
 
@@ -6,7 +6,7 @@ from argparse import Namespace  # evil
 import sofie_offer_marketplace as om
 from sofie_offer_marketplace.ethereum import Web3Contract
 import sofie_offer_marketplace.backend as be
-from sofie_offer_marketplace.backend.utils import parse_ethereum, get_web3contract
+from sofie_offer_marketplace.backend.utils import parse_ethereum, parse_options, get_web3contract
 from .utils import MockContract, MockRequest, MockOffer
 
 config_file = os.getenv("MARKETPLACE_CONFIG", "local-config.cfg")
@@ -24,7 +24,8 @@ def web3contract():
     parser.read(config_file) 
 
     url, contract_address, minter, artifact = parse_ethereum(parser)
-    return get_web3contract(url, contract_address, minter, artifact)
+    return get_web3contract(url, contract_address, minter, artifact,
+                            **parse_options(parser))
 
 
 @pytest.fixture
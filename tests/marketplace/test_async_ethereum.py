@@ -0,0 +1,374 @@
+import asyncio
+import threading
+
+import pytest
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+from web3.providers.base import BaseProvider
+
+from sofie_offer_marketplace.async_ethereum import (
+    AsyncReceiptPoller, AsyncRPC, AsyncWeb3Contract)
+from sofie_offer_marketplace.ethereum import Web3Contract
+from sofie_offer_marketplace.metrics import Instrumentation, RPCMetrics
+
+ADDRESS = "0x" + "12" * 20
+MINTER = "0x" + "34" * 20
+
+ABI = [
+    {"type": "function", "name": "getOpenRequestIdentifiers",
+     "stateMutability": "view", "inputs": [],
+     "outputs": [{"name": "status", "type": "uint8"},
+                 {"name": "", "type": "uint256[]"}]},
+    {"type": "function", "name": "getClosedRequestIdentifiers",
+     "stateMutability": "view", "inputs": [],
+     "outputs": [{"name": "status", "type": "uint8"},
+                 {"name": "", "type": "uint256[]"}]},
+    {"type": "function", "name": "getType", "stateMutability": "view",
+     "inputs": [],
+     "outputs": [{"name": "status", "type": "uint8"},
+                 {"name": "", "type": "string"}]},
+    {"type": "function", "name": "submitRequestWithExtra",
+     "stateMutability": "nonpayable",
+     "inputs": [{"name": "deadline", "type": "uint256"},
+                {"name": "extra", "type": "uint256[]"}],
+     "outputs": [{"name": "status", "type": "uint8"},
+                 {"name": "requestID", "type": "uint256"}]},
+    {"type": "function", "name": "submitOfferWithExtra",
+     "stateMutability": "nonpayable",
+     "inputs": [{"name": "requestID", "type": "uint256"},
+                {"name": "extra", "type": "uint256[]"}],
+     "outputs": [{"name": "status", "type": "uint8"},
+                 {"name": "offerID", "type": "uint256"}]},
+    {"type": "function", "name": "submitRequestArrayExtra",
+     "stateMutability": "nonpayable",
+     "inputs": [{"name": "requestID", "type": "uint256"},
+                {"name": "extra", "type": "uint256[]"}],
+     "outputs": [{"name": "status", "type": "uint8"}]},
+    {"type": "event", "name": "RequestAdded", "anonymous": False,
+     "inputs": [{"name": "requestID", "type": "uint256", "indexed": False},
+                {"name": "deadline", "type": "uint256", "indexed": False}]},
+]
+
+
+class MockResponse:
+    def __init__(self, body):
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self, content_type=None):
+        return self.body
+
+
+class MockSession:
+    """aiohttp session posting to `node`"""
+
+    def __init__(self, node):
+        self.node = node
+        self.posts = []
+
+    def post(self, url, json):
+        self.posts.append(json)
+        return MockResponse(self.node.answer(json))
+
+    async def close(self):
+        pass
+
+
+class MockNode:
+    """Node of a marketplace contract at ADDRESS, mining every
+    transaction into a block of its own"""
+
+    def __init__(self, batches=True):
+        self.codec = Web3().codec
+        self.batches = batches
+        self.block = 10
+        self.receipts = {}
+        self.sent = []
+        self.failing = set()
+        self.results = {}
+
+    def answer(self, payload):
+        if not isinstance(payload, list):
+            return self.respond(payload)
+        if not self.batches:
+            return {"jsonrpc": "2.0", "id": None,
+                    "error": {"code": -32600, "message": "no batches"}}
+        return [self.respond(item) for item in payload]
+
+    def respond(self, item):
+        try:
+            result = getattr(self, item['method'])(*item['params'])
+        except (AttributeError, KeyError) as e:
+            return {"jsonrpc": "2.0", "id": item['id'],
+                    "error": {"code": -32000, "message": str(e)}}
+        return {"jsonrpc": "2.0", "id": item['id'], "result": result}
+
+    def returns(self, call, types, values):
+        selector = call._encode_transaction_data()[:10]
+        self.results[selector] = \
+            "0x" + self.codec.encode_abi(types, values).hex()
+
+    def eth_blockNumber(self):
+        return hex(self.block)
+
+    def eth_call(self, tx, block):
+        return self.results[tx['data'][:10]]
+
+    def eth_estimateGas(self, tx):
+        return hex(50000)
+
+    def eth_sendTransaction(self, tx):
+        self.sent.append(tx)
+        self.block += 1
+        tx_hash = "0x{:064x}".format(len(self.sent))
+        data = self.codec.encode_abi(['uint256', 'uint256'],
+                                     [len(self.sent), 100]).hex()
+        self.receipts[tx_hash] = self.receipt(tx_hash, [{
+            "address": ADDRESS,
+            "topics": [Web3.keccak(
+                text="RequestAdded(uint256,uint256)").hex()],
+            "data": "0x" + data,
+        }], status=len(self.sent) not in self.failing)
+        return tx_hash
+
+    def receipt(self, tx_hash, logs=(), status=True):
+        block = {"blockHash": "0x" + "ab" * 32,
+                 "blockNumber": hex(self.block),
+                 "transactionHash": tx_hash, "transactionIndex": "0x0"}
+        return dict(block, cumulativeGasUsed=hex(40000), gasUsed=hex(40000),
+                    status=hex(status), contractAddress=None, to=ADDRESS,
+                    logs=[dict(block, logIndex=hex(i), **log)
+                          for i, log in enumerate(logs)],
+                    logsBloom="0x" + "00" * 256, **{"from": MINTER})
+
+    def eth_getTransactionReceipt(self, tx_hash):
+        return self.receipts.get(tx_hash)
+
+
+class NodeProvider(BaseProvider):
+    """Synchronous provider talking to `node`"""
+
+    def __init__(self, node):
+        super().__init__()
+        self.node = node
+
+    def make_request(self, method, params):
+        return self.node.respond({"jsonrpc": "2.0", "id": 0,
+                                  "method": method, "params": params})
+
+
+class MockInstrumentation(Instrumentation):
+    def __init__(self):
+        self.events = []
+        self.transacted = threading.Event()
+
+    def call(self, name, latency, size):
+        self.events.append(('call', name))
+
+    def transaction(self, name, latency, gas_used, success):
+        self.events.append(('transaction', name, gas_used, success))
+        self.transacted.set()
+
+
+def make_contract(node, **kwargs):
+    web3 = Web3(BaseProvider())
+    sync = Web3Contract(web3, contract=web3.eth.contract(ADDRESS, abi=ABI),
+                        minter=MINTER, **kwargs)
+    session = MockSession(node)
+    return AsyncWeb3Contract(sync, "http://node", session=session,
+                             poll_interval=0.01), session
+
+
+@pytest.mark.asyncio
+async def test_async_rpc():
+    node = MockNode()
+    session = MockSession(node)
+    rpc = AsyncRPC("http://node", session=session)
+
+    assert await rpc.request("eth_blockNumber", []) == "0xa"
+    assert await rpc.batch([("eth_blockNumber", []),
+                            ("eth_estimateGas", [{}])]) == ["0xa", "0xc350"]
+    assert len(session.posts) == 2
+
+    with pytest.raises(ValueError):
+        await rpc.request("eth_getBalance", [])
+
+    # the node refuses batches, the requests are made one by one
+    node.batches = False
+    assert await rpc.batch([("eth_blockNumber", []),
+                            ("eth_blockNumber", [])]) == ["0xa", "0xa"]
+    assert len(session.posts) == 6
+
+
+@pytest.mark.asyncio
+async def test_async_contract_reads():
+    node = MockNode()
+    metrics = RPCMetrics()
+    contract, session = make_contract(node, block_max_age=60,
+                                      instrumentation=metrics)
+    functions = contract.contract.functions
+    node.returns(functions.getOpenRequestIdentifiers(),
+                 ['uint8', 'uint256[]'], [0, [1, 2]])
+    node.returns(functions.getClosedRequestIdentifiers(),
+                 ['uint8', 'uint256[]'], [0, [3]])
+    node.returns(functions.getType(), ['uint8', 'string'], [0, "flower"])
+
+    assert await contract.get_request_ids() == [1, 2, 3]
+    assert await contract.get_type() == "flower"
+
+    # the block number, then both identifier lists in one batch
+    assert session.posts[0]['method'] == "eth_blockNumber"
+    assert [item['params'][1] for item in session.posts[1]] == ["0xa"] * 2
+    assert len(session.posts) == 3
+
+    # the same reads in the same block are cached
+    assert await contract.get_request_ids() == [1, 2, 3]
+    assert len(session.posts) == 3
+    snapshot = metrics.snapshot()
+    assert snapshot['cache_hits'] == {'getOpenRequestIdentifiers': 1,
+                                      'getClosedRequestIdentifiers': 1}
+    assert snapshot['call_latency']['getType']['count'] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_contract_latest_block():
+    node = MockNode()
+    contract, session = make_contract(node, block_max_age=0)
+    functions = contract.contract.functions
+    node.returns(functions.getOpenRequestIdentifiers(),
+                 ['uint8', 'uint256[]'], [0, [1, 2]])
+    node.returns(functions.getClosedRequestIdentifiers(),
+                 ['uint8', 'uint256[]'], [0, [3]])
+    node.returns(functions.getType(), ['uint8', 'string'], [0, "flower"])
+
+    # without a max age single calls are made in the latest block as such
+    assert await contract.get_type() == "flower"
+    assert session.posts[0][0]['params'][1] == "latest"
+
+    # reads of several calls are pinned to the current block number,
+    # which is fetched every time
+    assert await contract.get_request_ids() == [1, 2, 3]
+    node.block += 1
+    assert await contract.get_request_ids() == [1, 2, 3]
+    assert [post['method'] for post in session.posts[1::2]] == \
+        ["eth_blockNumber"] * 2
+    assert [[item['params'][1] for item in post]
+            for post in session.posts[2::2]] == [["0xa"] * 2, ["0xb"] * 2]
+
+
+@pytest.mark.asyncio
+async def test_async_contract_transactions():
+    node = MockNode()
+    metrics = RPCMetrics()
+    contract, session = make_contract(node, instrumentation=metrics)
+    assert contract.sync.has_combined_submits
+    submit = contract.contract.functions.submitRequestWithExtra(0, [])
+    node.returns(submit, ['uint8', 'uint256'], [1, 0])
+
+    # the call fails, so its estimate is not cached
+    assert await contract.add_request_with_extra(100, [1, 2]) == 1
+    node.returns(submit, ['uint8', 'uint256'], [0, 2])
+    assert await contract.add_request_with_extra(100, [3, 4]) == 2
+    assert await contract.add_request_with_extra(100, [5, 6]) == 3
+
+    # the gas is estimated for the failing call and once for the rest
+    assert [post['method'] for post in session.posts
+            if isinstance(post, dict)].count("eth_estimateGas") == 2
+    assert [tx['gas'] for tx in node.sent] == [hex(60000)] * 3
+    assert all(tx['from'] == MINTER for tx in node.sent)
+
+    assert contract.last_block_number == 13
+    assert contract.last_gas_used == 40000
+    snapshot = metrics.snapshot()
+    assert snapshot['transaction_gas']['submitRequestWithExtra']['count'] \
+        == 3
+
+
+@pytest.mark.asyncio
+async def test_async_receipt_poller():
+    node = MockNode()
+    session = MockSession(node)
+    poller = AsyncReceiptPoller(AsyncRPC("http://node", session=session),
+                                poll_interval=0.01)
+    hashes = ["0x{:064x}".format(i) for i in range(1, 6)]
+
+    waits = asyncio.gather(*(poller.wait(tx_hash, timeout=5)
+                             for tx_hash in hashes))
+    while len(session.posts) < 2:
+        await asyncio.sleep(0.01)
+
+    # all of the receipts were fetched with one batch
+    assert len(session.posts[1]) == len(hashes)
+
+    for tx_hash in hashes:
+        node.receipts[tx_hash] = node.receipt(tx_hash)
+    node.block += 1
+
+    receipts = await waits
+    assert [receipt.transactionHash.hex() for receipt in receipts] == hashes
+    assert not poller.waiting
+
+    with pytest.raises(TimeExhausted):
+        await poller.wait("0x" + "ff" * 32, timeout=0.05)
+    assert not poller.waiting
+
+
+def test_contract_instrumentation():
+    node = MockNode()
+    node.eth_gasPrice = lambda: hex(1)
+    node.eth_chainId = lambda: hex(1337)
+    web3 = Web3(NodeProvider(node))
+    instrumentation = MockInstrumentation()
+    contract = Web3Contract(web3, contract=web3.eth.contract(ADDRESS, abi=ABI),
+                            minter=MINTER, instrumentation=instrumentation)
+    node.returns(contract.contract.functions.getType(),
+                 ['uint8', 'string'], [0, "flower"])
+
+    assert contract.get_type() == "flower"
+    assert instrumentation.events == [('call', 'getType')]
+
+    # the transaction is recorded once it is mined, even if its result
+    # is never asked for
+    view = contract.nowait()
+    pending = view.add_request_with_extra(100, [1, 2])
+    assert instrumentation.transacted.wait(5)
+    assert instrumentation.events[1:] == [
+        ('transaction', 'submitRequestWithExtra', 40000, True)]
+    assert view.last_gas_used == 40000
+
+    # and only once when it is
+    assert pending.result() == 1
+    assert len(instrumentation.events) == 2
+    assert not contract.receipts.waiting
+
+
+def test_contract_bulk_extras():
+    node = MockNode()
+    node.eth_gasPrice = lambda: hex(1)
+    node.eth_chainId = lambda: hex(1337)
+    node.eth_getTransactionCount = lambda address, block: hex(0)
+    node.failing = {2}
+    web3 = Web3(NodeProvider(node))
+    instrumentation = MockInstrumentation()
+    contract = Web3Contract(web3, contract=web3.eth.contract(ADDRESS, abi=ABI),
+                            minter=MINTER, instrumentation=instrumentation)
+
+    # the failed transaction is mined, but did not add the extra data
+    assert contract.add_requests_extra_bulk(
+        [1, 2, 3], [[1], [2], [3]]) == [True, False, True]
+    assert [int(tx['nonce'], 16) for tx in node.sent] == [0, 1, 2]
+
+    # the gas used is that of each transaction, not of the whole batch
+    assert sorted(event[1:] for event in instrumentation.events) == [
+        ('submitRequestArrayExtra', 40000, False),
+        ('submitRequestArrayExtra', 40000, True),
+        ('submitRequestArrayExtra', 40000, True)]
+    assert contract.last_gas_used == 40000
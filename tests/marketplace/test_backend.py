@@ -1,5 +1,9 @@
+from configparser import ConfigParser
+
 from web3 import Web3
 
+from sofie_offer_marketplace.backend.utils import parse_options
+
 from .utils import _check_existence, _check_request_spec, _check_offer_spec
 
 
@@ -326,6 +330,79 @@ def test_request_decision(client, web3contract):
     assert _check_existence(request_id_g, decided_requests), "the targeted request should be in the list of all decided ones"
     
 
+# 5 Test paginated request listing
+def test_request_pagination(client):
+    # GET /request (everything at once)
+    res = client.get('/request', query_string={
+        "state": "all"
+    })
+    assert res.status_code == 200
+    all_ids = [r['id'] for r in res.get_json()['requests']]
+
+    # GET /request (page by page)
+    def pages(query):
+        ids = []
+        while True:
+            res = client.get('/request', query_string=query)
+            assert res.status_code == 200
+            res_obj = res.get_json()
+            assert len(res_obj['requests']) <= query['limit']
+            ids += [r['id'] for r in res_obj['requests']]
+            if res_obj['next_cursor'] is None:
+                return ids
+            query['cursor'] = res_obj['next_cursor']
+
+    # pages are in the order of the request lists
+    # (a request decided after being closed is listed twice)
+    ids = pages({"state": "all", "limit": 2})
+    assert list(dict.fromkeys(ids)) == list(dict.fromkeys(all_ids))
+
+    res = client.get('/request', query_string={"state": "open"})
+    open_ids = [r['id'] for r in res.get_json()['requests']]
+    assert pages({"state": "open", "limit": 1}) == open_ids
+
+    # GET /request (invalid limit)
+    res = client.get('/request', query_string={
+        "limit": 0
+    })
+    assert res.status_code == 400
+
+    # GET /request (invalid cursor)
+    res = client.get('/request', query_string={
+        "limit": 1,
+        "cursor": -1
+    })
+    assert res.status_code == 400
+
+
+# 6 Test the optional settings
+def test_parse_options():
+    parser = ConfigParser()
+    parser.read_string("""
+[marketplace]
+gas_multiplier = 1.5
+block_max_age = 0
+hedge_percentile = 0
+rpc_pool_size = 32
+rpc_keep_alive = false
+rpc_timeout = 5
+rpc_connect_timeout = 1.5
+rpc_compression = false
+""")
+
+    assert parse_options(parser) == {
+        'gas_multiplier': 1.5,
+        'block_max_age': 0.0,
+        'hedge_percentile': None,
+        'http_options': {'pool_size': 32, 'keep_alive': False,
+                         'timeout': 5.0, 'connect_timeout': 1.5,
+                         'compression': False}}
+
+    # no HTTP options without rpc_* settings
+    parser.read_string("[other]\nmax_gas = 100000\n")
+    assert parse_options(parser, network="other") == {'max_gas': 100000}
+
+
 
 # def test_set_up(web3contract):
 #     # ensure one valid request added at least
@@ -0,0 +1,77 @@
+import sofie_offer_marketplace as om
+from sofie_offer_marketplace.cache import ContractCache, LRUCache
+from .utils import MockRequest, MockOffer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache():
+    clock = Clock()
+    cache = LRUCache(max_size=2, ttl=10, clock=clock)
+
+    cache.put(1, "a")
+    cache.put(2, "b")
+    assert cache.get(1) == "a"
+
+    # 2 is the least recently used one
+    cache.put(3, "c", permanent=True)
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+
+    clock.now = 10
+    assert cache.get(1) is None
+    assert cache.get(3) == "c"
+
+    # permanent entries are evicted too
+    cache.put(4, "d")
+    cache.put(5, "e")
+    assert cache.get(3) is None
+
+
+def test_marketplace_cache(contract, mocker):
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    r1 = MockRequest(1, quantity=3, type=1, offers=[o1], decided_offers=[o1],
+                     is_decided=True)
+    r2 = MockRequest(2, quantity=4, type=2, offers=[], decided_offers=[],
+                     is_decided=False)
+    contract.requests = [r1, r2]
+    contract.offers = [o1]
+
+    clock = Clock()
+    marketplace = om.Marketplace(contract=contract,
+                                 fallback_request_class=MockRequest,
+                                 fallback_offer_class=MockOffer,
+                                 cache=ContractCache(ttl=10, clock=clock))
+
+    mocker.spy(contract, 'get_requests_bulk')
+    marketplace.get_requests()
+    marketplace.get_request(1)
+    marketplace.get_request(2)
+    contract.get_requests_bulk.assert_called_once_with([1, 2])
+
+    # decided requests stay, others expire
+    clock.now = 10
+    marketplace.get_requests()
+    contract.get_requests_bulk.assert_called_with([2])
+
+    # and are invalidated by events
+    r2.quantity = 7
+    marketplace.cache.apply_events([
+        ('FunctionStatus', {'status': 0}, "0x1"),
+        ('OfferAdded', {'offerID': 12, 'requestID': 2, 'offerMaker': "b"},
+         "0x1")])
+    assert marketplace.get_request(2).quantity == 7
+    marketplace.get_request(1)
+    assert contract.get_requests_bulk.call_count == 3
+
+    # a transaction with only a status event may have deleted requests
+    contract.requests = [r2]
+    marketplace.cache.apply_events([
+        ('FunctionStatus', {'status': 0}, "0x2")])
+    assert marketplace.get_request(1) is None
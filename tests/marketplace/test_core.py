@@ -1,6 +1,9 @@
+import threading
+
 import pytest
 import sofie_offer_marketplace as om
-from .utils import MockRequest, MockOffer
+from sofie_offer_marketplace.snapshot import MarketSnapshot
+from .utils import MockRequest, MockOffer, MockAsyncContract
 
 
 def test_creation(contract):
@@ -39,6 +42,42 @@ def test_get_requests_nonempty(marketplace, contract):
     assert marketplace.get_request(3) is None
 
 
+def test_get_requests_bulk(marketplace, contract, mocker):
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    o2 = MockOffer(offer_id=12, request_id=1, price=7, author="b")
+    r1 = MockRequest(1, quantity=3, type=1, offers=[o1, o2],
+                     decided_offers=[o2])
+    r2 = MockRequest(2, quantity=4, type=2, offers=[], decided_offers=[])
+    contract.requests = [r1, r2]
+    contract.offers = [o1, o2]
+
+    mocker.spy(contract, 'get_requests_bulk')
+    mocker.spy(contract, 'get_offers_bulk')
+    mocker.spy(contract, 'get_offer')
+
+    requests = marketplace.get_requests()
+
+    contract.get_requests_bulk.assert_called_once_with([1, 2])
+    contract.get_offers_bulk.assert_called_once_with([11, 12])
+    contract.get_offer.assert_not_called()
+
+    assert [r.request_id for r in requests] == [1, 2]
+    assert_equal(requests[0], r1)
+    assert [o.price for o in requests[0].offers] == [5, 7]
+    assert [o.offer_id for o in requests[0].decided_offers] == [12]
+    assert requests[1].offers == []
+
+
+def test_get_requests_page(marketplace, contract):
+    contract.requests = [MockRequest(i) for i in range(1, 6)]
+
+    assert [r.request_id for r in marketplace.get_requests(limit=2)] == [1, 2]
+    assert [r.request_id
+            for r in marketplace.get_requests(offset=3, limit=5)] == [4, 5]
+    assert [r.request_id for r in marketplace.get_requests(offset=4)] == [5]
+    assert contract.get_request_ids_page(1, 2) == ([2, 3], 5)
+
+
 def test_get_type(marketplace, contract):
     assert contract.get_type() == 'mocktype'
     assert marketplace.get_type() == 'mocktype'
@@ -80,3 +119,313 @@ async def test_add_offer(marketplace, contract, mocker):
     o.marshal_extra.assert_called_once_with()
     contract.add_offer.assert_called_once_with(10)
     contract.add_offer_extra.assert_called_once_with(101, [91])
+
+
+@pytest.mark.asyncio
+async def test_add_requests_and_offers(marketplace, contract, mocker):
+    marketplace.is_manager = True
+    mocker.spy(contract, 'add_requests_bulk')
+    mocker.spy(contract, 'add_requests_extra_bulk')
+
+    requests = await marketplace.add_requests(
+        [MockRequest(quantity=9, type=3, deadline=5321),
+         MockRequest(quantity=4, type=1, deadline=5322)])
+
+    assert [(r.quantity, r.type) for r in requests] == [(9, 3), (4, 1)]
+    contract.add_requests_bulk.assert_called_once_with([5321, 5322])
+    contract.add_requests_extra_bulk.assert_called_once_with(
+        [1, 2], [[9, 3], [4, 1]])
+
+    offers = await marketplace.add_offers(
+        [MockOffer(request_id=1, price=7), MockOffer(request_id=2, price=8)])
+    assert [(o.offer_id, o.request_id, o.price) for o in offers] == \
+        [(3, 1, 7), (4, 2, 8)]
+
+
+@pytest.mark.asyncio
+async def test_add_request_with_extra(marketplace, contract, mocker):
+    marketplace.is_manager = True
+    mocker.spy(contract, 'add_request_with_extra')
+
+    result = await marketplace.add_request(
+        MockRequest(quantity=9, type=3, deadline=5321))
+    contract.add_request_with_extra.assert_called_once_with(5321, [9, 3])
+    assert (result.quantity, result.type) == (9, 3)
+
+    # the request is not returned if its extra data does not fit
+    assert contract.add_request_with_extra(5322, [1]) == -1
+    assert contract.add_requests_with_extra_bulk(
+        [5323, 5324], [[1, 1], [1]])[1] == -1
+
+
+@pytest.mark.asyncio
+async def test_async_marketplace(contract):
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    r1 = MockRequest(1, quantity=3, type=1, offers=[o1], decided_offers=[])
+    contract.requests = [r1, MockRequest(2, offers=[], decided_offers=[])]
+    contract.offers = [o1]
+
+    marketplace = await om.AsyncMarketplace.create(
+        MockAsyncContract(contract),
+        fallback_request_class=MockRequest,
+        fallback_offer_class=MockOffer,
+        is_manager=True,
+        offer_chunk_size=1)
+    assert marketplace.get_type() == 'mocktype'
+
+    requests = await marketplace.get_requests()
+    assert [r.request_id for r in requests] == [1, 2]
+    assert [o.price for o in requests[0].offers] == [5]
+    assert (await marketplace.get_offer(11)).price == 5
+    assert await marketplace.get_request(3) is None
+
+    result = await marketplace.add_request(
+        MockRequest(quantity=9, type=3, deadline=5321))
+    assert (result.quantity, result.type) == (9, 3)
+
+    results = await marketplace.add_requests(
+        [MockRequest(quantity=1, type=1, deadline=1),
+         MockRequest(quantity=2, type=2, deadline=2)])
+    assert [r.quantity for r in results] == [1, 2]
+
+
+def test_get_request_parallel_offers(contract, mocker):
+    offers = [MockOffer(offer_id=10 + i, request_id=1, price=i, author="a")
+              for i in range(5)]
+    r1 = MockRequest(1, quantity=3, type=1, offers=offers,
+                     decided_offers=offers[3:4])
+    contract.requests = [r1]
+    contract.offers = offers
+
+    marketplace = om.Marketplace(contract=contract,
+                                 fallback_request_class=MockRequest,
+                                 fallback_offer_class=MockOffer,
+                                 max_workers=2, offer_chunk_size=2)
+    mocker.spy(contract, 'get_offers_bulk')
+
+    request = marketplace.get_request(1)
+    marketplace.close()
+
+    assert [o.price for o in request.offers] == [0, 1, 2, 3, 4]
+    # decided offers are the same objects, not fetched again
+    assert request.decided_offers[0] is request.offers[3]
+    assert sorted(call.args[0] for call in
+                  contract.get_offers_bulk.call_args_list) == \
+        [[10, 11], [12, 13], [14]]
+
+
+def test_get_requests_lazy_offers(contract, mocker):
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    o2 = MockOffer(offer_id=12, request_id=1, price=7, author="b")
+    r1 = MockRequest(1, quantity=3, type=1, offers=[o1, o2],
+                     decided_offers=[o2])
+    contract.requests = [r1]
+    contract.offers = [o1, o2]
+
+    marketplace = om.Marketplace(contract=contract,
+                                 fallback_request_class=MockRequest,
+                                 fallback_offer_class=MockOffer,
+                                 lazy_offers=True)
+    mocker.spy(contract, 'get_offers_bulk')
+
+    request, = marketplace.get_requests()
+    assert len(request.offers) == 2
+    contract.get_offers_bulk.assert_not_called()
+
+    assert request.decided_offers[0].price == 7
+    contract.get_offers_bulk.assert_called_once_with([12])
+
+    assert [o.price for o in request.offers] == [5, 7]
+    contract.get_offers_bulk.assert_called_with([11])
+    assert request.offers[1] is request.decided_offers[0]
+
+
+def test_request_slots():
+    class SlotRequest(om.Request):
+        extra_fields = ('quantity',)
+
+    r1 = SlotRequest(request_id=1)
+    r1.quantity = 3
+    r2 = SlotRequest(request_id=2)
+
+    assert not hasattr(r1, '__dict__')
+    assert r1.offers is not r2.offers
+
+    with pytest.raises(AttributeError):
+        r1.unknown = 1
+
+    # subclasses without extra fields keep their dictionary
+    assert MockRequest(request_id=1).__dict__ is not None
+
+
+def test_snapshot(contract, mocker):
+    class ColumnRequest(MockRequest):
+        extra_columns = (('quantity', 'Q'), ('type', 'B'))
+
+    class ColumnOffer(MockOffer):
+        extra_columns = (('price', 'Q'),)
+
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    o2 = MockOffer(offer_id=12, request_id=1, price=7, author="b")
+    o3 = MockOffer(offer_id=13, request_id=2, price=6, author="a")
+    r1 = MockRequest(1, deadline=100, quantity=3, type=1, offers=[o1, o2],
+                     decided_offers=[o2], is_decided=True)
+    r2 = MockRequest(2, deadline=200, quantity=4, type=2, offers=[o3],
+                     is_open=True)
+    contract.requests = [r1, r2]
+    contract.offers = [o1, o2, o3]
+
+    marketplace = om.Marketplace(contract=contract,
+                                 fallback_request_class=ColumnRequest,
+                                 fallback_offer_class=ColumnOffer)
+
+    mocker.spy(ColumnOffer, 'from_data')
+    snapshot = marketplace.snapshot()
+    assert ColumnOffer.from_data.call_count == 0
+
+    assert list(snapshot.requests['request_id']) == [1, 2]
+    assert list(snapshot.requests['deadline']) == [100, 200]
+    assert list(snapshot.requests['is_decided']) == [1, 0]
+    assert list(snapshot.requests['is_open']) == [0, 1]
+    assert list(snapshot.requests['offer_count']) == [2, 1]
+    assert list(snapshot.requests['quantity']) == [3, 4]
+
+    assert list(snapshot.offers['offer_id']) == [11, 12, 13]
+    assert list(snapshot.offers['request_id']) == [1, 1, 2]
+    assert list(snapshot.offers['price']) == [5, 7, 6]
+    assert snapshot.authors == ["a", "b"]
+    assert snapshot.offer_authors() == ["a", "b", "a"]
+
+
+def test_snapshot_large_values():
+    # uint256 values that do not fit the columns fall back to lists
+    snapshot = MarketSnapshot.from_data(
+        [1, 2],
+        [{'deadline': 100, 'is_decided': False, 'is_pending': False,
+          'is_open': True, 'is_closed': False, 'extra': [3]},
+         {'deadline': 2 ** 255, 'is_decided': False, 'is_pending': False,
+          'is_open': True, 'is_closed': False, 'extra': [2 ** 64]}],
+        [11], [{'request_id': 1, 'author': "a", 'extra': [2 ** 70]}],
+        request_extra_columns=(('quantity', 'Q'),),
+        offer_extra_columns=(('price', 'Q'),))
+
+    assert snapshot.requests['deadline'] == [100, 2 ** 255]
+    assert snapshot.requests['quantity'] == [3, 2 ** 64]
+    assert list(snapshot.requests['request_id']) == [1, 2]
+    assert snapshot.requests['request_id'].typecode == 'Q'
+    assert snapshot.offers['price'] == [2 ** 70]
+
+
+def test_get_requests_batch_marshalling(marketplace, contract, mocker):
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    o2 = MockOffer(offer_id=12, request_id=2, price=6, author="b")
+    r1 = MockRequest(1, quantity=3, type=1, offers=[o1], decided_offers=[])
+    r2 = MockRequest(2, quantity=4, type=2, offers=[o2], decided_offers=[])
+    contract.requests = [r1, r2]
+    contract.offers = [o1, o2]
+
+    mocker.spy(MockRequest, 'from_data_batch')
+    mocker.spy(MockOffer, 'from_data_batch')
+
+    requests = marketplace.get_requests()
+    assert MockRequest.from_data_batch.call_count == 1
+    assert MockOffer.from_data_batch.call_count == 1
+    assert [r.quantity for r in requests] == [3, 4]
+    assert [r.offers[0].price for r in requests] == [5, 6]
+    assert MockOffer.marshal_extra_batch([o1, o2]) == [[5], [6]]
+
+
+def test_offer_identity_map(contract, mocker):
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    o2 = MockOffer(offer_id=12, request_id=1, price=6, author="b")
+    r1 = MockRequest(1, quantity=3, type=1, offers=[o1, o2],
+                     decided_offers=[o2], is_decided=True)
+    contract.requests = [r1]
+    contract.offers = [o1, o2]
+
+    get_offers_bulk = contract.get_offers_bulk
+
+    def get_final_offers_bulk(offer_ids):
+        datas = get_offers_bulk(offer_ids)
+        for data in datas:
+            data['stage'] = 2
+        return datas
+
+    mocker.patch.object(contract, 'get_offers_bulk',
+                        side_effect=get_final_offers_bulk)
+
+    marketplace = om.Marketplace(contract=contract,
+                                 fallback_request_class=MockRequest,
+                                 fallback_offer_class=MockOffer,
+                                 identity_map=om.core.OfferIdentityMap())
+
+    request = marketplace.get_requests()[0]
+    assert request.decided_offers[0] is request.offers[1]
+    contract.get_offers_bulk.assert_called_once_with([11, 12])
+
+    # the offers are reused while they are referenced
+    assert marketplace.get_request(1).offers[0] is request.offers[0]
+    assert marketplace.get_offer(12) is request.offers[1]
+    assert contract.get_offers_bulk.call_count == 1
+
+
+def test_iter_requests(contract, mocker):
+    requests = [MockRequest(i, quantity=i, type=1, is_open=i % 3 != 0,
+                            is_closed=i % 3 == 0)
+                for i in (5, 1, 4, 2, 3, 6)]
+    contract.requests = requests
+
+    marketplace = om.Marketplace(contract=contract,
+                                 fallback_request_class=MockRequest,
+                                 fallback_offer_class=MockOffer)
+
+    mocker.spy(contract, 'get_requests_bulk')
+    assert [r.request_id for r in marketplace.iter_requests(
+        prefetch=0, page_size=4)] == [1, 2, 3, 4, 5, 6]
+    assert contract.get_requests_bulk.call_count == 2
+
+    assert [r.request_id for r in marketplace.iter_requests(
+        state='closed', prefetch=1, page_size=2)] == [3, 6]
+
+    # closing the generator stops the reads: the first page was consumed
+    # and only the one page after it was read ahead
+    read_ahead = threading.Event()
+    get_requests_bulk = contract.get_requests_bulk
+
+    def read(request_ids):
+        if request_ids == [2]:
+            read_ahead.set()
+        return get_requests_bulk(request_ids)
+
+    mocker.patch.object(contract, 'get_requests_bulk', side_effect=read)
+    iterator = marketplace.iter_requests(prefetch=1, page_size=1)
+    assert next(iterator).request_id == 1
+    assert read_ahead.wait(5)
+    iterator.close()
+    assert [call.args[0] for call in
+            contract.get_requests_bulk.call_args_list] == [[1], [2]]
+
+
+@pytest.mark.asyncio
+async def test_async_iter_requests(contract, mocker):
+    contract.requests = [MockRequest(i, quantity=i, type=1,
+                                     is_open=i % 3 != 0, is_closed=i % 3 == 0)
+                         for i in (5, 1, 4, 2, 3, 6)]
+    async_contract = MockAsyncContract(contract)
+    marketplace = await om.AsyncMarketplace.create(
+        async_contract,
+        fallback_request_class=MockRequest,
+        fallback_offer_class=MockOffer)
+
+    assert [r.request_id async for r in marketplace.iter_requests(
+        prefetch=2, page_size=4)] == [1, 2, 3, 4, 5, 6]
+    assert [r.request_id async for r in marketplace.iter_requests(
+        state='open', prefetch=0, page_size=2)] == [1, 2, 4, 5]
+
+    # closing the generator cancels the reads ahead
+    mocker.spy(async_contract, 'get_requests_bulk')
+    iterator = marketplace.iter_requests(prefetch=1, page_size=1)
+    assert (await iterator.__anext__()).request_id == 1
+    await iterator.aclose()
+    assert [call.args[0] for call in
+            async_contract.get_requests_bulk.call_args_list] == [[1], [2]]
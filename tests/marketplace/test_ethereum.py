@@ -0,0 +1,198 @@
+import pytest
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from sofie_offer_marketplace.ethereum import (CallBatch, CallCache,
+                                              LatestBlock, Multicall)
+
+
+class MockCall:
+    """Call of a function returning the number in its call data"""
+    address = "0x0"
+    fn_name = "getValue"
+    abi = {'type': 'function', 'outputs': [{'name': '', 'type': 'uint256'}]}
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def _encode_transaction_data(self):
+        return self.data
+
+    def call(self, block_identifier='latest'):
+        self.calls += 1
+        return int(self.data, 16)
+
+
+class MockProvider(BaseProvider):
+    """Provider answering batches of the calls of MockCall, or `response`
+    if given"""
+
+    def __init__(self, response=None):
+        super().__init__()
+        self.response = response
+        self.batches = []
+
+    def make_batch_request(self, payload):
+        self.batches.append(payload)
+        if self.response is not None:
+            return self.response
+
+        return [{'jsonrpc': '2.0', 'id': item['id'],
+                 'result': '0x{:064x}'.format(
+                     int(item['params'][0]['data'], 16))}
+                for item in reversed(payload)]
+
+
+class MockAggregate:
+    def __init__(self, aggregator, calls):
+        self.aggregator = aggregator
+        self.calls = calls
+
+    def call(self, block_identifier='latest'):
+        self.aggregator.blocks.append(block_identifier)
+        self.aggregator.sizes.append(len(self.calls))
+        codec = self.aggregator.codec
+        return (self.aggregator.block_number,
+                [data != "0xff" for _, data in self.calls],
+                [codec.encode_abi(['uint256'], [int(data, 16)])
+                 for _, data in self.calls])
+
+
+class MockAggregator:
+    """The Multicall contract, evaluating MockCalls in `block_number`"""
+
+    def __init__(self, codec, block_number):
+        self.codec = codec
+        self.block_number = block_number
+        self.blocks = []
+        self.sizes = []
+        self.functions = self
+
+    def aggregate(self, calls):
+        return MockAggregate(self, calls)
+
+
+class MockMulticallWeb3:
+    def __init__(self, block_number):
+        self.codec = Web3().codec
+        self.aggregator = MockAggregator(self.codec, block_number)
+        self.eth = self
+
+    def contract(self, address, abi):
+        return self.aggregator
+
+
+class MockEth:
+    def __init__(self):
+        self.blockNumber = 10
+
+
+class MockWeb3:
+    def __init__(self):
+        self.eth = MockEth()
+
+
+def test_call_batch_chunks():
+    provider = MockProvider()
+    batch = CallBatch(Web3(provider), max_size=2, block_identifier=7)
+    calls = [MockCall(hex(i)) for i in range(5)]
+
+    results = [batch.add(call) for call in calls]
+    assert results[3].result() == 3
+    assert [result.result() for result in results] == [0, 1, 2, 3, 4]
+
+    # two full batches, and the single call left is made on its own
+    assert [len(payload) for payload in provider.batches] == [2, 2]
+    assert provider.batches[0][0]['params'][1] == '0x7'
+    assert [call.calls for call in calls] == [0, 0, 0, 0, 1]
+
+
+def test_call_batch_fallbacks():
+    calls = [MockCall(hex(i)) for i in range(3)]
+
+    # the provider does not support batches
+    batch = CallBatch(Web3(BaseProvider()))
+    for call in calls:
+        batch.add(call)
+    assert batch.execute() == [0, 1, 2]
+    assert [call.calls for call in calls] == [1, 1, 1]
+
+    # the node refuses batches with a single error object
+    provider = MockProvider({'jsonrpc': '2.0', 'id': None,
+                             'error': {'code': -32600,
+                                       'message': 'batches not allowed'}})
+    batch = CallBatch(Web3(provider))
+    for call in calls:
+        batch.add(call)
+    assert batch.execute() == [0, 1, 2]
+    assert len(provider.batches) == 1
+    assert [call.calls for call in calls] == [2, 2, 2]
+
+
+def test_call_batch_error():
+    provider = MockProvider([
+        {'jsonrpc': '2.0', 'id': 0, 'result': '0x{:064x}'.format(0)},
+        {'jsonrpc': '2.0', 'id': 1,
+         'error': {'code': -32000, 'message': 'execution reverted'}}])
+    batch = CallBatch(Web3(provider))
+    batch.add(MockCall("0x0"))
+    batch.add(MockCall("0x1"))
+
+    with pytest.raises(ValueError):
+        batch.execute()
+
+
+def test_multicall():
+    web3 = MockMulticallWeb3(block_number=42)
+    multicall = Multicall(web3, "0x0", max_size=2)
+
+    calls = [MockCall(hex(i)) for i in range(5)]
+    assert multicall.call(calls) == [0, 1, 2, 3, 4]
+    assert multicall.block_number == 42
+
+    # chunks after the first one are made in the block of the first one
+    assert web3.aggregator.sizes == [2, 2, 1]
+    assert web3.aggregator.blocks == ['latest', 42, 42]
+
+    with pytest.raises(ValueError):
+        multicall.call([MockCall("0x1"), MockCall("0xff")])
+
+
+def test_call_cache():
+    cache = CallCache(max_size=2)
+    a, b, c = MockCall("0xa"), MockCall("0xb"), MockCall("0xc")
+
+    # only calls in numbered blocks are cached
+    assert cache.key('latest', a) is None
+
+    cache.put(cache.key(1, a), [0, [1, 2]])
+    cache.put(cache.key(1, b), [0, [3]])
+
+    value = cache.get(cache.key(1, a))
+    assert value == [0, [1, 2]]
+    value[1].append(3)
+    assert cache.get(cache.key(1, a)) == [0, [1, 2]]
+    assert cache.get(cache.key(2, a)) is CallCache._missing
+
+    # b is the least recently used one
+    cache.put(cache.key(1, c), [0])
+    assert cache.get(cache.key(1, b)) is CallCache._missing
+    assert cache.get(cache.key(1, a)) == [0, [1, 2]]
+
+
+def test_latest_block():
+    web3 = MockWeb3()
+    blocks = LatestBlock(web3, max_age=60)
+
+    assert blocks.get() == 10
+    web3.eth.blockNumber = 11
+    assert blocks.get() == 10
+
+    # own transactions are seen right away
+    blocks.seen(12)
+    assert blocks.get() == 12
+
+    blocks.max_age = 0
+    web3.eth.blockNumber = 13
+    assert blocks.get() == 13
@@ -0,0 +1,54 @@
+from sofie_offer_marketplace_cli.flower_marshaller import (
+    FlowerRequest, FlowerOffer)
+
+
+def request_common(deadline, **flags):
+    common = dict(deadline=deadline, is_decided=False, is_pending=False,
+                  is_open=False, is_closed=False, offers=[],
+                  decided_offers=[])
+    common.update(flags)
+    return common
+
+
+def test_flower_request_batch():
+    ids = [1, 2]
+    commons = [request_common(100, is_open=True, offers=[11, 12]),
+               request_common(200, is_decided=True, is_closed=True,
+                              offers=[13], decided_offers=[13])]
+    extras = [[3, 1], [2 ** 70, 2]]
+
+    batch = FlowerRequest.from_data_batch(ids, commons, extras)
+    single = [FlowerRequest.from_data(request_id, common, extra)
+              for request_id, common, extra in zip(ids, commons, extras)]
+
+    assert len(batch) == 2
+    fields = ('request_id', 'deadline', 'quantity', 'type', 'is_decided',
+              'is_pending', 'is_open', 'is_closed', 'offers',
+              'decided_offers')
+    for a, b in zip(batch, single):
+        assert [getattr(a, f) for f in fields] == \
+            [getattr(b, f) for f in fields]
+
+    assert FlowerRequest.marshal_extra_batch(batch) == \
+        [request.marshal_extra() for request in single] == \
+        [[[3, 1]], [[2 ** 70, 2]]]
+
+    assert FlowerRequest.from_data_batch([], [], []) == []
+
+
+def test_flower_offer_batch():
+    ids = [11, 12]
+    commons = [dict(request_id=1, author="a"), dict(request_id=1, author="b")]
+    extras = [[5], [7]]
+
+    batch = FlowerOffer.from_data_batch(ids, commons, extras)
+    single = [FlowerOffer.from_data(offer_id, common, extra)
+              for offer_id, common, extra in zip(ids, commons, extras)]
+
+    fields = ('offer_id', 'request_id', 'author', 'price')
+    assert [[getattr(offer, f) for f in fields] for offer in batch] == \
+        [[getattr(offer, f) for f in fields] for offer in single] == \
+        [[11, 1, "a", 5], [12, 1, "b", 7]]
+
+    assert FlowerOffer.marshal_extra_batch(batch) == \
+        [offer.marshal_extra() for offer in single] == [[[5]], [[7]]]
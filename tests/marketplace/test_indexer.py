@@ -0,0 +1,98 @@
+from sofie_offer_marketplace.indexer import Index, IndexCheckpoint, Indexer
+from .utils import MockRequest, MockOffer
+
+
+def test_index_sync(contract):
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    r1 = MockRequest(1, deadline=100, quantity=3, type=1, offers=[o1],
+                     decided_offers=[], is_pending=False, is_decided=False,
+                     is_open=True, is_closed=False)
+    r2 = MockRequest(2, deadline=200, quantity=4, type=2, offers=[],
+                     decided_offers=[], is_pending=False, is_decided=False,
+                     is_open=False, is_closed=True)
+    contract.requests = [r1, r2]
+    contract.offers = [o1]
+
+    index = Index()
+    Indexer(contract, index).sync_all()
+
+    indexed = index.get_requests_bulk([1, 2, 3])
+    for got, expected in zip(indexed, contract.get_requests_bulk([1, 2, 3])):
+        assert got is None and expected is None or \
+            {k: got[k] for k in expected} == expected
+    assert index.get_offers_bulk([11, 12])[0]['extra'] == [5]
+    assert index.get_offers_bulk([11, 12])[1] is None
+
+    assert index.get_open_request_ids() == [1]
+    assert index.get_closed_request_ids() == [2]
+    assert index.get_request_ids_page(0, 1) == ([1], 2)
+    assert index.get_request_ids_page(1, 1) == ([2], 2)
+
+
+def test_index_events(contract, mocker):
+    r1 = MockRequest(1, deadline=100, quantity=3, type=1, offers=[],
+                     decided_offers=[], is_pending=False, is_decided=False,
+                     is_open=True, is_closed=False)
+    contract.requests = [r1]
+
+    index = Index()
+    indexer = Indexer(contract, index)
+    indexer.sync_all()
+
+    o1 = MockOffer(offer_id=11, request_id=1, price=5, author="a")
+    r1.offers = [o1]
+    contract.offers = [o1]
+    mocker.spy(contract, 'get_requests_bulk')
+
+    indexer.apply_events([
+        ('OfferAdded', {'offerID': 11, 'requestID': 1, 'offerMaker': "a"}, 1),
+        ('OfferExtraAdded', {'offerID': 11}, 2),
+        ('FunctionStatus', {'status': 0}, 2),
+    ])
+
+    contract.get_requests_bulk.assert_called_once_with([1])
+    assert index.get_requests_bulk([1])[0]['offer_ids'] == [11]
+    assert index.get_offers_bulk([11])[0]['extra'] == [5]
+
+    # deleting a closed request is only visible as a FunctionStatus event
+    r1.is_open, r1.is_closed = False, True
+    indexer.refresh(request_ids=[1])
+    contract.requests = []
+
+    indexer.apply_events([('FunctionStatus', {'status': 0}, 3)])
+
+    assert index.get_requests_bulk([1]) == [None]
+    assert index.get_offers_bulk([11]) == [None]
+
+
+def test_index_pinned_reads(contract, mocker):
+    r1 = MockRequest(1, deadline=100, quantity=3, type=1, offers=[],
+                     decided_offers=[], is_pending=False, is_decided=False,
+                     is_open=True, is_closed=False)
+    contract.requests = [r1]
+    contract.pinned = mocker.Mock(return_value=contract)
+
+    indexer = Indexer(contract, Index())
+    indexer.decoder = mocker.Mock()
+    indexer.decoder.decode.return_value = [
+        ('RequestAdded', {'requestID': 1}, 1),
+        ('FunctionStatus', {'status': 0}, 2)]
+
+    # the changes are read in the block of the last log
+    indexer.apply_logs([{'blockNumber': 5}, {'blockNumber': 7}])
+    assert [call.args for call in contract.pinned.call_args_list] == \
+        [(7,), (7,)]
+
+    # writes of the backend itself are read in the latest block
+    contract.pinned.reset_mock()
+    indexer.refresh(request_ids=[1])
+    assert not contract.pinned.called
+
+
+def test_index_checkpoint(tmp_path):
+    path = str(tmp_path / "index.db")
+    IndexCheckpoint(Index(path)).save({'block': 5, 'hashes': [[5, "0x05"]]})
+
+    assert IndexCheckpoint(Index(path)).load() == \
+        {'block': 5, 'hashes': [[5, "0x05"]]}
+    assert IndexCheckpoint(Index(path), name='other').load() is None
@@ -0,0 +1,36 @@
+from sofie_offer_marketplace.metrics import Histogram, RPCMetrics
+
+
+def test_histogram():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.sum == 56.5
+    assert histogram.cumulative() == [(1, 2), (10, 3), (float('inf'), 4)]
+
+
+def test_rpc_metrics():
+    metrics = RPCMetrics()
+    metrics.call('getRequest', 0.02, 36)
+    metrics.call('getRequest', 0.2, 36)
+    metrics.cached('getRequest')
+    metrics.transaction('submitOffer', 3.0, 90000, True)
+    metrics.transaction('submitOffer', 0, None, False)
+    metrics.retry('eth_call')
+
+    snapshot = metrics.snapshot()
+    assert snapshot['call_latency']['getRequest']['count'] == 2
+    assert snapshot['cache_hits'] == {'getRequest': 1}
+    assert snapshot['transaction_gas']['submitOffer']['sum'] == 90000
+    assert snapshot['transaction_failures'] == {'submitOffer': 1}
+    assert snapshot['retries'] == {'eth_call': 1}
+
+    text = metrics.to_prometheus()
+    assert '# TYPE marketplace_call_latency_seconds histogram' in text
+    assert 'marketplace_call_latency_seconds_bucket' \
+        '{function="getRequest",le="0.025"} 1' in text
+    assert 'marketplace_call_latency_seconds_bucket' \
+        '{function="getRequest",le="+Inf"} 2' in text
+    assert 'marketplace_rpc_retries_total{method="eth_call"} 1' in text
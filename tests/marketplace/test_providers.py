@@ -0,0 +1,187 @@
+import json
+import time
+
+import pytest
+from web3.providers.base import BaseProvider
+
+from sofie_offer_marketplace.metrics import RPCMetrics
+from sofie_offer_marketplace.providers import (
+    MultiEndpointProvider, http_provider, post_batch)
+
+
+class MockProvider(BaseProvider):
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.methods = []
+
+    def make_request(self, method, params):
+        self.methods.append(method)
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.name)
+        return {'jsonrpc': '2.0', 'id': 0, 'result': self.name}
+
+
+def test_round_robin_and_primary():
+    a, b, c = MockProvider('a'), MockProvider('b'), MockProvider('c')
+    provider = MultiEndpointProvider([a, b, c], hedge_percentile=None)
+
+    reads = [provider.make_request('eth_call', [])['result']
+             for _ in range(6)]
+    assert sorted(reads) == ['a', 'a', 'b', 'b', 'c', 'c']
+
+    # transactions always go to the first node
+    for _ in range(3):
+        assert provider.make_request(
+            'eth_sendTransaction', [])['result'] == 'a'
+    assert provider.make_request('personal_unlockAccount', [])['result'] \
+        == 'a'
+
+
+def test_failover_and_ejection():
+    a, b = MockProvider('a', fail=True), MockProvider('b')
+    metrics = RPCMetrics()
+    provider = MultiEndpointProvider([a, b], hedge_percentile=None,
+                                     max_failures=2, instrumentation=metrics)
+
+    for _ in range(6):
+        assert provider.make_request('eth_call', [])['result'] == 'b'
+
+    # ejected after two failures in a row
+    assert len(a.methods) == 2
+    assert metrics.snapshot()['retries'] == {'eth_call': 2}
+    assert not provider.endpoints[0].healthy(time.monotonic())
+
+    # writes are not failed over
+    with pytest.raises(ConnectionError):
+        provider.make_request('eth_sendTransaction', [])
+
+
+def test_hedged_reads():
+    slow, fast = MockProvider('slow'), MockProvider('fast')
+    provider = MultiEndpointProvider([slow, fast], strategy='least_latency',
+                                     min_hedge_delay=0.01)
+
+    # slow becomes the first choice with its latencies recorded
+    for endpoint in provider.endpoints:
+        for _ in range(20):
+            endpoint.succeeded(0.001 if endpoint.provider is slow else 0.5)
+    slow.delay = 1.0
+
+    start = time.monotonic()
+    assert provider.make_request('eth_call', [])['result'] == 'fast'
+    assert time.monotonic() - start < 0.5
+    provider.close()
+
+
+class MockNode(MockProvider):
+    """Node whose latest block is `head`, reads of later blocks fail"""
+
+    def __init__(self, name, head):
+        super().__init__(name)
+        self.head = head
+
+    def make_request(self, method, params):
+        self.methods.append(method)
+        if method == 'eth_blockNumber':
+            return {'jsonrpc': '2.0', 'id': 0, 'result': hex(self.head)}
+        if params and params[-1] != 'latest' and \
+                int(params[-1], 16) > self.head:
+            return {'jsonrpc': '2.0', 'id': 0,
+                    'error': {'code': -32000, 'message': "header not found"}}
+        return {'jsonrpc': '2.0', 'id': 0, 'result': self.name}
+
+    def make_batch_request(self, payload):
+        return [self.make_request(item['method'], item['params'])
+                for item in payload]
+
+
+def test_pinned_reads():
+    a, b, c = MockNode('a', 12), MockNode('b', 10), MockNode('c', 11)
+    provider = MultiEndpointProvider([a, b, c], hedge_percentile=None)
+
+    # the lowest block of the nodes, which all of them have
+    assert provider.make_request('eth_blockNumber', []) == \
+        {'jsonrpc': '2.0', 'id': 0, 'result': hex(10)}
+    assert [len(node.methods) for node in (a, b, c)] == [1, 1, 1]
+
+    reads = [provider.make_request('eth_call', [{}, hex(10)])['result']
+             for _ in range(6)]
+    assert sorted(reads) == ['a', 'a', 'b', 'b', 'c', 'c']
+
+    # later blocks, e.g. of own transactions, are only read from the
+    # nodes known to have them
+    c.head = 12
+    assert provider.make_request('eth_blockNumber', [])['result'] == hex(10)
+    reads = [provider.make_request('eth_call', [{}, hex(11)])['result']
+             for _ in range(4)]
+    assert sorted(reads) == ['a', 'a', 'c', 'c']
+
+    batch = [{'jsonrpc': '2.0', 'method': 'eth_call', 'id': i,
+              'params': [{}, hex(block)]} for i, block in enumerate((10, 11))]
+    assert {provider.make_batch_request(batch)[1]['result']
+            for _ in range(4)} == {'a', 'c'}
+
+    # no node is known to have the block, the most advanced one is tried
+    counts = [len(node.methods) for node in (a, b, c)]
+    assert 'error' in provider.make_request('eth_call', [{}, hex(13)])
+    assert [len(node.methods) for node in (a, b, c)] == \
+        [counts[0] + 1, counts[1], counts[2]]
+
+    # reads of the latest block go anywhere
+    reads = [provider.make_request('eth_call', [{}, 'latest'])['result']
+             for _ in range(3)]
+    assert sorted(reads) == ['a', 'b', 'c']
+    provider.close()
+
+
+class MockResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class MockSession:
+    def __init__(self, name):
+        self.name = name
+        self.posts = []
+        self.headers = {}
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, url, data, **kwargs):
+        self.posts.append((url, json.loads(data), kwargs))
+        request = json.loads(data)
+        if isinstance(request, list):
+            return MockResponse(json.dumps([
+                {'jsonrpc': '2.0', 'id': item['id'], 'result': self.name}
+                for item in request]).encode())
+        return MockResponse(json.dumps(
+            {'jsonrpc': '2.0', 'id': request['id'],
+             'result': self.name}).encode())
+
+
+def test_http_provider_session(mocker):
+    sessions = [MockSession('first'), MockSession('second')]
+    mocker.patch('requests.Session', side_effect=sessions)
+
+    # providers of the same node still use their own sessions
+    first = http_provider("http://node:8545", timeout=5, connect_timeout=1)
+    second = http_provider("http://node:8545")
+    assert first.make_request('eth_blockNumber', [])['result'] == 'first'
+    assert second.make_request('eth_blockNumber', [])['result'] == 'second'
+    assert post_batch(first, [{'jsonrpc': '2.0', 'method': 'eth_chainId',
+                               'params': [], 'id': 1}]) == \
+        [{'jsonrpc': '2.0', 'id': 1, 'result': 'first'}]
+
+    url, request, kwargs = sessions[0].posts[0]
+    assert url == "http://node:8545"
+    assert request['method'] == 'eth_blockNumber'
+    assert kwargs['timeout'] == (1, 5)
+    assert len(sessions[0].posts) == 2 and len(sessions[1].posts) == 1
@@ -0,0 +1,161 @@
+import pytest
+from hexbytes import HexBytes
+from web3.exceptions import BlockNotFound
+
+from sofie_offer_marketplace.scanner import Checkpoint, FileCheckpoint, LogScanner
+
+
+class MockEth:
+    """Chain with one log per block, identified by its block number and
+    the fork it was created in"""
+
+    def __init__(self, length):
+        self.blocks = []
+        self.fork = 0
+        self.max_range = None
+        self.on_get_logs = None
+        self.get_logs_calls = []
+        self.extend(length)
+
+    def extend(self, count):
+        for _ in range(count):
+            self.blocks.append((len(self.blocks), self.fork))
+
+    def reorg(self, depth):
+        del self.blocks[len(self.blocks) - depth:]
+        self.fork += 1
+        self.extend(depth)
+
+    @property
+    def blockNumber(self):
+        return len(self.blocks) - 1
+
+    def getBlock(self, number):
+        if number >= len(self.blocks):
+            raise BlockNotFound(number)
+        return {'hash': HexBytes(bytes(self.blocks[number]))}
+
+    def getLogs(self, params):
+        from_block, to_block = params['fromBlock'], params['toBlock']
+        self.get_logs_calls.append((from_block, to_block))
+        if self.max_range and to_block - from_block + 1 > self.max_range:
+            raise ValueError("query returned more than 10000 results")
+        logs = [{'blockNumber': number, 'blockHash': HexBytes(bytes(block)),
+                 'fork': block[1]}
+                for number, block in enumerate(self.blocks)
+                if from_block <= number <= to_block]
+        if self.on_get_logs is not None:
+            self.on_get_logs()
+        return logs
+
+
+class MockWeb3:
+    def __init__(self, length):
+        self.eth = MockEth(length)
+
+
+def collect(logs):
+    """Handler appending the (block number, fork) of the logs to `logs`"""
+    return lambda entries: logs.extend(
+        (entry['blockNumber'], entry['fork']) for entry in entries)
+
+
+def test_scan_resume(tmp_path):
+    web3 = MockWeb3(10)
+    logs = []
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+
+    scanner = LogScanner(web3, "0x0", checkpoint=checkpoint, start_block=0,
+                         chunk=4)
+    assert scanner.scan(collect(logs)) == 10
+    assert scanner.block == 9
+    assert web3.eth.get_logs_calls == [(0, 3), (4, 9)]
+
+    # a new scanner continues from the checkpoint
+    web3.eth.extend(3)
+    scanner = LogScanner(web3, "0x0", checkpoint=checkpoint, start_block=0)
+    assert scanner.scan(collect(logs)) == 3
+    assert logs == web3.eth.blocks
+
+
+def test_scan_from_current_block():
+    web3 = MockWeb3(10)
+    logs = []
+
+    scanner = LogScanner(web3, "0x0")
+    assert scanner.scan(collect(logs)) == 0
+
+    web3.eth.extend(2)
+    scanner.scan(collect(logs))
+    assert logs == [(10, 0), (11, 0)]
+
+
+def test_scan_adaptive_chunk():
+    web3 = MockWeb3(20)
+    web3.eth.max_range = 3
+    logs = []
+
+    scanner = LogScanner(web3, "0x0", start_block=0, chunk=16, max_chunk=16)
+    scanner.scan(collect(logs))
+    assert logs == web3.eth.blocks
+
+    # fails when not even a single block can be read
+    web3.eth.max_range = 0.5
+    scanner = LogScanner(web3, "0x0", start_block=0, chunk=4)
+    with pytest.raises(ValueError):
+        scanner.scan(collect(logs))
+
+
+def test_scan_reorg():
+    web3 = MockWeb3(10)
+    logs = []
+    rollbacks = []
+
+    scanner = LogScanner(web3, "0x0", checkpoint=Checkpoint(), start_block=0,
+                         chunk=1, max_chunk=1)
+    scanner.scan(collect(logs))
+
+    web3.eth.reorg(3)
+    scanner.scan(collect(logs), rollbacks.append)
+
+    assert rollbacks == [6]
+    assert logs[10:] == [(7, 1), (8, 1), (9, 1)]
+
+
+def test_scan_deep_reorg():
+    web3 = MockWeb3(10)
+    logs = []
+    rollbacks = []
+
+    # started from the current block, recording the last 3 blocks
+    scanner = LogScanner(web3, "0x0", chunk=1, max_chunk=1, history=3,
+                         max_reorg_depth=4)
+    scanner.scan(collect(logs))
+    web3.eth.extend(10)
+    scanner.scan(collect(logs))
+
+    # deeper than the recorded blocks 17-19, rescanned from block 13
+    # instead of the genesis block
+    web3.eth.reorg(5)
+    scanner.scan(collect(logs), rollbacks.append)
+
+    assert rollbacks == [13]
+    assert logs[10:] == [(14, 0)] + [(n, 1) for n in range(15, 20)]
+
+
+def test_scan_reorg_while_reading():
+    web3 = MockWeb3(10)
+    logs = []
+    rollbacks = []
+
+    scanner = LogScanner(web3, "0x0", start_block=0, chunk=10)
+
+    # the last blocks are replaced right after their logs are read
+    web3.eth.on_get_logs = lambda: web3.eth.reorg(2)
+    scanner.scan(collect(logs))
+
+    web3.eth.on_get_logs = None
+    scanner.scan(collect(logs), rollbacks.append)
+
+    assert rollbacks == [7]
+    assert logs[10:] == [(8, 1), (9, 1)]
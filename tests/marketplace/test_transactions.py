@@ -0,0 +1,313 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+from sofie_offer_marketplace.transactions import (
+    GasEstimator, NonceManager, PendingTransaction, ReceiptPoller)
+
+
+class MockEth:
+    def __init__(self):
+        self.count = 5
+        self.receipts = {}
+        self.block_number = 1
+        self.receipt_calls = 0
+        self.count_calls = 0
+        self.polls = 0
+        self.polled = threading.Condition()
+
+    @property
+    def blockNumber(self):
+        with self.polled:
+            self.polls += 1
+            self.polled.notify_all()
+        return self.block_number
+
+    @blockNumber.setter
+    def blockNumber(self, number):
+        self.block_number = number
+
+    def wait_polls(self, count, timeout=5):
+        """Waits until the block number has been read `count` more times,
+        i.e. until at least `count` - 1 polls have been completed"""
+        with self.polled:
+            polls = self.polls + count
+            return self.polled.wait_for(lambda: self.polls >= polls, timeout)
+
+    def getTransactionCount(self, address, block_identifier):
+        self.count_calls += 1
+        return self.count
+
+    def getTransactionReceipt(self, tx_hash):
+        self.receipt_calls += 1
+        if tx_hash not in self.receipts:
+            raise TransactionNotFound(tx_hash)
+        return self.receipts[tx_hash]
+
+    def waitForTransactionReceipt(self, tx_hash, timeout=120):
+        return self.receipts[tx_hash]
+
+
+class MockWeb3:
+    def __init__(self):
+        self.eth = MockEth()
+
+
+class MockBatchProvider:
+    """Provider answering batches of receipt requests from `eth`"""
+
+    def __init__(self, eth):
+        self.eth = eth
+        self.batches = []
+
+    def make_batch_request(self, payload):
+        self.batches.append([item['params'][0] for item in payload])
+        return [{"jsonrpc": "2.0", "id": item['id'],
+                 "result": self.eth.receipts.get(item['params'][0])}
+                for item in payload]
+
+
+def raw_receipt(tx_hash, block_number):
+    return {"blockHash": "0x" + "ab" * 32, "blockNumber": hex(block_number),
+            "transactionHash": tx_hash, "transactionIndex": "0x0",
+            "from": "0x" + "34" * 20, "to": "0x" + "12" * 20,
+            "cumulativeGasUsed": "0x9c40", "gasUsed": "0x9c40",
+            "status": "0x1", "contractAddress": None, "logs": [],
+            "logsBloom": "0x" + "00" * 256}
+
+
+def test_nonce_manager_threads():
+    web3 = MockWeb3()
+    manager = NonceManager(web3, "0x0")
+    nonces = []
+
+    def take():
+        for _ in range(100):
+            nonces.append(manager.take())
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(nonces) == list(range(5, 405))
+    # the node is asked only for the first nonce
+    assert web3.eth.count_calls == 1
+
+
+def test_nonce_manager_lock_file(tmp_path):
+    web3 = MockWeb3()
+    path = str(tmp_path / "nonce.lock")
+
+    # managers in different processes only share the file
+    first = NonceManager(web3, "0x0", lock_path=path)
+    second = NonceManager(web3, "0x0", lock_path=path)
+
+    assert first.take(3) == 5
+    assert second.take() == 8
+    assert first.take() == 9
+
+    # the node is not asked again until nonces are released
+    web3.eth.count = 20
+    assert second.take() == 10
+
+    # the last nonce is given back, earlier ones are not
+    second.release(10)
+    first.release(5, 3)
+    with open(path) as f:
+        assert f.read() == "10"
+
+    # after a release the node is asked again, here it is ahead after
+    # transactions sent by someone else
+    assert first.take() == 20
+    assert second.take() == 21
+
+
+@pytest.mark.asyncio
+async def test_pending_transaction():
+    web3 = MockWeb3()
+    pending = PendingTransaction(web3, "0x1", lambda receipt: receipt['id'])
+
+    assert not pending.done()
+    web3.eth.receipts["0x1"] = {'id': 3}
+    assert pending.done()
+    assert pending.result() == 3
+    assert await pending == 3
+
+
+class MockCall:
+    abi = {'outputs': [{'name': 'status', 'type': 'uint8'},
+                       {'name': 'offerID', 'type': 'uint256'}]}
+
+    def __init__(self, fn_name, *args, gas=50000, status=0):
+        self.fn_name = fn_name
+        self.args = args
+        self.estimates = 0
+        self.estimated_gas = gas
+        self.status = status
+
+    def estimateGas(self, tx=None):
+        self.estimates += 1
+        return self.estimated_gas
+
+    def call(self, tx=None):
+        return [self.status, 1]
+
+
+def test_gas_estimator_cache():
+    estimator = GasEstimator(multiplier=1.5)
+
+    first = MockCall('submitRequestWithExtra', 1, [1, 2])
+    assert estimator.gas(first, "0x0") == 75000
+    assert first.estimates == 1
+
+    # same shape, served from the cache
+    second = MockCall('submitRequestWithExtra', 2, [3, 4])
+    assert estimator.gas(second, "0x0") == 75000
+    assert second.estimates == 0
+
+    # more extra elements, estimated again
+    third = MockCall('submitRequestWithExtra', 3, [1, 2, 3], gas=60000)
+    assert estimator.gas(third, "0x0") == 90000
+
+    # storing zero costs less than other numbers, estimated again
+    zero = MockCall('submitRequestWithExtra', 4, [0, 2], gas=30000)
+    assert estimator.gas(zero, "0x0") == 45000
+    assert estimator.gas(first, "0x0") == 75000
+
+    # state dependent functions are always estimated
+    decide = MockCall('decideRequest', 1, [])
+    estimator.gas(decide, "0x0")
+    estimator.gas(decide, "0x0")
+    assert decide.estimates == 2
+
+
+def test_gas_estimator_failing_calls():
+    estimator = GasEstimator(multiplier=1.5)
+
+    # the request is closed, the call ends early and is not cached
+    closed = MockCall('submitOffer', 1, gas=25000, status=1)
+    assert estimator.gas(closed, "0x0") == 37500
+    assert estimator.lookup(closed) is None
+
+    call = MockCall('submitOffer', 2)
+    assert estimator.gas(call, "0x0") == 75000
+    assert estimator.lookup(closed) == 75000
+
+
+def test_gas_estimator_feedback():
+    estimator = GasEstimator(multiplier=1.5, max_gas=100000)
+    call = MockCall('submitOffer', 1)
+    assert estimator.gas(call, "0x0") == 75000
+
+    # used more than estimated
+    estimator.observe(call, 75000, 60000)
+    assert estimator.lookup(call) == 90000
+
+    # failed transactions do not raise the estimate
+    estimator.observe(call, 90000, 65000, success=False)
+    assert estimator.lookup(call) == 90000
+
+    # out of gas, estimate again
+    estimator.observe(call, 90000, 90000, success=False)
+    assert estimator.lookup(call) is None
+
+    call.estimated_gas = 80000
+    assert estimator.gas(call, "0x0") == 100000
+
+
+def test_receipt_poller():
+    web3 = MockWeb3()
+    poller = ReceiptPoller(web3, poll_interval=0.01)
+    hashes = ["0x{:02x}".format(i) for i in range(20)]
+    futures = [poller.watch(tx_hash) for tx_hash in hashes]
+
+    # every transaction is looked for once in the block
+    assert web3.eth.wait_polls(2)
+    assert web3.eth.receipt_calls == len(hashes)
+
+    # nothing is polled again until there is a new block
+    assert web3.eth.wait_polls(2)
+    assert web3.eth.receipt_calls == len(hashes)
+
+    for tx_hash in hashes:
+        web3.eth.receipts[tx_hash] = {'id': tx_hash}
+    web3.eth.blockNumber += 1
+
+    concurrent.futures.wait(futures, timeout=5)
+    assert [future.result() for future in futures] == \
+        [{'id': tx_hash} for tx_hash in hashes]
+    assert web3.eth.receipt_calls == 2 * len(hashes)
+    assert not poller.waiting
+
+    # waiting for a transaction that is already mined
+    assert poller.wait(hashes[0], timeout=5) == {'id': hashes[0]}
+    assert not poller.waiting
+
+
+def test_receipt_poller_batches():
+    web3 = MockWeb3()
+    web3.provider = MockBatchProvider(web3.eth)
+    poller = ReceiptPoller(web3, poll_interval=0.01)
+    hashes = ["0x{:064x}".format(i) for i in range(1, 6)]
+    futures = [poller.watch(tx_hash) for tx_hash in hashes]
+    assert web3.eth.wait_polls(2)
+
+    for tx_hash in hashes[:3]:
+        web3.eth.receipts[tx_hash] = raw_receipt(tx_hash, 2)
+    web3.eth.blockNumber = 2
+
+    # the receipts are fetched with one batch and formatted like the
+    # ones of web3
+    receipts = [future.result(5) for future in futures[:3]]
+    assert web3.provider.batches[-1] == hashes
+    assert [receipt.transactionHash.hex() for receipt in receipts] == \
+        hashes[:3]
+    assert receipts[0].blockNumber == 2 and receipts[0].status == 1
+    assert not any(future.done() for future in futures[3:])
+
+    # the rest in the next block, without the mined ones
+    for tx_hash in hashes[3:]:
+        web3.eth.receipts[tx_hash] = raw_receipt(tx_hash, 3)
+    web3.eth.blockNumber = 3
+    assert [future.result(5).blockNumber for future in futures[3:]] == \
+        [3, 3]
+    assert web3.provider.batches[-1] == hashes[3:]
+    assert not poller.waiting
+
+
+@pytest.mark.asyncio
+async def test_pending_transaction_poller():
+    web3 = MockWeb3()
+    poller = ReceiptPoller(web3, poll_interval=0.01)
+    pending = PendingTransaction(web3, "0x1", lambda receipt: receipt['id'],
+                                 poller=poller)
+    timed_out = PendingTransaction(web3, "0x2", timeout=0.05, poller=poller)
+
+    web3.eth.receipts["0x1"] = {'id': 3}
+    assert await pending == 3
+    assert pending.result() == 3
+
+    with pytest.raises(TimeExhausted):
+        await timed_out
+    assert not poller.waiting
+
+    # mined transactions are reported without waiting for them, the
+    # ones that are not mined are polled until their timeout
+    mined = []
+    PendingTransaction(web3, "0x3", timeout=0.05, poller=poller,
+                       mined=mined.append)
+    web3.eth.receipts["0x4"] = {'id': 4}
+    PendingTransaction(web3, "0x4", poller=poller, mined=mined.append)
+    assert web3.eth.wait_polls(2)
+    assert mined == [{'id': 4}]
+
+    deadline = time.monotonic() + 5
+    while poller.waiting and time.monotonic() < deadline:
+        web3.eth.wait_polls(1, timeout=0.1)
+    assert not poller.waiting
@@ -189,5 +189,71 @@ class MockContract(om.Contract):
         o.price = extra[0]
         return True
 
+    def get_requests_bulk(self, request_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        results = []
+        for request_id in request_ids:
+            data = self.get_request(request_id)
+            if data is not None:
+                data['extra'] = self.get_request_extra(request_id)
+            results.append(data)
+        return results
+
+    def get_offers_bulk(self, offer_ids: List[int]) \
+            -> List[Optional[Dict[str, Any]]]:
+        offers = {o.offer_id: o for o in self.offers}
+        results: List[Optional[Dict[str, Any]]] = []
+        for offer_id in offer_ids:
+            o = offers.get(offer_id)
+            if o is None:
+                results.append(None)
+                continue
+            results.append({'request_id': o.request_id,
+                            'author': o.author,
+                            'extra': o.marshal_extra()})
+        return results
+
     def get_type(self) -> str:
         return self.type_name
+
+
+class MockAsyncContract(om.AsyncContract):
+    """Asynchronous view of a MockContract"""
+
+    def __init__(self, contract: MockContract) -> None:
+        self.sync = contract
+
+    async def get_request_ids(self) -> List[int]:
+        return self.sync.get_request_ids()
+
+    async def get_request(self, request_id: int) -> Optional[Dict[str, Any]]:
+        return self.sync.get_request(request_id)
+
+    async def get_request_extra(self, request_id: int) -> Any:
+        return self.sync.get_request_extra(request_id)
+
+    async def add_request(self, deadline: int) -> int:
+        return self.sync.add_request(deadline)
+
+    async def add_request_extra(self, request_id: int,
+                                extra: List[Any]) -> bool:
+        return self.sync.add_request_extra(request_id, extra)
+
+    async def decide_request(self, request_id: int,
+                             selected_offer_ids: List[int] = []) -> bool:
+        return self.sync.decide_request(request_id, selected_offer_ids)
+
+    async def get_offer(self, offer_id: int) -> Optional[Dict[str, Any]]:
+        return self.sync.get_offer(offer_id)
+
+    async def get_offer_extra(self, offer_id: int) -> Any:
+        return self.sync.get_offer_extra(offer_id)
+
+    async def add_offer(self, request_id: int) -> int:
+        return self.sync.add_offer(request_id)
+
+    async def add_offer_extra(self, offer_id: int, extra: List[Any]) -> bool:
+        return self.sync.add_offer_extra(offer_id, extra)
+
+    async def get_type(self) -> str:
+        return self.sync.get_type()